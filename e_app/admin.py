@@ -1,9 +1,58 @@
 
-from django.contrib import admin
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
+from . import content_io
 from .models import Course
 from .models import Article
 from .models import Progress,Chapter,Enrollment
 
+
+class EstimatedCountPaginator(Paginator):
+    # Changelist paginator for tables with millions of rows, where COUNT(*) reads the whole table.
+    # Unfiltered lists on PostgreSQL use the planner's row estimate; everything else is counted up
+    # to COUNT_LIMIT rows, so the last pages of a huge filtered list are not reachable.
+    ESTIMATE_THRESHOLD = 100000
+    COUNT_LIMIT = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimated_rows(queryset)
+            if estimate is not None and estimate >= self.ESTIMATE_THRESHOLD:
+                return estimate
+        # COUNT(*) over a LIMITed subquery stops reading after COUNT_LIMIT rows
+        return queryset.order_by()[:self.COUNT_LIMIT].count()
+
+    def estimated_rows(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed
+        return row[0] if row and row[0] >= 0 else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Changelists of the big tables: estimated counts, and no second COUNT(*) of the
+    # unfiltered table next to search results
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 class CourseAdmin(admin.ModelAdmin):
     # Fields to display in the admin list view
     list_display = ('id','title', 'category', 'created_at', 'updated_at')
@@ -37,6 +86,57 @@ class CourseAdmin(admin.ModelAdmin):
     # Exclude 'created_at' from the form entirely
     exclude = ('created_at',)  # This ensures 'created_at' is not in the form
 
+    # Whole courses with chapters and articles, streamed (see e_app.content_io)
+    actions = ('export_jsonl', 'export_csv')
+    change_list_template = 'admin/e_app/course/change_list.html'
+
+    def export(self, queryset, fmt):
+        lines = content_io.export_lines(content_io.iter_courses(queryset), fmt)
+        content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="courses.{fmt}"'
+        return response
+
+    @admin.action(description='Export selected courses as JSON Lines')
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, 'jsonl')
+
+    @admin.action(description='Export selected courses as CSV')
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv')
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='e_app_course_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:e_app_course_changelist')
+        form = CourseImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = form.cleaned_data['format'] or content_io.detect_format(upload.name)
+            # Read the upload as a stream of lines rather than loading it whole
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            try:
+                totals = content_io.import_courses(content_io.read_courses(lines, fmt))
+            except content_io.ContentImportError as e:
+                messages.error(request, f'Import stopped: {e}. Courses before it were imported.')
+            else:
+                messages.success(request, ', '.join(f'{count} {name.replace("_", " ")}' for name, count in totals.items()))
+                return redirect('admin:e_app_course_changelist')
+        context = dict(self.admin_site.each_context(request), title='Import courses', form=form, opts=self.model._meta)
+        return TemplateResponse(request, 'admin/e_app/course/import.html', context)
+
+
+class CourseImportForm(forms.Form):
+    file = forms.FileField(help_text='JSON Lines or CSV, as written by the export actions or `manage.py export_courses`.')
+    format = forms.ChoiceField(
+        choices=[('', 'From file extension')] + [(fmt, fmt.upper()) for fmt in content_io.FORMATS], required=False,
+    )
+
 admin.site.register(Course, CourseAdmin)
 
 
@@ -67,11 +167,18 @@ class ArticleAdmin(admin.ModelAdmin):
 admin.site.register(Article, ArticleAdmin)
 
 
-class ProgressAdmin(admin.ModelAdmin):
+class ProgressAdmin(LargeTableAdmin):
     list_display = ('user', 'chapter', 'get_course_title', 'get_course_category', 'completed', 'completed_at')  # Added 'get_course_title'
     list_filter = ('completed', 'completed_at', 'chapter__course__category')  # Added filter for course category
     search_fields = ('user__username', 'chapter__title', 'chapter__course__title', 'chapter__course__category')  # Added search for course title and category
-    ordering = ('completed', 'completed_at')
+    # Newest first, straight off the primary key index
+    ordering = ('-id',)
+
+    # Fetch the user, chapter and course of every row in the page query
+    list_select_related = ('user', 'chapter__course')
+
+    # Search-driven pickers instead of <select>s listing every user and chapter
+    autocomplete_fields = ('user', 'chapter')
 
     # Customize the form layout
     fieldsets = (
@@ -98,11 +205,14 @@ class ProgressAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Progress, ProgressAdmin)  # Register the Progress model with the custom admin
-class ChapterAdmin(admin.ModelAdmin):
+class ChapterAdmin(LargeTableAdmin):
     # List view configuration for the Chapter model
     list_display = ('id','get_course_title', 'title', 'order', 'created_at', 'updated_at')  # Reordered to: Course Title, Title, Order
     search_fields = ('title', 'course__title')  # Search functionality based on chapter title and related course title
-    list_filter = ('course',)  # Filter chapters by course
+    # A filter on course would list every course; search by course title instead
+    list_filter = ('course__category',)
+    list_select_related = ('course',)
+    autocomplete_fields = ('course',)
 
     # Custom method to display the course title
     def get_course_title(self, obj):
@@ -123,18 +233,21 @@ admin.site.register(Chapter, ChapterAdmin)
 
 
 
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(LargeTableAdmin):
     # Fields to display in the admin list view
     list_display = ('user', 'course', 'enrolled_at')
 
     # Fields to search in the admin list view
     search_fields = ('user__username', 'course__title')
 
-    # Fields to filter by in the admin list view
-    list_filter = ('course',)
+    # Fields to filter by in the admin list view (a filter on course would list every course)
+    list_filter = ('course__category', 'enrolled_at')
 
-    # Default ordering for the list view
-    ordering = ('-enrolled_at',)
+    # Default ordering for the list view: newest first, off the primary key index
+    ordering = ('-id',)
+
+    list_select_related = ('user', 'course')
+    autocomplete_fields = ('user', 'course')
 
     # Number of items to display per page in the admin list view
     list_per_page = 25
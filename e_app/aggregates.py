@@ -0,0 +1,112 @@
+from django.db.models import F, Q
+
+from . import archive
+from .models import Chapter, Enrollment
+
+# Per-enrollment progress aggregates (completed_chapters, total_chapters, last_activity_at,
+# next_chapter). Progress writes update them incrementally inside the write's transaction;
+# chapter changes either adjust them in bulk or recompute the affected course.
+
+RECOMPUTE_BATCH_SIZE = 500
+
+
+def lock_enrollment(user, course_id):
+    # Lock the enrollment row for the rest of the transaction so concurrent progress
+    # writes for the same user and course apply their deltas one after another
+    enrollment = Enrollment.objects.select_for_update().select_related('next_chapter').get(user=user, course_id=course_id)
+    if enrollment.progress_archived:
+        # The user is back: their archived progress becomes rows again before the write
+        archive.restore(enrollment)
+    return enrollment
+
+
+def _position(chapter):
+    return (chapter.order, chapter.id)
+
+
+def first_incomplete_chapter_id(course_id, completed_ids):
+    return (
+        Chapter.objects.filter(course_id=course_id).exclude(id__in=completed_ids)
+        .order_by('order', 'id').values_list('id', flat=True).first()
+    )
+
+
+def record_write(store, enrollment, chapter, was_completed, completed, when):
+    # Called by the progress store after it has written the new state, in the same transaction
+    enrollment.last_activity_at = when
+    update_fields = ['last_activity_at']
+
+    if completed != was_completed:
+        enrollment.completed_chapters = max(0, enrollment.completed_chapters + (1 if completed else -1))
+        update_fields.append('completed_chapters')
+
+        next_chapter = enrollment.next_chapter
+        if completed and enrollment.next_chapter_id == chapter.id:
+            completed_ids = store.completed_chapter_ids(enrollment.user_id, enrollment.course_id)
+            enrollment.next_chapter_id = first_incomplete_chapter_id(enrollment.course_id, completed_ids)
+            update_fields.append('next_chapter')
+        elif not completed and (next_chapter is None or _position(chapter) < _position(next_chapter)):
+            enrollment.next_chapter_id = chapter.id
+            update_fields.append('next_chapter')
+
+    enrollment.save(update_fields=update_fields)
+
+
+def record_batch(store, enrollment, completed_count, cleared_count, when):
+    # Batched counterpart of record_write: apply the net change of several flips in one UPDATE
+    enrollment.last_activity_at = when
+    update_fields = ['last_activity_at']
+    if completed_count or cleared_count:
+        enrollment.completed_chapters = max(0, enrollment.completed_chapters + completed_count - cleared_count)
+        completed_ids = store.completed_chapter_ids(enrollment.user_id, enrollment.course_id)
+        enrollment.next_chapter_id = first_incomplete_chapter_id(enrollment.course_id, completed_ids)
+        update_fields += ['completed_chapters', 'next_chapter']
+    enrollment.save(update_fields=update_fields)
+
+
+def chapter_added(chapter):
+    # Nobody has completed a new chapter: it counts towards every total, and becomes the
+    # next chapter for anyone who is past it (or has finished the course)
+    enrollments = Enrollment.objects.filter(course_id=chapter.course_id)
+    enrollments.update(total_chapters=F('total_chapters') + 1)
+    enrollments.filter(
+        Q(next_chapter__isnull=True)
+        | Q(next_chapter__order__gt=chapter.order)
+        | Q(next_chapter__order=chapter.order, next_chapter_id__gt=chapter.id)
+    ).update(next_chapter=chapter)
+
+
+def recompute_course(store, course_id, fix=True, batch_size=RECOMPUTE_BATCH_SIZE):
+    # Recompute the counts and next chapter of every enrollment in the course from stored
+    # progress, a batch of enrollments at a time. Returns the enrollments that had drifted as
+    # dicts of stored vs expected values; with fix=True they are corrected with bulk_update.
+    chapter_ids = list(Chapter.objects.filter(course_id=course_id).order_by('order', 'id').values_list('id', flat=True))
+    drift = []
+    last_id = 0
+    while True:
+        enrollments = list(
+            Enrollment.objects.filter(course_id=course_id, id__gt=last_id).order_by('id')
+            .only('id', 'user_id', 'course_id', 'completed_chapters', 'total_chapters', 'next_chapter_id')[:batch_size]
+        )
+        if not enrollments:
+            return drift
+        last_id = enrollments[-1].id
+
+        completion = store.completion_by_user(course_id, [enrollment.user_id for enrollment in enrollments])
+        changed = []
+        for enrollment in enrollments:
+            done = completion.get(enrollment.user_id, set())
+            expected = {
+                'completed_chapters': sum(1 for chapter_id in chapter_ids if chapter_id in done),
+                'total_chapters': len(chapter_ids),
+                'next_chapter_id': next((chapter_id for chapter_id in chapter_ids if chapter_id not in done), None),
+            }
+            stored = {field: getattr(enrollment, field) for field in expected}
+            if stored != expected:
+                drift.append({'enrollment_id': enrollment.id, 'stored': stored, 'expected': expected})
+                for field, value in expected.items():
+                    setattr(enrollment, field, value)
+                changed.append(enrollment)
+
+        if fix and changed:
+            Enrollment.objects.bulk_update(changed, ['completed_chapters', 'total_chapters', 'next_chapter'])
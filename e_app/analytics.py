@@ -0,0 +1,184 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AnalyticsRun, Chapter, ChapterAnalytics, Course, CourseAnalytics, Enrollment
+from .progress import progress_backend
+
+# Course completion funnels, precomputed into CourseAnalytics and ChapterAnalytics so the
+# analytics endpoint reads a handful of rows however many enrollments a course has.
+#
+# Rollups are rebuilt a course at a time from stored progress, never from the request path:
+# counting completions on every progress write would make every completion of a chapter
+# update the same row. refresh_changed() is the periodic delta job and only rebuilds courses
+# with enrollment or chapter activity since the previous run started; rebuild_all() is for
+# backfills and after bulk deletes, which the delta job cannot see.
+
+# Upper bounds of the duration histogram buckets in seconds (1 minute to 1 year); one more
+# bucket holds anything longer
+DURATION_BUCKETS = (
+    60, 5 * 60, 15 * 60, 60 * 60, 3 * 3600, 6 * 3600, 12 * 3600,
+    86400, 2 * 86400, 4 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+    60 * 86400, 90 * 86400, 180 * 86400, 365 * 86400,
+)
+
+# Enrollments read per batch while rebuilding a course
+ANALYTICS_BATCH_SIZE = 1000
+
+
+def _bucket(seconds):
+    return next((i for i, bound in enumerate(DURATION_BUCKETS) if seconds <= bound), len(DURATION_BUCKETS))
+
+
+def median_seconds(histogram):
+    # Upper bound of the bucket holding the median; None without data or past the last bucket
+    total = sum(histogram)
+    seen = 0
+    for bound, count in zip(DURATION_BUCKETS, histogram):
+        seen += count
+        if total and seen * 2 >= total:
+            return bound
+    return None
+
+
+def refresh_course(course_id, store=None, batch_size=ANALYTICS_BATCH_SIZE, now=None):
+    store = store or progress_backend()
+    chapters = list(Chapter.objects.filter(course_id=course_id).order_by('order', 'id').values_list('id', 'order'))
+    position = {chapter_id: index for index, (chapter_id, order) in enumerate(chapters)}
+    steps = {
+        chapter_id: {'completions': 0, 'stopped_here': 0, 'histogram': [0] * (len(DURATION_BUCKETS) + 1)}
+        for chapter_id, order in chapters
+    }
+    course = {'enrollments': 0, 'not_started': 0, 'finished': 0, 'histogram': [0] * (len(DURATION_BUCKETS) + 1)}
+
+    last_id = 0
+    while True:
+        enrollments = list(
+            Enrollment.objects.filter(course_id=course_id, id__gt=last_id).order_by('id')
+            .values_list('id', 'user_id', 'enrolled_at')[:batch_size]
+        )
+        if not enrollments:
+            break
+        last_id = enrollments[-1][0]
+        times = store.completion_times(course_id, [user_id for _, user_id, _ in enrollments])
+
+        for _, user_id, enrolled_at in enrollments:
+            done = {chapter_id: at for chapter_id, at in times.get(user_id, {}).items() if chapter_id in steps}
+            course['enrollments'] += 1
+            for chapter_id, at in done.items():
+                step = steps[chapter_id]
+                step['completions'] += 1
+                if at is not None:
+                    step['histogram'][_bucket(max(0, (at - enrolled_at).total_seconds()))] += 1
+
+            if not done:
+                course['not_started'] += 1
+            elif len(done) == len(steps):
+                course['finished'] += 1
+                finished_at = max((at for at in done.values() if at is not None), default=None)
+                if finished_at is not None:
+                    course['histogram'][_bucket(max(0, (finished_at - enrolled_at).total_seconds()))] += 1
+            else:
+                # Drop-off point: the furthest chapter completed by someone who has not finished
+                steps[max(done, key=position.get)]['stopped_here'] += 1
+
+    with transaction.atomic():
+        CourseAnalytics.objects.update_or_create(course_id=course_id, defaults={
+            'enrollments': course['enrollments'],
+            'not_started': course['not_started'],
+            'finished': course['finished'],
+            'median_seconds_to_finish': median_seconds(course['histogram']),
+            'finish_histogram': course['histogram'],
+            'refreshed_at': now or timezone.now(),
+        })
+        # Replacing the rows also drops those of deleted chapters
+        ChapterAnalytics.objects.filter(course_id=course_id).delete()
+        ChapterAnalytics.objects.bulk_create([
+            ChapterAnalytics(
+                chapter_id=chapter_id, course_id=course_id, order=order,
+                completions=steps[chapter_id]['completions'],
+                stopped_here=steps[chapter_id]['stopped_here'],
+                median_seconds_to_complete=median_seconds(steps[chapter_id]['histogram']),
+                completion_histogram=steps[chapter_id]['histogram'],
+            )
+            for chapter_id, order in chapters
+        ])
+
+
+def changed_course_ids(since):
+    # Courses with enrollments, progress writes or chapter edits at or after `since`
+    ids = set(
+        Enrollment.objects.filter(Q(last_activity_at__gte=since) | Q(enrolled_at__gte=since))
+        .values_list('course_id', flat=True).distinct()
+    )
+    ids.update(Chapter.objects.filter(updated_at__gte=since).values_list('course_id', flat=True).distinct())
+    ids.update(Course.objects.filter(created_at__gte=since).values_list('id', flat=True))
+    return ids
+
+
+def _run(course_ids, full, started_at, batch_size, progress, record=True):
+    store = progress_backend()
+    for count, course_id in enumerate(sorted(course_ids), 1):
+        refresh_course(course_id, store=store, batch_size=batch_size, now=started_at)
+        if progress:
+            progress(count, len(course_ids))
+    run = AnalyticsRun(started_at=started_at, finished_at=timezone.now(), full=full, courses=len(course_ids))
+    if record:
+        run.save()
+    return run
+
+
+def refresh_changed(batch_size=ANALYTICS_BATCH_SIZE, progress=None):
+    # Delta job: rebuild only the courses touched since the last run started. The first run
+    # rebuilds everything.
+    started_at = timezone.now()
+    last_run = AnalyticsRun.objects.order_by('-started_at').first()
+    if last_run is None:
+        return rebuild_all(batch_size=batch_size, progress=progress)
+    return _run(changed_course_ids(last_run.started_at), False, started_at, batch_size, progress)
+
+
+def rebuild_all(course_ids=None, batch_size=ANALYTICS_BATCH_SIZE, progress=None):
+    # Rollups of deleted courses are deleted with them, so only existing courses need work.
+    # Rebuilding selected courses is not recorded as a run: it must not move the delta job's
+    # watermark past changes to other courses.
+    started_at = timezone.now()
+    full = course_ids is None
+    if full:
+        course_ids = list(Course.objects.values_list('id', flat=True))
+    return _run(course_ids, full, started_at, batch_size, progress, record=full)
+
+
+def funnel(course_id):
+    # The precomputed funnel of a course, or None if it has not been computed yet
+    summary = CourseAnalytics.objects.filter(course_id=course_id).first()
+    if summary is None:
+        return None
+    steps = ChapterAnalytics.objects.filter(course_id=course_id).select_related('chapter').order_by('order', 'chapter_id')
+    enrolled = summary.enrollments
+    previous = enrolled
+    chapters = []
+    for step in steps:
+        chapters.append({
+            'chapter_id': step.chapter_id,
+            'title': step.chapter.title,
+            'order': step.order,
+            'completions': step.completions,
+            'completion_rate': round(step.completions / enrolled, 4) if enrolled else None,
+            # Users who completed the previous step but not this one
+            'lost_from_previous': max(0, previous - step.completions),
+            'stopped_here': step.stopped_here,
+            'median_seconds_to_complete': step.median_seconds_to_complete,
+        })
+        previous = step.completions
+    return {
+        'course_id': course_id,
+        'enrollments': enrolled,
+        'not_started': summary.not_started,
+        'finished': summary.finished,
+        'median_seconds_to_finish': summary.median_seconds_to_finish,
+        'refreshed_at': summary.refreshed_at,
+        'duration_buckets': DURATION_BUCKETS,
+        'finish_histogram': summary.finish_histogram,
+        'chapters': chapters,
+    }
@@ -4,5 +4,13 @@ from django.apps import AppConfig
 class EAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'e_app'
-    
+
+    def ready(self):
+        # Connect the cache invalidation signal handlers
+        from . import signals  # noqa: F401
+
+        # Let RequestMetricsMiddleware count the queries of every connection
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_wrapper
+        connection_created.connect(install_wrapper, dispatch_uid='e_app.instrumentation')
     
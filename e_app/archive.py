@@ -0,0 +1,145 @@
+import time
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Chapter, Enrollment, Progress, ProgressArchive
+
+# Cold progress archival for the 'rows' progress backend. The Progress rows of enrollments
+# finished more than PROGRESS_ARCHIVE_FINISHED_DAYS ago, or inactive for
+# PROGRESS_ARCHIVE_INACTIVE_DAYS, are packed into one ProgressArchive row per enrollment and
+# deleted, which keeps the (user, chapter) index behind every chapter read small.
+#
+# archive() works in batches of enrollments, each its own short transaction that locks only
+# that batch, so it can be stopped at any point and simply run again. Readers of the rows
+# store fall back to the archive when a user's rows are missing, and the first progress
+# write to an archived enrollment (see aggregates.lock_enrollment) unpacks it into rows again.
+
+# Enrollments archived per transaction
+ARCHIVE_BATCH_SIZE = 500
+
+# Progress rows per INSERT or DELETE statement
+PROGRESS_BATCH_SIZE = 1000
+
+
+def archivable(now=None):
+    now = now or timezone.now()
+    finished_before = now - timezone.timedelta(days=getattr(settings, 'PROGRESS_ARCHIVE_FINISHED_DAYS', 90))
+    inactive_before = now - timezone.timedelta(days=getattr(settings, 'PROGRESS_ARCHIVE_INACTIVE_DAYS', 365))
+    return Enrollment.objects.filter(progress_archived=False).alias(
+        active_at=Coalesce('last_activity_at', 'enrolled_at'),
+    ).filter(
+        Q(total_chapters__gt=0, completed_chapters__gte=F('total_chapters'), active_at__lt=finished_before)
+        | Q(active_at__lt=inactive_before)
+    )
+
+
+def archive_batch(after_id=0, batch_size=ARCHIVE_BATCH_SIZE, now=None):
+    # Archive the next batch of enrollments with ids above after_id. Returns the last id
+    # scanned (None when there are no more) and the counts of the batch.
+    counts = {'enrollments': 0, 'rows': 0}
+    with transaction.atomic():
+        enrollments = archivable(now).filter(id__gt=after_id).order_by('id')
+        if connections[router.db_for_write(Enrollment)].features.has_select_for_update_skip_locked:
+            # Enrollments being written to are left for the next run instead of waited for
+            enrollments = enrollments.select_for_update(skip_locked=True, of=('self',))
+        enrollments = list(enrollments.values_list('id', 'user_id', 'course_id')[:batch_size])
+        if not enrollments:
+            return None, counts
+
+        by_pair = {(user_id, course_id): enrollment_id for enrollment_id, user_id, course_id in enrollments}
+        packed = {enrollment_id: {} for enrollment_id, _, _ in enrollments}
+        row_counts = dict.fromkeys(packed, 0)
+        row_ids = []
+        # One query for the batch's users and courses; rows of other enrollments are skipped
+        rows = Progress.objects.filter(
+            user_id__in={user_id for user_id, _ in by_pair}, chapter__course_id__in={course_id for _, course_id in by_pair},
+        ).values_list('id', 'user_id', 'chapter__course_id', 'chapter_id', 'completed', 'completed_at')
+        for row_id, user_id, course_id, chapter_id, completed, completed_at in rows:
+            enrollment_id = by_pair.get((user_id, course_id))
+            if enrollment_id is None:
+                continue
+            row_ids.append(row_id)
+            row_counts[enrollment_id] += 1
+            if completed:
+                packed[enrollment_id][str(chapter_id)] = completed_at.isoformat() if completed_at else None
+
+        archived_at = timezone.now()
+        ProgressArchive.objects.bulk_create(
+            [
+                ProgressArchive(enrollment_id=enrollment_id, completed_at=completed_at,
+                                rows=row_counts[enrollment_id], archived_at=archived_at)
+                for enrollment_id, completed_at in packed.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['enrollment'],
+            update_fields=['completed_at', 'rows', 'archived_at'],
+        )
+        for start in range(0, len(row_ids), PROGRESS_BATCH_SIZE):
+            Progress.objects.filter(id__in=row_ids[start:start + PROGRESS_BATCH_SIZE]).delete()
+        Enrollment.objects.filter(id__in=packed).update(progress_archived=True)
+    counts.update(enrollments=len(enrollments), rows=len(row_ids))
+    return enrollments[-1][0], counts
+
+
+def archive(batch_size=ARCHIVE_BATCH_SIZE, pause=0.0, now=None, progress=None):
+    # Archive every archivable enrollment; returns the summed counts
+    now = now or timezone.now()
+    totals = {'enrollments': 0, 'rows': 0}
+    last_id = 0
+    while True:
+        last_id, counts = archive_batch(last_id, batch_size, now)
+        if last_id is None:
+            return totals
+        for key, value in counts.items():
+            totals[key] += value
+        if progress:
+            progress(totals)
+        if pause:
+            time.sleep(pause)
+
+
+def archived_times(user, course_id):
+    # {chapter_id: completed_at} of an archived enrollment, or None if it is not archived
+    archived = ProgressArchive.objects.filter(enrollment__user=user, enrollment__course_id=course_id).values_list(
+        'completed_at', flat=True,
+    ).first()
+    return unpack(archived) if archived is not None else None
+
+
+async def aarchived_times(user, course_id):
+    archived = await ProgressArchive.objects.filter(enrollment__user=user, enrollment__course_id=course_id).values_list(
+        'completed_at', flat=True,
+    ).afirst()
+    return unpack(archived) if archived is not None else None
+
+
+def unpack(completed_at):
+    return {int(chapter_id): parse_datetime(at) if at else None for chapter_id, at in completed_at.items()}
+
+
+def restore(enrollment):
+    # Unpack the archive of a locked enrollment back into Progress rows, one per chapter of
+    # the course, and clear the flag. Called inside the writer's transaction.
+    archived = ProgressArchive.objects.filter(enrollment=enrollment).first()
+    completed = unpack(archived.completed_at) if archived else {}
+    chapter_ids = Chapter.objects.filter(course_id=enrollment.course_id).values_list('id', flat=True)
+    Progress.objects.bulk_create(
+        [
+            Progress(
+                user_id=enrollment.user_id, chapter_id=chapter_id,
+                completed=chapter_id in completed, completed_at=completed.get(chapter_id),
+            )
+            for chapter_id in chapter_ids
+        ],
+        batch_size=PROGRESS_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if archived:
+        archived.delete()
+    enrollment.progress_archived = False
+    Enrollment.objects.filter(pk=enrollment.pk).update(progress_archived=False)
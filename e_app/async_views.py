@@ -0,0 +1,113 @@
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from . import catalog_cache, snapshots
+from .instrumentation import JsonResponse
+from .models import Course, Chapter, Enrollment
+from .pagination import InvalidCursor, akeyset_page
+from .progress import progress_store
+from .views import (
+    ARTICLE_PARAMS, ARTICLE_STREAM_CHUNK_SIZE, article_params, article_queryset,
+    course_list_params, course_page_args, ndjson_line, progress_payload,
+)
+
+# Async versions of the read-heavy views, routed by super_e.asgi_urls when the project runs
+# under ASGI (super_e/asgi.py). They use the async ORM, so a request waiting on the database
+# does not hold a worker thread. Parameters, responses, auth and CSRF behave exactly like the
+# sync views in views.py, which they share their parsing and query building with.
+
+
+# Course List View
+@csrf_exempt
+async def course_list(request):
+    try:
+        params = course_list_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    async def build_page():
+        rows, next_cursor = await akeyset_page(*course_page_args(*params), datetime_fields=('created_at',))
+        return {'courses': rows, 'next_cursor': next_cursor}
+
+    try:
+        page = await catalog_cache.aget_or_build('list', params, build_page)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(page)
+
+
+# Course Detail View
+@csrf_exempt
+async def course_detail(request, course_id):
+    snapshot = await snapshots.aget('course', course_id)
+    if request.GET.get('outline', 'false') != 'true':
+        return snapshots.response(request, snapshot)
+
+    course_data = snapshots.payload(snapshot)
+    chapters = await catalog_cache.aget_or_build('chapters', course_id, lambda: build_chapter_outline(course_id))
+    user = await request.auser()
+    completed_ids = await progress_store().acompleted_chapter_ids(user, course_id) if user.is_authenticated else set()
+    course_data['chapters'] = [
+        dict(chapter, completed=chapter['id'] in completed_ids) for chapter in chapters
+    ]
+    return JsonResponse(course_data)
+
+
+async def build_chapter_outline(course_id):
+    chapters = Chapter.objects.filter(course_id=course_id).order_by('order').values('id', 'title', 'description', 'order')
+    return [chapter async for chapter in chapters]
+
+
+# Course Outline View
+@csrf_exempt
+async def course_outline(request, course_id):
+    return snapshots.response(request, await snapshots.aget('outline', course_id))
+
+
+# Course Articles View
+@csrf_exempt
+async def course_articles(request, course_id):
+    if not any(param in request.GET for param in ARTICLE_PARAMS):
+        return snapshots.response(request, await snapshots.aget('articles', course_id))
+
+    try:
+        fields, page, limit = article_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    course = await Course.objects.filter(pk=course_id).values('id', 'title').afirst()
+    if course is None:
+        raise Http404('No Course matches the given query.')
+    articles = article_queryset(course_id, fields, page, limit)
+
+    if request.GET.get('stream', 'false') == 'true':
+        return StreamingHttpResponse(
+            astream_ndjson(course, articles.aiterator(chunk_size=ARTICLE_STREAM_CHUNK_SIZE)),
+            content_type='application/x-ndjson',
+        )
+
+    rows = [article async for article in articles]
+    return JsonResponse({'course': dict(course, articles=rows), 'page': page, 'limit': limit})
+
+
+async def astream_ndjson(course, articles):
+    yield ndjson_line({'course': course})
+    async for article in articles:
+        yield ndjson_line(article)
+
+
+# Chapter Progress View
+@csrf_exempt
+@login_required
+async def progress_view(request, course_id, chapter_id):
+    user = await request.auser()
+    chapter = await aget_object_or_404(Chapter.objects.select_related('course'), id=chapter_id)
+
+    enrollment = await Enrollment.objects.filter(user=user, course_id=chapter.course_id).afirst()
+    if not enrollment:
+        return JsonResponse({'error': 'You are not enrolled in this course.'}, status=403)
+
+    progress = await progress_store().aget(user, chapter)
+    return JsonResponse({'progress': progress_payload(enrollment, chapter, progress)}, status=200)
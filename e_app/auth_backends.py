@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+# ModelBackend with a cached user lookup. Every authenticated request loads its user by the id
+# stored in the session; this backend keeps that row in the AUTH_USER_CACHE_ALIAS cache for
+# AUTH_USER_CACHE_TIMEOUT seconds. Saving or deleting a user drops the entry (see signals.py),
+# so password, is_active and permission flag changes apply on the next request. Queryset
+# update() calls skip the signals and are only picked up once the entry expires.
+
+
+def _cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    _cache().delete(_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 0)
+        if not timeout:
+            return super().get_user(user_id)
+        user = _cache().get(_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            _cache().set(_key(user_id), user, timeout)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,25 @@
+import math
+
+# Helpers shared by the benchmark management commands
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(latencies, seconds):
+    # Throughput and latency percentiles (in milliseconds) for one benchmark run
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'seconds': round(seconds, 4),
+        'throughput': round(len(latencies) / seconds, 1) if seconds else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import db_routing
+
+# Serialized course, chapter and article payloads are cached here. Only shared
+# catalog content goes in this cache; per-user progress is always read fresh and
+# merged in by the views. The course, outline and articles kinds hold the rendered
+# snapshots of e_app.snapshots. Hits and misses are counted in this process's memory, not in
+# the cache, so a lookup costs no extra round trip; each worker reports its own.
+
+# Bump when the shape of a cached payload changes so old entries are ignored
+CATALOG_CACHE_VERSION = 3
+
+KINDS = ('list', 'course', 'outline', 'chapters', 'articles')
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    timeout = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+    if db_routing.read_alias():
+        # Built from a replica, which may not have the write that last invalidated the entry yet
+        return min(timeout, db_routing.sticky_seconds())
+    return timeout
+
+
+# Every course list page is keyed under this generation number; bumping it drops all pages at once
+LIST_GENERATION_KEY = 'catalog:list:generation'
+
+
+def _list_generation(cache):
+    cache.add(LIST_GENERATION_KEY, 1, timeout=None, version=CATALOG_CACHE_VERSION)
+    return cache.get(LIST_GENERATION_KEY, 1, version=CATALOG_CACHE_VERSION)
+
+
+async def _alist_generation(cache):
+    await cache.aadd(LIST_GENERATION_KEY, 1, timeout=None, version=CATALOG_CACHE_VERSION)
+    return await cache.aget(LIST_GENERATION_KEY, 1, version=CATALOG_CACHE_VERSION)
+
+
+def _list_key(generation, object_id):
+    # List pages are keyed by their query parameters, hashed to keep keys short and backend-safe
+    params = hashlib.md5(repr(object_id).encode()).hexdigest()
+    return f'catalog:list:{generation}:{params}'
+
+
+def _key(kind, object_id=None):
+    if kind == 'list':
+        return _list_key(_list_generation(_cache()), object_id)
+    return f'catalog:{kind}' if object_id is None else f'catalog:{kind}:{object_id}'
+
+
+async def _akey(kind, object_id=None):
+    if kind == 'list':
+        return _list_key(await _alist_generation(_cache()), object_id)
+    return _key(kind, object_id)
+
+
+def _count(kind, outcome):
+    with _counts_lock:
+        _counts[kind, outcome] += 1
+
+
+def get_or_build(kind, object_id, build):
+    # Return the cached payload, or call build() and cache its result.
+    # Exceptions raised by build() (e.g. Http404) propagate and nothing is cached.
+    cache = _cache()
+    key = _key(kind, object_id)
+    payload = cache.get(key, version=CATALOG_CACHE_VERSION)
+    if payload is not None:
+        _count(kind, 'hits')
+        return payload
+
+    _count(kind, 'misses')
+    payload = build()
+    cache.set(key, payload, timeout=_timeout(), version=CATALOG_CACHE_VERSION)
+    return payload
+
+
+async def aget_or_build(kind, object_id, build):
+    # get_or_build() for async views; build is an async callable
+    cache = _cache()
+    key = await _akey(kind, object_id)
+    payload = await cache.aget(key, version=CATALOG_CACHE_VERSION)
+    if payload is not None:
+        _count(kind, 'hits')
+        return payload
+
+    _count(kind, 'misses')
+    payload = await build()
+    await cache.aset(key, payload, timeout=_timeout(), version=CATALOG_CACHE_VERSION)
+    return payload
+
+
+def invalidate(kind, object_id=None):
+    _cache().delete(_key(kind, object_id), version=CATALOG_CACHE_VERSION)
+
+
+def invalidate_list():
+    cache = _cache()
+    _list_generation(cache)
+    try:
+        cache.incr(LIST_GENERATION_KEY, version=CATALOG_CACHE_VERSION)
+    except ValueError:
+        # Evicted in between; any fresh value that differs from the old one will do
+        cache.set(LIST_GENERATION_KEY, time.time_ns(), timeout=None, version=CATALOG_CACHE_VERSION)
+
+
+def invalidate_course(course_id):
+    # Everything that embeds the course's own fields
+    invalidate_list()
+    _cache().delete_many(
+        [_key('course', course_id), _key('outline', course_id), _key('articles', course_id)],
+        version=CATALOG_CACHE_VERSION,
+    )
+
+
+def stats():
+    with _counts_lock:
+        counts = dict(_counts)
+    result = {}
+    for kind in KINDS:
+        hits = counts.get((kind, 'hits'), 0)
+        misses = counts.get((kind, 'misses'), 0)
+        total = hits + misses
+        result[kind] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None,
+        }
+    return result
+
+
+def reset_stats():
+    with _counts_lock:
+        _counts.clear()
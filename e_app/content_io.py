@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Max
+
+from . import aggregates, catalog_cache, search, snapshots
+from .models import Article, Chapter, Course
+from .progress import ensure_slots, progress_backend
+
+# Bulk import and export of whole courses (with their chapters and articles).
+#
+# JSON Lines: one course per line,
+#   {"id": 1, "title": ..., "description": ..., "category": ...,
+#    "chapters": [{"title", "description", "order"}, ...], "articles": [{"title", "content", "order"}, ...]}
+# CSV: one row per course, chapter or article, each course row followed by its chapters and
+# articles, with the columns in CSV_COLUMNS.
+#
+# On import a course whose id exists is updated, and its chapters and articles are matched by
+# order: existing ones are updated, missing ones created, and none are deleted (deleting a
+# chapter would delete its progress). Courses without an id, or with an unknown one, are created.
+
+FORMATS = ('jsonl', 'csv')
+CSV_COLUMNS = ('type', 'course_id', 'title', 'description', 'category', 'content', 'order')
+COURSE_FIELDS = ('title', 'description', 'category')
+CHAPTER_FIELDS = ('title', 'description', 'order')
+ARTICLE_FIELDS = ('title', 'content', 'order')
+
+# Courses read per query when exporting, and written per transaction when importing
+CONTENT_CHUNK_SIZE = 200
+
+
+class ContentImportError(ValueError):
+    pass
+
+
+# --- Export ----------------------------------------------------------------------
+
+def iter_courses(queryset=None, chunk_size=CONTENT_CHUNK_SIZE):
+    # Yield course dicts a chunk at a time: three queries per chunk, whatever its size
+    queryset = (queryset if queryset is not None else Course.objects.all()).order_by('id')
+    last_id = 0
+    while True:
+        courses = list(queryset.filter(id__gt=last_id).values('id', *COURSE_FIELDS)[:chunk_size])
+        if not courses:
+            return
+        last_id = courses[-1]['id']
+        ids = [course['id'] for course in courses]
+        chapters = Chapter.objects.filter(course_id__in=ids).order_by('course_id', 'order', 'id')
+        articles = Article.objects.filter(course_id__in=ids).order_by('course_id', 'order', 'id')
+        grouped_chapters = _group(chapters.values('course_id', *CHAPTER_FIELDS))
+        grouped_articles = _group(articles.values('course_id', *ARTICLE_FIELDS))
+        for course in courses:
+            course['chapters'] = grouped_chapters.get(course['id'], [])
+            course['articles'] = grouped_articles.get(course['id'], [])
+            yield course
+
+
+def _group(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.pop('course_id'), []).append(row)
+    return grouped
+
+
+def export_lines(courses, fmt):
+    # Serialized lines (with line endings) for an iterable of course dicts
+    if fmt == 'jsonl':
+        for course in courses:
+            yield json.dumps(course) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def row(*values):
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    yield row(*CSV_COLUMNS)
+    for course in courses:
+        yield row('course', course['id'], course['title'], course['description'], course['category'] or '', '', '')
+        for chapter in course['chapters']:
+            yield row('chapter', course['id'], chapter['title'], chapter['description'] or '', '', '', chapter['order'])
+        for article in course['articles']:
+            yield row('article', course['id'], article['title'], '', '', article['content'], article['order'])
+
+
+# --- Import ----------------------------------------------------------------------
+
+def read_courses(lines, fmt):
+    # Parse an iterable of text lines into course dicts, one course at a time
+    if fmt == 'jsonl':
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                course = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ContentImportError(f'Line {number}: {e}')
+            yield _clean_course(course, f'Line {number}')
+        return
+
+    reader = csv.DictReader(lines)
+    missing = set(CSV_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise ContentImportError(f'Missing CSV columns: {", ".join(sorted(missing))}')
+    course = None
+    for row in reader:
+        where = f'Row {reader.line_num}'
+        if row['type'] == 'course':
+            if course is not None:
+                yield _clean_course(course, course['where'])
+            course = {
+                'id': row['course_id'] or None, 'title': row['title'], 'description': row['description'],
+                'category': row['category'] or None, 'chapters': [], 'articles': [], 'where': where,
+            }
+        elif row['type'] in ('chapter', 'article'):
+            if course is None or (row['course_id'] or None) != course['id']:
+                raise ContentImportError(f'{where}: {row["type"]} row does not follow its course row')
+            if row['type'] == 'chapter':
+                course['chapters'].append({'title': row['title'], 'description': row['description'], 'order': row['order']})
+            else:
+                course['articles'].append({'title': row['title'], 'content': row['content'], 'order': row['order']})
+        else:
+            raise ContentImportError(f'{where}: unknown row type {row["type"]!r}')
+    if course is not None:
+        yield _clean_course(course, course['where'])
+
+
+def _clean_course(course, where):
+    if not isinstance(course, dict) or not course.get('title'):
+        raise ContentImportError(f'{where}: every course needs a title')
+    try:
+        cleaned = {
+            'id': int(course['id']) if course.get('id') not in (None, '') else None,
+            'title': str(course['title']),
+            'description': str(course.get('description') or ''),
+            'category': course.get('category') or None,
+            'chapters': [
+                {'title': str(chapter['title']), 'description': chapter.get('description') or None,
+                 'order': int(chapter['order'])}
+                for chapter in course.get('chapters', [])
+            ],
+            'articles': [
+                {'title': str(article['title']), 'content': str(article.get('content') or ''),
+                 'order': int(article['order'])}
+                for article in course.get('articles', [])
+            ],
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ContentImportError(f'{where}: invalid course data ({e!r})')
+    for kind in ('chapters', 'articles'):
+        orders = [item['order'] for item in cleaned[kind]]
+        if len(orders) != len(set(orders)):
+            raise ContentImportError(f'{where}: {kind} orders must be unique within a course')
+    return cleaned
+
+
+def import_courses(courses, chunk_size=CONTENT_CHUNK_SIZE, progress=None):
+    # Write course dicts chunk by chunk, one transaction per chunk, so memory stays bounded
+    # by the chunk size. progress(totals) is called after every chunk. Returns the totals.
+    totals = {'courses_created': 0, 'courses_updated': 0, 'chapters_created': 0,
+              'chapters_updated': 0, 'articles_created': 0, 'articles_updated': 0}
+    courses = iter(courses)
+    while True:
+        chunk = list(islice(courses, chunk_size))
+        if not chunk:
+            return totals
+        with transaction.atomic():
+            for key, count in _import_chunk(chunk).items():
+                totals[key] += count
+        if progress:
+            progress(totals)
+
+
+def _import_chunk(chunk):
+    counts = {}
+    ids = [course['id'] for course in chunk if course['id'] is not None]
+    existing = Course.objects.in_bulk(ids)
+
+    updated, created = [], []
+    for course in chunk:
+        instance = existing.get(course['id'])
+        if instance is None:
+            instance = Course()
+            created.append(instance)
+        else:
+            updated.append(instance)
+        for field in COURSE_FIELDS:
+            setattr(instance, field, course[field])
+        course['instance'] = instance
+    Course.objects.bulk_create(created)
+    Course.objects.bulk_update(updated, COURSE_FIELDS)
+    counts['courses_created'], counts['courses_updated'] = len(created), len(updated)
+
+    course_ids = [course['instance'].pk for course in chunk]
+    chapters_created, chapters_updated = _merge_children(Chapter, CHAPTER_FIELDS, chunk, 'chapters', course_ids)
+    articles_created, articles_updated = _merge_children(Article, ARTICLE_FIELDS, chunk, 'articles', course_ids)
+    counts.update(
+        chapters_created=len(chapters_created), chapters_updated=len(chapters_updated),
+        articles_created=len(articles_created), articles_updated=len(articles_updated),
+    )
+
+    # Bulk writes skip the model signals, so do their work once for the whole chunk
+    search.index_instances(
+        [course['instance'] for course in chunk] + chapters_created + chapters_updated
+        + articles_created + articles_updated
+    )
+    store = progress_backend()
+    for course in updated:
+        aggregates.recompute_course(store, course.pk, fix=True)
+    _invalidate(course_ids)
+    return counts
+
+
+def _merge_children(model, fields, chunk, key, course_ids):
+    # Match by (course, order); returns the created and updated instances
+    existing = {}
+    for instance in model.objects.filter(course_id__in=course_ids).order_by('id'):
+        existing.setdefault((instance.course_id, instance.order), instance)
+    next_slots = {}
+    if model is Chapter:
+        # Slots are normally assigned by a pre_save signal, which bulk_create skips; chapters
+        # written that way before get theirs first, so new slots follow them
+        unslotted = Chapter.objects.filter(course_id__in=course_ids, slot__isnull=True)
+        for course_id in set(unslotted.values_list('course_id', flat=True)):
+            ensure_slots(course_id)
+        slots = Chapter.objects.filter(course_id__in=course_ids).values('course_id').annotate(top=Max('slot'))
+        next_slots = {row['course_id']: (row['top'] + 1 if row['top'] is not None else 0) for row in slots}
+
+    created, updated = [], []
+    for course in chunk:
+        course_id = course['instance'].pk
+        for item in course[key]:
+            instance = existing.get((course_id, item['order']))
+            if instance is None:
+                instance = model(course_id=course_id)
+                if model is Chapter:
+                    instance.slot = next_slots.get(course_id, 0)
+                    next_slots[course_id] = instance.slot + 1
+                created.append(instance)
+            else:
+                updated.append(instance)
+            for field in fields:
+                setattr(instance, field, item[field])
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(updated, fields)
+    return created, updated
+
+
+def _invalidate(course_ids):
+    # After the commit, as in e_app.signals: a reader between the invalidation and the commit
+    # would cache or render the old rows again, and nothing would clear them afterwards
+    def update():
+        for course_id in course_ids:
+            catalog_cache.invalidate_course(course_id)
+            catalog_cache.invalidate('chapters', course_id)
+        snapshots.refresh(course_ids)
+    transaction.on_commit(update)
+
+
+def detect_format(name, default='jsonl'):
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return default
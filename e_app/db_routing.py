@@ -0,0 +1,137 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Read replica routing. settings.DATABASE_REPLICAS lists DATABASES aliases that replicate the
+# default (primary) database. ReplicaRoutingMiddleware sends the reads of GET requests to the
+# catalog views in READ_REPLICA_VIEWS and to admin changelists to one of them; every other
+# read, and every write, goes to the primary.
+#
+# Read-your-writes: a request that writes (login, enrollment, a progress POST, ...) gets a
+# cookie that keeps its client on the primary for READ_REPLICA_STICKY_SECONDS, which must
+# exceed the replication lag, and the rest of that request reads from the primary too.
+# Catalog cache entries built from a replica are kept no longer than that window either, so
+# a lagging replica cannot outlive the invalidation of a write in the cache.
+
+PIN_COOKIE = 'db_primary'
+
+# Routing of the request being handled; a context variable, so concurrent async requests and
+# the sync_to_async threads running their queries each see their own
+_current = ContextVar('db_routing', default=None)
+_primary = ContextVar('db_routing_primary', default=False)
+
+
+class RequestRouting:
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def sticky_seconds():
+    return getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 15)
+
+
+def read_alias():
+    # The replica this context reads from, or None for the primary
+    routing = _current.get()
+    if routing is None or routing.wrote or _primary.get():
+        return None
+    return routing.replica
+
+
+@contextmanager
+def use_primary():
+    # Read from the primary inside the block, e.g. to render data that is written back
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.wrote = True
+        # Explicit, so saving an instance read from a replica still writes to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+def replica_eligible(request):
+    if request.method not in ('GET', 'HEAD') or PIN_COOKIE in request.COOKIES:
+        return False
+    match = request.resolver_match
+    if match is None:
+        return False
+    if match.namespace == 'admin':
+        return match.url_name.endswith('_changelist')
+    return match.url_name in getattr(settings, 'READ_REPLICA_VIEWS', ())
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # A sync process_view() would cost a thread handoff per async request
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        routing = RequestRouting()
+        token = _current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(response, routing)
+
+    async def __acall__(self, request):
+        routing = RequestRouting()
+        token = _current.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(response, routing)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request)
+
+    def route(self, request):
+        routing = _current.get()
+        aliases = replicas()
+        if routing is not None and aliases and replica_eligible(request):
+            routing.replica = random.choice(aliases)
+
+    def finish(self, response, routing):
+        if routing.wrote and replicas():
+            response.set_cookie(PIN_COOKIE, '1', max_age=sticky_seconds(), httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,105 @@
+import time
+
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+
+from . import enrollment_cache
+from .models import Enrollment
+from .progress import progress_store
+
+# Users handled per transaction when enrolling a cohort
+COHORT_CHUNK_SIZE = 500
+
+
+def _chapter_ids(course):
+    return list(course.chapters.order_by('order', 'id').values_list('id', flat=True))
+
+
+# Enrollment rows per INSERT statement
+ENROLLMENT_BATCH_SIZE = 500
+
+
+def insert_enrollments(course_id, user_ids, chapter_ids):
+    # INSERT ... ON CONFLICT (user_id, course_id) DO NOTHING RETURNING: one statement per batch,
+    # race-free against concurrent requests. Returns only the enrollments this call created.
+    # Columns and values come from the model's fields, prepared as bulk_create would, so
+    # defaults and fields added later are written without touching this query.
+    connection = connections[router.db_for_write(Enrollment)]
+    ops = connection.ops
+    meta = Enrollment._meta
+    fields = [field for field in meta.concrete_fields if not field.primary_key]
+    table = ops.quote_name(meta.db_table)
+    columns = ', '.join(ops.quote_name(field.column) for field in fields)
+    row = f"({', '.join(['%s'] * len(fields))})"
+    user_column, course_column = (ops.quote_name(meta.get_field(name).column) for name in ('user', 'course'))
+    next_chapter_id = chapter_ids[0] if chapter_ids else None
+
+    created = []
+    for start in range(0, len(user_ids), ENROLLMENT_BATCH_SIZE):
+        batch = user_ids[start:start + ENROLLMENT_BATCH_SIZE]
+        params = []
+        for user_id in batch:
+            enrollment = Enrollment(
+                user_id=user_id, course_id=course_id, total_chapters=len(chapter_ids), next_chapter_id=next_chapter_id,
+            )
+            params += [field.get_db_prep_save(field.pre_save(enrollment, True), connection) for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({columns})
+                VALUES {', '.join([row] * len(batch))}
+                ON CONFLICT ({user_column}, {course_column}) DO NOTHING
+                RETURNING {ops.quote_name(meta.pk.column)}, {user_column}
+                """,
+                params,
+            )
+            created += [Enrollment(id=pk, user_id=user_id, course_id=course_id) for pk, user_id in cursor.fetchall()]
+    return created
+
+
+def enroll_user(user, course):
+    # Create the enrollment and its progress storage in a single transaction, using one
+    # batched INSERT for the progress instead of one query per chapter.
+    # Returns None if the user was already enrolled.
+    chapter_ids = _chapter_ids(course)
+    with transaction.atomic():
+        created = insert_enrollments(course.id, [user.id], chapter_ids)
+        if not created:
+            return None
+        progress_store().init_enrollments(created, chapter_ids)
+    # The raw insert sends no signals
+    enrollment_cache.forget(user.id)
+    return created[0]
+
+
+def enroll_users(course, user_ids, chunk_size=COHORT_CHUNK_SIZE):
+    # Enroll a list of users into a course, chunk by chunk. Each chunk is one
+    # transaction: unknown users are filtered out with one query, then enrollments
+    # (skipping existing ones) and progress rows are written with bulk inserts.
+    # Returns one report entry per chunk, including how long it took.
+    chapter_ids = _chapter_ids(course)
+    user_ids = list(dict.fromkeys(user_ids))  # Drop duplicates, keep order
+    report = []
+
+    for index, start in enumerate(range(0, len(user_ids), chunk_size)):
+        chunk = user_ids[start:start + chunk_size]
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            existing_users = set(User.objects.filter(id__in=chunk).values_list('id', flat=True))
+            enrollments = insert_enrollments(
+                course.id, [uid for uid in chunk if uid in existing_users], chapter_ids
+            )
+            progress_store().init_enrollments(enrollments, chapter_ids)
+        enrollment_cache.forget_many([enrollment.user_id for enrollment in enrollments])
+
+        report.append({
+            'chunk': index,
+            'users': len(chunk),
+            'enrolled': len(enrollments),
+            'already_enrolled': len(existing_users) - len(enrollments),
+            'unknown_users': len(chunk) - len(existing_users),
+            'seconds': round(time.perf_counter() - started, 4),
+        })
+
+    return report
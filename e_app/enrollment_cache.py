@@ -0,0 +1,85 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Enrollment
+
+# Per-user cache of enrolled course ids, so the enrollment check of a chapter request is a
+# set membership test instead of a query. Saving or deleting an Enrollment drops the user's
+# entry (see signals.py) and the bulk enrollment paths, which skip the signals, drop theirs
+# themselves. A course missing from a cached set is confirmed against the database before
+# access is refused, so an entry that predates an enrollment never locks a student out; the
+# cache must be shared by every worker for unenrollments to apply before the entry expires.
+# Hits, misses and those rechecks are counted for enrollment_cache_stats, in this process's
+# memory: counting them in the shared cache would cost two more round trips per lookup than
+# the query the cache saves. Each worker reports its own counts, like the request metrics.
+
+OUTCOMES = ('hits', 'misses', 'rechecks')
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'ENROLLMENT_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'ENROLLMENT_CACHE_TIMEOUT', 60 * 60)
+
+
+def _key(user_id):
+    return f'enrollments:user:{user_id}'
+
+
+def _count(outcome):
+    with _counts_lock:
+        _counts[outcome] += 1
+
+
+def enrolled_among(user, course_ids):
+    # The subset of course_ids the user is enrolled in
+    course_ids = set(course_ids)
+    cached = _cache().get(_key(user.pk))
+    if cached is None:
+        _count('misses')
+        cached = frozenset(Enrollment.objects.filter(user=user).values_list('course_id', flat=True))
+        _cache().set(_key(user.pk), cached, _timeout())
+        return course_ids & cached
+
+    _count('hits')
+    missing = course_ids - cached
+    if not missing:
+        return course_ids
+    _count('rechecks')
+    found = set(Enrollment.objects.filter(user=user, course_id__in=missing).values_list('course_id', flat=True))
+    if found:
+        forget(user.pk)
+    return (course_ids & cached) | found
+
+
+def is_enrolled(user, course_id):
+    return bool(enrolled_among(user, [course_id]))
+
+
+def forget(user_id):
+    _cache().delete(_key(user_id))
+
+
+def forget_many(user_ids):
+    _cache().delete_many([_key(user_id) for user_id in user_ids])
+
+
+def stats():
+    with _counts_lock:
+        result = {outcome: _counts[outcome] for outcome in OUTCOMES}
+    total = result['hits'] + result['misses']
+    result['hit_rate'] = round(result['hits'] / total, 4) if total else None
+    return result
+
+
+def reset_stats():
+    with _counts_lock:
+        _counts.clear()
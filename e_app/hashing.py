@@ -0,0 +1,9 @@
+# The function e_app.provisioning runs in its password hashing processes. It is kept in a
+# module that imports nothing from Django: a worker started with the spawn or forkserver
+# method imports the module of every function it is sent, and importing models there, in a
+# process where Django was never set up, raises AppRegistryNotReady. The hasher it is given
+# comes from django.contrib.auth.hashers, which unpickles without settings or models.
+
+
+def encode(hasher, password):
+    return hasher.encode(password, hasher.salt())
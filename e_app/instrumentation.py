@@ -0,0 +1,234 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse as BaseJsonResponse
+
+# Per-request SQL and timing instrumentation, switched on with REQUEST_METRICS_ENABLED.
+# For every request RequestMetricsMiddleware records the query count, database time, view
+# time and JSON serialization time, sends them back as a Server-Timing header, logs slow
+# requests to the 'e_app.requests' logger and adds them to rolling per-route histograms,
+# which staff can read from /metrics/.
+
+logger = logging.getLogger('e_app.requests')
+
+# Metrics of the request being handled; a context variable, so concurrent async requests
+# and the sync_to_async threads running their queries each see their own
+_current = ContextVar('request_metrics', default=None)
+
+# Upper bounds of the latency histogram buckets, in milliseconds; one more bucket holds the rest
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.view_ms = 0.0
+        self.serialize_ms = 0.0
+        self.total_ms = 0.0
+        self.view_started = None
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_ms:.2f};desc="{self.queries} queries", view;dur={self.view_ms:.2f}, '
+            f'serialize;dur={self.serialize_ms:.2f}, total;dur={self.total_ms:.2f}'
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    # Execute wrapper installed on every connection as it connects (see apps.py); costs one
+    # lookup when no request is being measured
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_ms += (time.perf_counter() - started) * 1000
+
+
+def install_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class JsonResponse(BaseJsonResponse):
+    # JsonResponse that counts its encoding time as serialization time of the current request
+    def __init__(self, *args, **kwargs):
+        metrics = _current.get()
+        started = time.perf_counter()
+        super().__init__(*args, **kwargs)
+        if metrics is not None:
+            metrics.serialize_ms += (time.perf_counter() - started) * 1000
+
+
+# --- Rolling histograms --------------------------------------------------------
+
+class RollingHistogram:
+    # Latency histogram over the last `window` seconds, kept as one slot per `slot_seconds`
+    def __init__(self, window, slot_seconds=60):
+        self.window = window
+        self.slot_seconds = slot_seconds
+        self.slots = {}
+
+    def record(self, metrics, now):
+        slot = self.slots.setdefault(int(now // self.slot_seconds), {
+            'buckets': [0] * (len(BUCKETS_MS) + 1), 'count': 0, 'total_ms': 0.0, 'db_ms': 0.0, 'queries': 0,
+        })
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if metrics.total_ms <= bound), len(BUCKETS_MS))
+        slot['buckets'][index] += 1
+        slot['count'] += 1
+        slot['total_ms'] += metrics.total_ms
+        slot['db_ms'] += metrics.db_ms
+        slot['queries'] += metrics.queries
+        self.expire(now)
+
+    def expire(self, now):
+        oldest = int((now - self.window) // self.slot_seconds)
+        for key in [key for key in self.slots if key <= oldest]:
+            del self.slots[key]
+
+    def snapshot(self, now):
+        self.expire(now)
+        buckets = [0] * (len(BUCKETS_MS) + 1)
+        count = total_ms = db_ms = queries = 0
+        for slot in self.slots.values():
+            buckets = [a + b for a, b in zip(buckets, slot['buckets'])]
+            count += slot['count']
+            total_ms += slot['total_ms']
+            db_ms += slot['db_ms']
+            queries += slot['queries']
+        if not count:
+            return None
+        return {
+            'count': count,
+            'mean_ms': round(total_ms / count, 2),
+            'mean_db_ms': round(db_ms / count, 2),
+            'mean_queries': round(queries / count, 2),
+            'p50_ms': bucket_percentile(buckets, count, 50),
+            'p95_ms': bucket_percentile(buckets, count, 95),
+            'p99_ms': bucket_percentile(buckets, count, 99),
+            'buckets': {
+                **{f'le_{bound}': n for bound, n in zip(BUCKETS_MS, buckets)},
+                'over': buckets[-1],
+            },
+        }
+
+
+def bucket_percentile(buckets, count, pct):
+    # Upper bound of the bucket holding the percentile; None when it lies past the last bound
+    target = pct / 100 * count
+    seen = 0
+    for bound, n in zip(BUCKETS_MS, buckets):
+        seen += n
+        if seen >= target:
+            return bound
+    return None
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def record(route, metrics):
+    now = time.time()
+    with _lock:
+        histogram = _histograms.get(route)
+        if histogram is None:
+            histogram = _histograms[route] = RollingHistogram(getattr(settings, 'REQUEST_METRICS_WINDOW', 300))
+        histogram.record(metrics, now)
+
+
+def snapshot():
+    now = time.time()
+    with _lock:
+        routes = {route: histogram.snapshot(now) for route, histogram in _histograms.items()}
+    return {route: data for route, data in sorted(routes.items()) if data is not None}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+# --- Middleware --------------------------------------------------------------------
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # A sync process_view() would cost a thread handoff per async request
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started()
+
+    def view_started(self):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def finish(self, request, response, metrics):
+        now = time.perf_counter()
+        metrics.total_ms = (now - metrics.started) * 1000
+        if metrics.view_started is not None:
+            metrics.view_ms = (now - metrics.view_started) * 1000
+        response['Server-Timing'] = metrics.server_timing()
+
+        match = request.resolver_match
+        route = match.view_name if match else '<unresolved>'
+        record(route, metrics)
+
+        if metrics.total_ms >= getattr(settings, 'REQUEST_METRICS_SLOW_MS', 500):
+            entry = {
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'total_ms': round(metrics.total_ms, 2),
+                'view_ms': round(metrics.view_ms, 2),
+                'db_ms': round(metrics.db_ms, 2),
+                'serialize_ms': round(metrics.serialize_ms, 2),
+                'queries': metrics.queries,
+            }
+            logger.warning('slow request %s', json.dumps(entry), extra={'request_metrics': entry})
+        return response
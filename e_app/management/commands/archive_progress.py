@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from e_app import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Pack the Progress rows of finished and inactive enrollments into one archive row each. '
+        'Runs in short batches and can be interrupted and re-run at any time; archived progress '
+        'is unpacked again on the next progress write.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE,
+                            help='Enrollments archived per transaction (default: %(default)s).')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches, to leave room for other writes.')
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'PROGRESS_BACKEND', 'rows') != 'rows':
+            raise CommandError('Only the rows progress backend is archived; bitmaps are already one row per enrollment.')
+
+        def progress(totals):
+            self.stdout.write(f"  archived {totals['enrollments']} enrollments")
+
+        totals = archive.archive(
+            batch_size=options['batch_size'], pause=options['pause'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['enrollments']} enrollments ({totals['rows']} progress rows)."
+        ))
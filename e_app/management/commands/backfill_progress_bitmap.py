@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from e_app.archive import unpack
+from e_app.models import Chapter, Course, Enrollment, EnrollmentProgress, Progress, ProgressArchive
+from e_app.progress import ensure_slots, set_bit
+
+
+class Command(BaseCommand):
+    help = 'Convert Progress rows into one EnrollmentProgress bitmap per enrollment.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Enrollments converted per transaction (default: %(default)s).')
+        parser.add_argument('--delete-rows', action='store_true',
+                            help='Delete the converted Progress rows once their bitmap is written.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Every chapter needs a slot before it can be mapped to a bit
+        for course_id in Course.objects.values_list('id', flat=True).iterator():
+            ensure_slots(course_id)
+
+        last_id, converted = 0, 0
+        while True:
+            enrollments = list(
+                Enrollment.objects.filter(id__gt=last_id).order_by('id').values('id', 'user_id', 'course_id')[:batch_size]
+            )
+            if not enrollments:
+                break
+            last_id = enrollments[-1]['id']
+
+            with transaction.atomic():
+                self.convert(enrollments, options['delete_rows'])
+            converted += len(enrollments)
+            self.stdout.write(f'Converted {converted} enrollments')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {converted} enrollments converted.'))
+
+    def convert(self, enrollments, delete_rows):
+        by_pair = {(e['user_id'], e['course_id']): e['id'] for e in enrollments}
+        user_ids = {user_id for user_id, _ in by_pair}
+        course_ids = {course_id for _, course_id in by_pair}
+
+        # One query for all completed or un-completed progress of this batch's users and courses
+        rows = Progress.objects.filter(
+            Q(completed=True) | Q(uncompleted_at__isnull=False),
+            user_id__in=user_ids, chapter__course_id__in=course_ids,
+        ).values_list('user_id', 'chapter__course_id', 'chapter__slot', 'completed', 'completed_at', 'uncompleted_at')
+
+        records = {
+            enrollment_id: EnrollmentProgress(enrollment_id=enrollment_id, bits=b'', completed_at={}, uncompleted_at={})
+            for enrollment_id in by_pair.values()
+        }
+        for user_id, course_id, slot, completed, completed_at, uncompleted_at in rows:
+            enrollment_id = by_pair.get((user_id, course_id))
+            if enrollment_id is None:
+                continue
+            record = records[enrollment_id]
+            if not completed:
+                record.uncompleted_at[str(slot)] = uncompleted_at.isoformat()
+                continue
+            record.bits = set_bit(record.bits, slot, True)
+            if completed_at:
+                record.completed_at[str(slot)] = completed_at.isoformat()
+
+        # Archived enrollments have no rows left; their progress is in the packed archive
+        archives = {
+            enrollment_id: unpack(completed_at) for enrollment_id, completed_at in
+            ProgressArchive.objects.filter(enrollment_id__in=records).values_list('enrollment_id', 'completed_at')
+        }
+        slots = dict(Chapter.objects.filter(
+            id__in={chapter_id for times in archives.values() for chapter_id in times}
+        ).values_list('id', 'slot'))
+        for enrollment_id, times in archives.items():
+            record = records[enrollment_id]
+            for chapter_id, completed_at in times.items():
+                if chapter_id not in slots:
+                    continue
+                record.bits = set_bit(record.bits, slots[chapter_id], True)
+                if completed_at:
+                    record.completed_at[str(slots[chapter_id])] = completed_at.isoformat()
+
+        EnrollmentProgress.objects.bulk_create(
+            records.values(),
+            update_conflicts=True,
+            unique_fields=['enrollment'],
+            update_fields=['bits', 'completed_at', 'uncompleted_at'],
+        )
+
+        if delete_rows:
+            # Only the exact (user, course) pairs of this batch; others may not be converted yet
+            pairs = Q()
+            for user_id, course_id in by_pair:
+                pairs |= Q(user_id=user_id, chapter__course_id=course_id)
+            Progress.objects.filter(pairs).delete()
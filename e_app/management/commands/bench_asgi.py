@@ -0,0 +1,107 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from e_app.benchmarking import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and latency of the sync views under WSGI with the async views under ASGI. '
+        'Requests go through the in-process handlers against the configured database, so run it '
+        'against a populated local database, not production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/courses/'],
+                            help='Paths to request, round robin (default: /courses/).')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per handler.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--user', help='Username to log in as, for views that require a login.')
+        parser.add_argument('--handler', choices=('wsgi', 'asgi', 'both'), default='both')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}.")
+
+        handlers = ('wsgi', 'asgi') if options['handler'] == 'both' else (options['handler'],)
+        for handler in handlers:
+            run = self.run_wsgi if handler == 'wsgi' else self.run_asgi
+            # The test clients send Host: testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                result = run(options['paths'], options['requests'], options['concurrency'], user)
+            self.stdout.write(
+                f"{handler}: {result['requests']} requests in {result['seconds']}s, "
+                f"{result['throughput']} req/s, p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms, "
+                f"max {result['max_ms']}ms, errors {result['errors']}"
+            )
+
+    def run_wsgi(self, paths, total, concurrency, user):
+        def worker(indexes):
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            timings = []
+            try:
+                for index in indexes:
+                    started = time.perf_counter()
+                    response = client.get(paths[index % len(paths)])
+                    if response.streaming:
+                        # Read streamed bodies so they are timed too
+                        list(response.streaming_content)
+                    timings.append((time.perf_counter() - started, response.status_code))
+            finally:
+                connections.close_all()
+            return timings
+
+        with override_settings(ROOT_URLCONF='super_e.urls'):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = pool.map(worker, [range(n, total, concurrency) for n in range(concurrency)])
+                timings = [timing for result in results for timing in result]
+            return self.report(timings, time.perf_counter() - started)
+
+    def run_asgi(self, paths, total, concurrency, user):
+        async def worker(indexes, client):
+            timings = []
+            for index in indexes:
+                started = time.perf_counter()
+                response = await client.get(paths[index % len(paths)])
+                if response.streaming and response.is_async:
+                    [chunk async for chunk in response.streaming_content]
+                elif response.streaming:
+                    list(response.streaming_content)
+                timings.append((time.perf_counter() - started, response.status_code))
+            return timings
+
+        async def main():
+            clients = []
+            for _ in range(concurrency):
+                client = AsyncClient()
+                if user is not None:
+                    await client.aforce_login(user)
+                clients.append(client)
+            started = time.perf_counter()
+            results = await asyncio.gather(*[
+                worker(range(n, total, concurrency), client) for n, client in enumerate(clients)
+            ])
+            return [timing for result in results for timing in result], time.perf_counter() - started
+
+        with override_settings(ROOT_URLCONF='super_e.asgi_urls'):
+            return self.report(*asyncio.run(main()))
+
+    def report(self, timings, seconds):
+        result = summarize([latency for latency, status in timings], seconds)
+        result['errors'] = sum(1 for latency, status in timings if status >= 400)
+        return result
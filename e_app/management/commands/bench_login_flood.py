@@ -0,0 +1,113 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+
+from e_app.benchmarking import summarize
+
+PHASES = ('idle', 'unprotected', 'protected')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure read latency while background threads flood login/ with wrong passwords: '
+        'without a flood, with the flood and load shedding off, and with it on (THROTTLE_ENABLED). '
+        'Attackers send at a fixed rate, so the offered load is the same in every phase. Run it '
+        'against a local database seeded with `manage.py seed_data`, with the production password hasher.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attackers', type=int, default=4, help='Threads sending login attempts.')
+        parser.add_argument('--rate', type=float, default=20.0, help='Login attempts per second per attacker.')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each phase.')
+        parser.add_argument('--path', default='/courses/', help='Read endpoint to time (default: %(default)s).')
+        parser.add_argument('--distinct-ips', action='store_true',
+                            help='Send every attempt from a new address, so only the hashing cap applies.')
+        parser.add_argument('--phase', action='append', dest='phases', choices=PHASES,
+                            help='Phase to run (can be repeated; default: all).')
+
+    def handle(self, *args, **options):
+        # The test client sends Host: testserver; refused attempts (4xx and 503) are not logged
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        results = {}
+        try:
+            for index, phase in enumerate(options['phases'] or PHASES):
+                with override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], THROTTLE_ENABLED=phase != 'unprotected',
+                ):
+                    attackers = 0 if phase == 'idle' else options['attackers']
+                    results[phase] = self.run_phase(index, attackers, options)
+        finally:
+            request_logger.setLevel(level)
+
+        self.stdout.write(
+            f"{options['attackers']} attackers at {options['rate']} attempts/s each, reading {options['path']} "
+            f"for {options['seconds']}s per phase"
+        )
+        self.stdout.write(
+            f"{'phase':<13}{'reads':>7}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'attempts/s':>12}{'hashed':>8}{'429':>7}{'503':>7}"
+        )
+        for phase, result in results.items():
+            reads, attempts = result['reads'], result['attempts']
+            self.stdout.write(
+                f"{phase:<13}{reads['requests']:>7}{reads['p50_ms']:>9}{reads['p99_ms']:>9}{reads['max_ms']:>9}"
+                f"{result['attempts_per_second']:>12}{attempts[400]:>8}{attempts[429]:>7}{attempts[503]:>7}"
+            )
+
+    def run_phase(self, index, attackers, options):
+        stop = threading.Event()
+        interval = 1 / options['rate']
+        attempts = Counter()
+        lock = threading.Lock()
+
+        def attack(number):
+            client = Client()
+            sent = 0
+            next_at = time.perf_counter()
+            try:
+                # Wait for the next send time; a thread that falls behind sends straight away
+                while not stop.wait(max(0, next_at - time.perf_counter())):
+                    next_at += interval
+                    sent += 1
+                    # A fresh address block per phase, so buckets emptied by an earlier phase don't carry over
+                    address = f'10.{index}.{number}.{sent % 250 + 1}' if options['distinct_ips'] else f'10.{index}.{number}.1'
+                    response = client.post(
+                        '/login/', json.dumps({'email': f'flood-{number}-{sent}@example.com', 'password': 'wrong'}),
+                        content_type='application/json', REMOTE_ADDR=address,
+                    )
+                    with lock:
+                        attempts[response.status_code] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=attack, args=(number,), daemon=True) for number in range(attackers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        client = Client()
+        latencies = []
+        while time.perf_counter() - started < options['seconds']:
+            read_started = time.perf_counter()
+            response = client.get(options['path'])
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latencies.append(time.perf_counter() - read_started)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        return {
+            'reads': summarize(latencies, sum(latencies)),
+            'attempts': attempts,
+            'attempts_per_second': round(sum(attempts.values()) / seconds, 1) if seconds else 0,
+        }
@@ -0,0 +1,182 @@
+import json
+import logging
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver
+
+from e_app.benchmarking import summarize
+from e_app.models import Chapter, Enrollment
+
+DEFAULT_BASELINE = 'bench_baseline.json'
+
+
+def scenarios(enrollment, chapter, staff):
+    # One request builder per named route: index -> (method, path, data, user).
+    # Routes that write (signup, enroll, chapter progress) run against the live data; repeat
+    # enrollments exercise the already-enrolled path after the first request.
+    course_id = enrollment.course_id
+    user = enrollment.user
+    run = uuid.uuid4().hex[:8]
+    return {
+        'signup': lambda i: ('post', '/signup/', {
+            'email': f'bench-{run}-{i}@example.com', 'password1': 'password', 'password2': 'password',
+        }, None),
+        'login': lambda i: ('post', '/login/', json.dumps({'email': user.username, 'password': 'password'}), None),
+        'course_list': lambda i: ('get', '/courses/', {}, None),
+        'course_detail': lambda i: ('get', f'/courses/{course_id}/', {}, None),
+        'course_detail[outline]': lambda i: ('get', f'/courses/{course_id}/', {'outline': 'true'}, user),
+        'course_outline': lambda i: ('get', f'/courses/{course_id}/outline/', {}, None),
+        'course_progress': lambda i: ('get', f'/courses/{course_id}/progress/', {}, user),
+        'course_articles': lambda i: ('get', f'/courses/{course_id}/articles/', {}, None),
+        'course_articles[stream]': lambda i: ('get', f'/courses/{course_id}/articles/', {'stream': 'true'}, None),
+        'enroll_in_course': lambda i: ('post', f'/courses/{course_id}/enroll/', {}, user),
+        'enroll_cohort': lambda i: ('post', f'/courses/{course_id}/enroll/cohort/', json.dumps({'user_ids': [user.id]}), staff),
+        'user_chapter_detail': lambda i: ('post', f'/courses/{course_id}/chapters/{chapter.order}/', {
+            'completed': 'true' if i % 2 else 'false',
+        }, user),
+        'progress_view': lambda i: ('get', f'/courses/{course_id}/chapters/{chapter.id}/progress/', {}, user),
+        'progress_sync': lambda i: ('post', '/progress/sync/', json.dumps({'items': [{
+            'course_id': course_id, 'chapter_id': chapter.id, 'completed': bool(i % 2),
+        }]}), user),
+        'search': lambda i: ('get', '/search/', {'q': chapter.title.split()[0]}, None),
+        'provision_users': lambda i: ('post', '/users/provision/', json.dumps({
+            'email': f'bench-{run}-provisioned-{i}@example.com', 'password': 'password',
+        }), staff),
+        'catalog_cache_stats': lambda i: ('get', '/catalog/cache/stats/', {}, staff),
+        'enrollment_cache_stats': lambda i: ('get', '/enrollments/cache/stats/', {}, staff),
+        'request_metrics': lambda i: ('get', '/metrics/', {}, staff),
+        'course_analytics': lambda i: ('get', f'/courses/{course_id}/analytics/', {}, staff),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every route a number of times and record p50/p95/p99 latency, SQL query count and '
+        'response size, then compare with a stored baseline and fail on regressions. Run it against '
+        'a local database seeded with `manage.py seed_data`; some routes write.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per route.')
+        parser.add_argument('--route', action='append', dest='routes', help='Only run this route (can be repeated).')
+        parser.add_argument('--user', help='Enrolled user to run as (default: the first enrolled user).')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file (default: %(default)s).')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline.')
+        parser.add_argument('--latency-threshold', type=float, default=0.25,
+                            help='Allowed p95 latency increase over the baseline, as a fraction.')
+        parser.add_argument('--min-latency-ms', type=float, default=2.0,
+                            help='p95 increases smaller than this are treated as noise.')
+        parser.add_argument('--query-threshold', type=int, default=0, help='Allowed extra SQL queries per request.')
+        parser.add_argument('--size-threshold', type=float, default=0.10,
+                            help='Allowed response size increase, as a fraction.')
+
+    def handle(self, *args, **options):
+        enrollments = Enrollment.objects.select_related('user').order_by('id')
+        if options['user']:
+            enrollments = enrollments.filter(user__username=options['user'])
+        enrollment = enrollments.first()
+        chapter = enrollment and Chapter.objects.filter(course_id=enrollment.course_id).order_by('order').first()
+        staff = User.objects.filter(is_staff=True).order_by('id').first()
+        if chapter is None or staff is None:
+            raise CommandError('Needs an enrollment in a course with chapters and a staff user; run seed_data first.')
+
+        routes = scenarios(enrollment, chapter, staff)
+        names = {pattern.name for pattern in get_resolver().url_patterns if isinstance(pattern, URLPattern)}
+        for name in sorted(names - {route.split('[')[0] for route in routes}):
+            self.stdout.write(self.style.WARNING(f'No benchmark scenario for route {name!r}'))
+        if options['routes']:
+            unknown = set(options['routes']) - set(routes)
+            if unknown:
+                raise CommandError(f'Unknown routes: {", ".join(sorted(unknown))}')
+            routes = {name: routes[name] for name in options['routes']}
+
+        # The test client sends Host: testserver; expected 4xx responses are not logged
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            # Repeated logins and signups would run into the login throttle (see bench_login_flood)
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], THROTTLE_ENABLED=False):
+                results = {name: self.run_route(build, options['requests']) for name, build in routes.items()}
+        finally:
+            request_logger.setLevel(level)
+
+        self.stdout.write(f"{'route':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'bytes':>9}  errors")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<26}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}"
+                f"{result['queries']:>9}{result['bytes']:>9}  {result['errors']}"
+            )
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps({'routes': results}, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {baseline_path}.'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f'No baseline at {baseline_path}; run with --save-baseline to create one.'))
+            return
+
+        failures = compare(json.loads(baseline_path.read_text())['routes'], results, options)
+        if failures:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def run_route(self, build, requests):
+        clients = {}
+        latencies, queries, sizes, errors = [], [], [], 0
+        for index in range(requests):
+            method, path, data, user = build(index)
+            if user not in clients:
+                clients[user] = Client()
+                if user is not None:
+                    clients[user].force_login(user)
+            content_type = 'application/json' if isinstance(data, str) else None
+            kwargs = {'content_type': content_type} if content_type else {}
+
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = getattr(clients[user], method)(path, data, **kwargs)
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(ctx.captured_queries))
+            sizes.append(len(body))
+            errors += response.status_code >= 500
+
+        result = summarize(latencies, sum(latencies))
+        return {
+            'p50_ms': result['p50_ms'],
+            'p95_ms': result['p95_ms'],
+            'p99_ms': result['p99_ms'],
+            'queries': int(statistics.median(queries)),
+            'bytes': int(statistics.median(sizes)),
+            'errors': errors,
+        }
+
+
+def compare(baseline, results, options):
+    # Human-readable descriptions of every metric that regressed past its threshold
+    failures = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        allowed_p95 = max(before['p95_ms'] * (1 + options['latency_threshold']), before['p95_ms'] + options['min_latency_ms'])
+        if result['p95_ms'] > allowed_p95:
+            failures.append(f"{name}: p95 {result['p95_ms']}ms, baseline {before['p95_ms']}ms")
+        if result['queries'] > before['queries'] + options['query_threshold']:
+            failures.append(f"{name}: {result['queries']} queries, baseline {before['queries']}")
+        if result['bytes'] > before['bytes'] * (1 + options['size_threshold']):
+            failures.append(f"{name}: {result['bytes']} bytes, baseline {before['bytes']}")
+        if result['errors']:
+            failures.append(f"{name}: {result['errors']} server errors")
+    return failures
@@ -0,0 +1,129 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from e_app.benchmarking import summarize
+from e_app.models import Chapter, Enrollment
+
+CACHED_BACKEND = 'e_app.auth_backends.CachedModelBackend'
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+
+def auth_queries(captured):
+    # Queries spent on the session and the user lookup rather than on the view itself
+    return sum('django_session' in query['sql'] or 'auth_user' in query['sql'] for query in captured)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare login and authenticated request throughput across session modes (db, cached_db, '
+        'cache). Each enrolled user logs in, then requests are spread over the users, by default '
+        'hitting the progress view of their own enrollment. Run it against a local database seeded '
+        'with `manage.py seed_data`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', choices=list(settings.SESSION_ENGINES),
+                            help='Session mode to run (can be repeated; default: all).')
+        parser.add_argument('--users', type=int, default=20, help='Logged-in users the requests are spread over.')
+        parser.add_argument('--requests', type=int, default=500, help='Authenticated requests per mode.')
+        parser.add_argument('--path', help='Path to request instead of each user\'s progress view.')
+        parser.add_argument('--no-user-cache', action='store_true',
+                            help='Look users up with ModelBackend instead of CachedModelBackend.')
+
+    def handle(self, *args, **options):
+        targets = self.targets(options['users'], options['path'])
+        if not targets:
+            raise CommandError('Needs enrollments in courses with chapters; run seed_data first.')
+        backend = MODEL_BACKEND if options['no_user_cache'] else CACHED_BACKEND
+        # The user cache is off by default; give it a timeout for the run when it is not set
+        user_cache_timeout = settings.AUTH_USER_CACHE_TIMEOUT or 5 * 60
+
+        # The test client sends Host: testserver; expected 4xx responses are not logged
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        results = {}
+        try:
+            for mode in options['modes'] or list(settings.SESSION_ENGINES):
+                with override_settings(
+                    SESSION_ENGINE=settings.SESSION_ENGINES[mode],
+                    AUTHENTICATION_BACKENDS=[backend],
+                    AUTH_USER_CACHE_TIMEOUT=user_cache_timeout,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                ):
+                    results[mode] = self.run_mode(targets, options['requests'], backend)
+        finally:
+            request_logger.setLevel(level)
+
+        self.stdout.write(f'{len(targets)} users, {options["requests"]} requests per mode, users looked up with {backend}')
+        self.stdout.write(
+            f"{'mode':<11}{'logins/s':>10}{'login p50':>11}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'auth q':>8}  errors"
+        )
+        for mode, result in results.items():
+            login, requests = result['login'], result['requests']
+            self.stdout.write(
+                f"{mode:<11}{login['throughput']:>10}{login['p50_ms']:>11}{requests['throughput']:>9}"
+                f"{requests['p50_ms']:>9}{requests['p99_ms']:>9}{result['queries']:>9}{result['auth_queries']:>8}"
+                f"  {result['errors']}"
+            )
+
+    def targets(self, users, path):
+        # (user, path) pairs for the first `users` distinct enrolled users
+        first_chapters = {}
+        targets = {}
+        for enrollment in Enrollment.objects.select_related('user').order_by('id').iterator():
+            if len(targets) >= users:
+                break
+            if enrollment.user_id in targets:
+                continue
+            course_id = enrollment.course_id
+            if course_id not in first_chapters:
+                first_chapters[course_id] = (
+                    Chapter.objects.filter(course_id=course_id).order_by('order').values_list('id', flat=True).first()
+                )
+            chapter_id = first_chapters[course_id]
+            if chapter_id is not None:
+                targets[enrollment.user_id] = (
+                    enrollment.user, path or f'/courses/{course_id}/chapters/{chapter_id}/progress/'
+                )
+        return list(targets.values())
+
+    def run_mode(self, targets, requests, backend):
+        # Logins are timed without password hashing (force_login), so the numbers show the
+        # session write rather than the hasher
+        clients, login_latencies = [], []
+        for user, path in targets:
+            client = Client()
+            started = time.perf_counter()
+            client.force_login(user, backend=backend)
+            login_latencies.append(time.perf_counter() - started)
+            clients.append((client, path))
+
+        latencies, queries, auth, errors = [], 0, 0, 0
+        for index in range(requests):
+            client, path = clients[index % len(clients)]
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(path)
+                latencies.append(time.perf_counter() - started)
+            queries += len(ctx.captured_queries)
+            auth += auth_queries(ctx.captured_queries)
+            errors += response.status_code >= 400
+
+        # Logging out deletes the benchmark's sessions again
+        for client, path in clients:
+            client.logout()
+        return {
+            'login': summarize(login_latencies, sum(login_latencies)),
+            'requests': summarize(latencies, sum(latencies)),
+            'queries': round(queries / requests, 2) if requests else 0,
+            'auth_queries': round(auth / requests, 2) if requests else 0,
+            'errors': errors,
+        }
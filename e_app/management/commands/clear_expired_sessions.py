@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from e_app import sessions
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired rows from the django_session table in small batches. Run it periodically '
+        '(e.g. hourly from cron) when SESSION_MODE is db or cached_db.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=sessions.SESSION_CLEANUP_BATCH_SIZE,
+                            help='Sessions deleted per statement (default: %(default)s).')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches, to leave room for logins.')
+        parser.add_argument('--force', action='store_true',
+                            help='Clean the table even though the session engine does not use it.')
+
+    def handle(self, *args, **options):
+        if not sessions.uses_session_table() and not options['force']:
+            self.stdout.write('Sessions are not stored in the database; nothing to clean up.')
+            return
+
+        def progress(deleted):
+            self.stdout.write(f'  deleted {deleted} sessions')
+
+        deleted = sessions.clear_expired(
+            batch_size=options['batch_size'], pause=options['pause'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions.'))
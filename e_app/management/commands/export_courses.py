@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from e_app import content_io
+from e_app.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Export courses with their chapters and articles as JSON Lines or CSV, streamed a chunk at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help='File to write (default: stdout).')
+        parser.add_argument('--format', choices=content_io.FORMATS,
+                            help='Output format (default: from the file extension, else jsonl).')
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only export this course ID (can be repeated).')
+        parser.add_argument('--chunk-size', type=int, default=content_io.CONTENT_CHUNK_SIZE,
+                            help='Courses read per query batch (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or content_io.detect_format(options['output'])
+        courses = Course.objects.all()
+        if options['courses']:
+            courses = courses.filter(id__in=options['courses'])
+        lines = content_io.export_lines(content_io.iter_courses(courses, options['chunk_size']), fmt)
+
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
+        self.stderr.write(f"Exported to {options['output']}")
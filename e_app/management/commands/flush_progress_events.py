@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from e_app import write_behind
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply queued chapter completion events (PROGRESS_WRITE_BEHIND) to the progress store. '
+        'Run a single instance, either from cron or continuously with --interval.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=write_behind.FLUSH_BATCH_SIZE,
+                            help='Events applied per transaction (default: %(default)s).')
+        parser.add_argument('--interval', type=float,
+                            help='Keep running, flushing every this many seconds.')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = write_behind.flush_all(batch_size=options['batch_size'])
+            if totals['events'] or not options['interval']:
+                self.stdout.write(
+                    f"Flushed {totals['events']} events: {totals['applied']} applied, {totals['unchanged']} unchanged, "
+                    f"{totals['stale']} stale, {totals['dropped']} dropped."
+                )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_app import content_io
+
+
+class Command(BaseCommand):
+    help = (
+        'Import courses with their chapters and articles from JSON Lines or CSV (as written by '
+        'export_courses). Courses with a known id are updated; the rest are created.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin.")
+        parser.add_argument('--format', choices=content_io.FORMATS,
+                            help='Input format (default: from the file extension, else jsonl).')
+        parser.add_argument('--chunk-size', type=int, default=content_io.CONTENT_CHUNK_SIZE,
+                            help='Courses written per transaction (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or content_io.detect_format(options['path'])
+
+        def report(totals):
+            self.stdout.write(
+                f"{totals['courses_created'] + totals['courses_updated']} courses, "
+                f"{totals['chapters_created'] + totals['chapters_updated']} chapters, "
+                f"{totals['articles_created'] + totals['articles_updated']} articles imported"
+            )
+
+        source = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        try:
+            totals = content_io.import_courses(
+                content_io.read_courses(source, fmt), chunk_size=options['chunk_size'], progress=report
+            )
+        except content_io.ContentImportError as e:
+            raise CommandError(f'{e} (chunks before it were imported)')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {name.replace("_", " ")}' for name, count in totals.items())))
@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_app import provisioning
+from e_app.content_io import detect_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Create users in bulk from JSON Lines or CSV (email, password, first_name, last_name), hashing '
+        'passwords in a process pool, and optionally enroll all of them in the given courses. Emails '
+        'that are already registered are skipped, so an interrupted run can simply be repeated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin.")
+        parser.add_argument('--format', choices=provisioning.FORMATS,
+                            help='Input format (default: from the file extension, else jsonl).')
+        parser.add_argument('--course', type=int, action='append', dest='courses', default=[],
+                            help='Enroll every user of the file in this course ID (can be repeated).')
+        parser.add_argument('--chunk-size', type=int, default=provisioning.PROVISION_CHUNK_SIZE,
+                            help='Users written per transaction (default: %(default)s).')
+        parser.add_argument('--workers', type=int,
+                            help='Password hashing processes (default: one per core; 1 hashes in-process).')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+
+        def report(totals):
+            self.stdout.write(
+                f"{totals['created']} created, {totals['already_registered']} already registered, "
+                f"{totals['enrolled']} enrollments"
+            )
+
+        source = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        try:
+            totals = provisioning.provision_users(
+                provisioning.read_users(source, fmt), course_ids=options['courses'],
+                chunk_size=options['chunk_size'], workers=options['workers'], progress=report,
+            )
+        except provisioning.ProvisioningError as e:
+            raise CommandError(f'{e} (chunks before it were written)')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {name.replace("_", " ")}' for name, count in totals.items())))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from e_app import analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the completion analytics of every course (or the given ones) from stored progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only rebuild this course ID (can be repeated).')
+        parser.add_argument('--batch-size', type=int, default=analytics.ANALYTICS_BATCH_SIZE,
+                            help='Enrollments read per batch (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        def report(done, total):
+            if done % 100 == 0 or done == total:
+                self.stdout.write(f'{done}/{total} courses')
+
+        run = analytics.rebuild_all(course_ids=options['courses'], batch_size=options['batch_size'], progress=report)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt analytics for {run.courses} courses in {(run.finished_at - run.started_at).total_seconds():.2f}s.'
+        ))
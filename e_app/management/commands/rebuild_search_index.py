@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from e_app import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all courses, chapters and articles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.REBUILD_BATCH_SIZE,
+                            help='Rows written per INSERT (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        search.rebuild(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
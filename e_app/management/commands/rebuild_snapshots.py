@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from e_app import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Re-render the stored JSON and gzip snapshots of every course (e.g. after deploying a payload change).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=snapshots.SNAPSHOT_BATCH_SIZE,
+                            help='Courses rendered per batch (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        count = snapshots.rebuild(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rendered snapshots of {count} courses.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from e_app import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the completion analytics of courses with enrollment, progress or chapter activity '
+        'since the previous run. Meant to run periodically (e.g. from cron); the first run covers every course.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=analytics.ANALYTICS_BATCH_SIZE,
+                            help='Enrollments read per batch (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        run = analytics.refresh_changed(batch_size=options['batch_size'])
+        kind = 'Full rebuild' if run.full else 'Refresh'
+        self.stdout.write(self.style.SUCCESS(
+            f'{kind}: {run.courses} courses in {(run.finished_at - run.started_at).total_seconds():.2f}s.'
+        ))
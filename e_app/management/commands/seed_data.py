@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from e_app import seeding
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic dataset of courses, chapters, articles, users, enrollments and progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=10)
+        parser.add_argument('--chapters', type=int, default=10, help='Chapters per course.')
+        parser.add_argument('--articles', type=int, default=5, help='Articles per course.')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--enrollments', type=int, default=3, help='Courses each user enrolls in.')
+        parser.add_argument('--completion', type=float, default=0.5,
+                            help='Average share of chapters completed per enrollment, 0 to 1.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable datasets.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the seeded users.')
+        parser.add_argument('--password', default='password', help='Password of every seeded user.')
+        parser.add_argument('--batch-size', type=int, default=seeding.SEED_BATCH_SIZE,
+                            help='Rows per INSERT (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['completion'] <= 1:
+            raise CommandError('--completion must be between 0 and 1.')
+        counts = [options[name] for name in ('courses', 'chapters', 'articles', 'users', 'enrollments', 'batch_size')]
+        if min(counts) < 0 or options['batch_size'] < 1:
+            raise CommandError('Counts must not be negative and --batch-size must be positive.')
+
+        created = seeding.seed(
+            courses=options['courses'],
+            chapters=options['chapters'],
+            articles=options['articles'],
+            users=options['users'],
+            enrollments=options['enrollments'],
+            completion=options['completion'],
+            random_seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded ' + ', '.join(f'{count} {name}' for name, count in created.items()) + '.'
+        ))
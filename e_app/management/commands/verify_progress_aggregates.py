@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from e_app import aggregates
+from e_app.models import Course
+from e_app.progress import progress_backend
+
+
+class Command(BaseCommand):
+    help = 'Recompute enrollment progress aggregates from stored progress and report (or fix) any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Write the recomputed values back.')
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only check this course ID (can be repeated).')
+        parser.add_argument('--batch-size', type=int, default=aggregates.RECOMPUTE_BATCH_SIZE,
+                            help='Enrollments recomputed per query batch (default: %(default)s).')
+        parser.add_argument('--show', type=int, default=10, help='Drifted enrollments to print per course.')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('id')
+        if options['courses']:
+            courses = courses.filter(id__in=options['courses'])
+
+        store = progress_backend()
+        total_drift = 0
+        for course_id in courses.values_list('id', flat=True).iterator():
+            drift = aggregates.recompute_course(
+                store, course_id, fix=options['fix'], batch_size=options['batch_size']
+            )
+            if not drift:
+                continue
+            total_drift += len(drift)
+            self.stdout.write(self.style.WARNING(f'Course {course_id}: {len(drift)} enrollments drifted'))
+            for entry in drift[:options['show']]:
+                self.stdout.write(f"  enrollment {entry['enrollment_id']}: stored {entry['stored']} expected {entry['expected']}")
+
+        if not total_drift:
+            self.stdout.write(self.style.SUCCESS('No drift found.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {total_drift} enrollments.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{total_drift} enrollments drifted; re-run with --fix to correct them.'))
@@ -0,0 +1,95 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Engine-specific full-text index over e_app_searchdocument. Run `manage.py rebuild_search_index`
+# after migrating to index existing content.
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE e_app_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX e_app_searchdocument_vector_gin ON e_app_searchdocument USING gin (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS e_app_searchdocument_vector_gin",
+    "ALTER TABLE e_app_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table kept in sync with e_app_searchdocument by triggers
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE e_app_searchdocument_fts USING fts5(
+        title, body, content='e_app_searchdocument', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER e_app_searchdocument_fts_ai AFTER INSERT ON e_app_searchdocument BEGIN
+        INSERT INTO e_app_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER e_app_searchdocument_fts_ad AFTER DELETE ON e_app_searchdocument BEGIN
+        INSERT INTO e_app_searchdocument_fts(e_app_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER e_app_searchdocument_fts_au AFTER UPDATE ON e_app_searchdocument BEGIN
+        INSERT INTO e_app_searchdocument_fts(e_app_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO e_app_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS e_app_searchdocument_fts_au",
+    "DROP TRIGGER IF EXISTS e_app_searchdocument_fts_ad",
+    "DROP TRIGGER IF EXISTS e_app_searchdocument_fts_ai",
+    "DROP TABLE IF EXISTS e_app_searchdocument_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD})
+
+
+def drop_fulltext_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0007_course_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('chapter', 'Chapter'), ('article', 'Article')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='e_app.course')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdocument_kind_object_uniq')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
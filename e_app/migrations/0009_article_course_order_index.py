@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0008_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['course', 'order', 'id'], name='article_course_order_idx'),
+        ),
+    ]
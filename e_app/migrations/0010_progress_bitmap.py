@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_chapter_slots(apps, schema_editor):
+    # Number existing chapters 0..n-1 within each course, in their current reading order
+    Chapter = apps.get_model('e_app', 'Chapter')
+    chapters, course_id, slot = [], None, 0
+    for chapter in Chapter.objects.order_by('course_id', 'order', 'id').only('id', 'course_id').iterator():
+        if chapter.course_id != course_id:
+            course_id, slot = chapter.course_id, 0
+        chapter.slot = slot
+        slot += 1
+        chapters.append(chapter)
+    Chapter.objects.bulk_update(chapters, ['slot'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0009_article_course_order_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentProgress',
+            fields=[
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress_bitmap', serialize=False, to='e_app.enrollment')),
+                ('bits', models.BinaryField(default=bytes)),
+                ('completed_at', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='slot',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(assign_chapter_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='chapter',
+            constraint=models.UniqueConstraint(fields=('course', 'slot'), name='chapter_course_slot_uniq'),
+        ),
+    ]
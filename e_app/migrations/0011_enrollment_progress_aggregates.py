@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Existing enrollments start at zero; run `manage.py verify_progress_aggregates --fix` after
+# migrating to fill the new columns in from current progress.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0010_progress_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_chapters',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='next_chapter',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='e_app.chapter'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_chapters',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
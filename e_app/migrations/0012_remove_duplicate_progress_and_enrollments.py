@@ -0,0 +1,65 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:14
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+# Duplicates must go before 0013 can add the unique constraints. The cleanup is a migration of
+# its own so its deletes are committed first: on PostgreSQL, deleting enrollments queues
+# deferred trigger events for the foreign keys pointing at them, and an ALTER TABLE in the
+# same transaction fails while they are pending. Enrollment aggregates of merged enrollments
+# are not adjusted here; run `manage.py verify_progress_aggregates --fix` after migrating.
+
+def remove_duplicate_progress(apps, schema_editor):
+    # Keep the most complete row of each (user, chapter): completed first, then the oldest
+    Progress = apps.get_model('e_app', 'Progress')
+    duplicates = (
+        Progress.objects.filter(chapter__isnull=False).values('user_id', 'chapter_id')
+        .annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        rows = Progress.objects.filter(user_id=group['user_id'], chapter_id=group['chapter_id'])
+        keep = rows.order_by('-completed', 'completed_at', 'id').values_list('id', flat=True).first()
+        rows.exclude(id=keep).delete()
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    # Keep the first enrollment of each (user, course). What hangs off the others is merged
+    # into it before they are deleted: their progress bitmaps and their last activity.
+    Enrollment = apps.get_model('e_app', 'Enrollment')
+    EnrollmentProgress = apps.get_model('e_app', 'EnrollmentProgress')
+    duplicates = Enrollment.objects.values('user_id', 'course_id').annotate(rows=Count('id')).filter(rows__gt=1)
+    for group in duplicates.iterator():
+        enrollments = Enrollment.objects.filter(user_id=group['user_id'], course_id=group['course_id'])
+        ids = list(enrollments.order_by('id').values_list('id', flat=True))
+        keep, extra = ids[0], ids[1:]
+        records = list(EnrollmentProgress.objects.filter(enrollment_id__in=ids))
+        if records:
+            size = max(len(bytes(record.bits)) for record in records)
+            bits = bytearray(size)
+            completed_at = {}
+            for record in records:
+                for index, byte in enumerate(bytes(record.bits)):
+                    bits[index] |= byte
+                for slot, when in record.completed_at.items():
+                    completed_at[slot] = min(when, completed_at.get(slot, when))
+            EnrollmentProgress.objects.update_or_create(
+                enrollment_id=keep, defaults={'bits': bytes(bits), 'completed_at': completed_at}
+            )
+        Enrollment.objects.filter(id=keep).update(
+            last_activity_at=enrollments.aggregate(latest=Max('last_activity_at'))['latest'],
+        )
+        EnrollmentProgress.objects.filter(enrollment_id__in=extra).delete()
+        Enrollment.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0011_enrollment_progress_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_progress, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0013_unique_progress_and_enrollment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('full', models.BooleanField(default=False)),
+                ('courses', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChapterAnalytics',
+            fields=[
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analytics', serialize=False, to='e_app.chapter')),
+                ('order', models.PositiveIntegerField()),
+                ('completions', models.PositiveIntegerField(default=0)),
+                ('stopped_here', models.PositiveIntegerField(default=0)),
+                ('median_seconds_to_complete', models.PositiveIntegerField(blank=True, null=True)),
+                ('completion_histogram', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseAnalytics',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analytics', serialize=False, to='e_app.course')),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+                ('not_started', models.PositiveIntegerField(default=0)),
+                ('finished', models.PositiveIntegerField(default=0)),
+                ('median_seconds_to_finish', models.PositiveIntegerField(blank=True, null=True)),
+                ('finish_histogram', models.JSONField(default=list)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['last_activity_at'], name='enrollment_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['enrolled_at'], name='enrollment_enrolled_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsrun',
+            index=models.Index(fields=['started_at'], name='analyticsrun_started_idx'),
+        ),
+        migrations.AddField(
+            model_name='chapteranalytics',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chapter_analytics', to='e_app.course'),
+        ),
+        migrations.AddIndex(
+            model_name='chapteranalytics',
+            index=models.Index(fields=['course', 'order'], name='chapteranalytics_course_idx'),
+        ),
+    ]
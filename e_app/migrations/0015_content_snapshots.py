@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0014_completion_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('outline', 'Outline'), ('articles', 'Articles')], max_length=16)),
+                ('body', models.BinaryField()),
+                ('gzip_body', models.BinaryField()),
+                ('etag', models.CharField(max_length=64)),
+                ('rendered_at', models.DateTimeField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='e_app.course')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('course', 'kind'), name='contentsnapshot_course_kind_uniq')],
+            },
+        ),
+    ]
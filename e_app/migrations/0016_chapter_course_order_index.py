@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0015_content_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chapter',
+            index=models.Index(fields=['course', 'order', 'id'], name='chapter_course_order_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0017_progress_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressArchive',
+            fields=[
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress_archive', serialize=False, to='e_app.enrollment')),
+                ('completed_at', models.JSONField(default=dict)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='progress_archived',
+            field=models.BooleanField(default=False),
+        ),
+    ]
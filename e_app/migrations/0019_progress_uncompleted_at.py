@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0018_progress_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollmentprogress',
+            name='uncompleted_at',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='progress',
+            name='uncompleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:20
+
+import zlib
+
+from django.db import migrations, models
+
+
+def encode_existing(apps, schema_editor):
+    # Same level as e_app.snapshots.DEFLATE_LEVEL, so these match a later re-render
+    ContentSnapshot = apps.get_model('e_app', 'ContentSnapshot')
+    for snapshot in ContentSnapshot.objects.only('body').iterator(chunk_size=200):
+        snapshot.deflate_body = zlib.compress(bytes(snapshot.body), 9)
+        snapshot.save(update_fields=['deflate_body'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_app', '0019_progress_uncompleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentsnapshot',
+            name='deflate_body',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(encode_existing, migrations.RunPython.noop),
+    ]
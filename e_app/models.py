@@ -8,6 +8,15 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Back the keyset-paginated catalog: each ordering (optionally filtered by category) ends with id
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='course_cat_created_id_idx'),
+            models.Index(fields=['title', 'id'], name='course_title_id_idx'),
+            models.Index(fields=['category', 'title', 'id'], name='course_cat_title_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -17,9 +26,21 @@ class Chapter(models.Model):  # Declared before Progress to avoid NameError
     title = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     order = models.PositiveIntegerField(default=0)
+    # Stable position of the chapter within its course, assigned once on creation and never
+    # reused, so reordering chapters doesn't move their bit in EnrollmentProgress.bits
+    slot = models.PositiveIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'slot'], name='chapter_course_slot_uniq'),
+        ]
+        # The chapter reader looks chapters up by (course, order) and walks to their neighbours
+        indexes = [
+            models.Index(fields=['course', 'order', 'id'], name='chapter_course_order_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -30,6 +51,12 @@ class Article(models.Model):
     content = models.TextField()
     order = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        # Articles are always read per course in order, so pages and streams come straight off the index
+        indexes = [
+            models.Index(fields=['course', 'order', 'id'], name='article_course_order_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -39,8 +66,16 @@ class Progress(models.Model):
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, null=True, blank=True)  # References Chapter
     completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # When the chapter was last un-completed, so a synced completion queued before it loses
+    uncompleted_at = models.DateTimeField(null=True, blank=True)
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        # One row per user and chapter; also the index behind every (user, chapter) lookup
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'chapter'], name='progress_user_chapter_uniq'),
+        ]
+
     def __str__(self):
            return f"Progress of {self.user.username} on {self.chapter.title}"
 
@@ -49,6 +84,178 @@ class Enrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="enrollments")
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="enrollments")
     enrolled_at = models.DateTimeField(auto_now_add=True)
+    # Progress aggregates, maintained by e_app.aggregates in the same transaction as each progress
+    # write; `manage.py verify_progress_aggregates` recomputes them and reports drift.
+    completed_chapters = models.PositiveIntegerField(default=0)
+    total_chapters = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    next_chapter = models.ForeignKey(Chapter, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Set while the enrollment's Progress rows are packed into a ProgressArchive (e_app.archive)
+    progress_archived = models.BooleanField(default=False)
+
+    class Meta:
+        # One enrollment per user and course; also the index behind every enrollment check
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='enrollment_user_course_uniq'),
+        ]
+        # Let the analytics delta job find recently active enrollments without a table scan
+        indexes = [
+            models.Index(fields=['last_activity_at'], name='enrollment_activity_idx'),
+            models.Index(fields=['enrolled_at'], name='enrollment_enrolled_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} enrolled in {self.course.title}"
+
+    @property
+    def percent_complete(self):
+        if not self.total_chapters:
+            return 0.0
+        return round(100.0 * self.completed_chapters / self.total_chapters, 1)
+
+
+class EnrollmentProgress(models.Model):
+    # Compact alternative to one Progress row per chapter (settings.PROGRESS_BACKEND = 'bitmap'):
+    # bit N of `bits` is set when the chapter with slot N is completed, and `completed_at`
+    # holds timestamps for completed slots only ({"N": "<iso datetime>"}); `uncompleted_at`
+    # holds the time of the last un-completion of slots that are not completed.
+    enrollment = models.OneToOneField(Enrollment, on_delete=models.CASCADE, primary_key=True, related_name='progress_bitmap')
+    bits = models.BinaryField(default=bytes)
+    completed_at = models.JSONField(default=dict)
+    uncompleted_at = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Progress bitmap for enrollment {self.enrollment_id}"
+
+
+class ProgressArchive(models.Model):
+    # The Progress rows of a finished or inactive enrollment, packed into one row by
+    # e_app.archive: `completed_at` maps the completed chapter ids to their completion time
+    # ({"<chapter id>": "<iso datetime>"}); rows of chapters never completed are not kept.
+    enrollment = models.OneToOneField(Enrollment, on_delete=models.CASCADE, primary_key=True, related_name='progress_archive')
+    completed_at = models.JSONField(default=dict)
+    rows = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Progress archive for enrollment {self.enrollment_id}"
+
+
+class SearchDocument(models.Model):
+    # One row of searchable text per course, chapter and article, kept in sync by signals.
+    # The engine-specific full-text index over this table (a tsvector column with a GIN index
+    # on PostgreSQL, an FTS5 shadow table on SQLite) is created by migration and used by e_app.search.
+    KIND_CHOICES = [
+        ('course', 'Course'),
+        ('chapter', 'Chapter'),
+        ('article', 'Article'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchdocument_kind_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+
+class CourseAnalytics(models.Model):
+    # Course completion rollup, rebuilt per course by e_app.analytics (never written by requests).
+    # Durations are measured from enrollment; medians are the upper bound of the histogram bucket
+    # holding the median, see analytics.DURATION_BUCKETS.
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='analytics')
+    enrollments = models.PositiveIntegerField(default=0)
+    not_started = models.PositiveIntegerField(default=0)
+    finished = models.PositiveIntegerField(default=0)
+    median_seconds_to_finish = models.PositiveIntegerField(null=True, blank=True)
+    finish_histogram = models.JSONField(default=list)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Analytics for course {self.course_id}"
+
+
+class ChapterAnalytics(models.Model):
+    # Per-chapter funnel step of CourseAnalytics: how many enrolled users completed the chapter,
+    # how many stopped after it (it is the furthest chapter they completed, without finishing),
+    # and how long completing it took them
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, primary_key=True, related_name='analytics')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='chapter_analytics')
+    order = models.PositiveIntegerField()
+    completions = models.PositiveIntegerField(default=0)
+    stopped_here = models.PositiveIntegerField(default=0)
+    median_seconds_to_complete = models.PositiveIntegerField(null=True, blank=True)
+    completion_histogram = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'order'], name='chapteranalytics_course_idx'),
+        ]
+
+    def __str__(self):
+        return f"Analytics for chapter {self.chapter_id}"
+
+
+class AnalyticsRun(models.Model):
+    # One row per analytics refresh; the delta job picks up activity since the last run started
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    full = models.BooleanField(default=False)
+    courses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['started_at'], name='analyticsrun_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"Analytics run at {self.started_at}"
+
+
+class ContentSnapshot(models.Model):
+    # A course's public payload rendered once at save time by e_app.snapshots: the JSON bytes
+    # served as is, their gzip and deflate encodings, and the ETag of all three
+    KIND_CHOICES = [('course', 'Course'), ('outline', 'Outline'), ('articles', 'Articles')]
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='snapshots')
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    body = models.BinaryField()
+    gzip_body = models.BinaryField()
+    deflate_body = models.BinaryField()
+    etag = models.CharField(max_length=64)
+    rendered_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'kind'], name='contentsnapshot_course_kind_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} snapshot of course {self.course_id}"
+
+
+class ProgressEvent(models.Model):
+    # A chapter completion change acknowledged in write-behind mode (settings.PROGRESS_WRITE_BEHIND)
+    # and not yet applied to the progress store; e_app.write_behind appends and flushes these
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, related_name='+')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, db_index=False, related_name='+')
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='+')
+    completed = models.BooleanField()
+    occurred_at = models.DateTimeField()
+
+    class Meta:
+        # Reads merge the user's pending events for a chapter or a course
+        indexes = [
+            models.Index(fields=['user', 'course', 'id'], name='progressevent_user_course_idx'),
+        ]
+
+    def __str__(self):
+        return f"Progress event {self.id} for user {self.user_id}"
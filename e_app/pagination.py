@@ -0,0 +1,88 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields, datetime_fields=(), integer_fields=('id',)):
+    # Turn an opaque cursor back into the ordering values of the last row of the previous page.
+    # Each value must have its field's type (datetime, integer or string), so a tampered cursor
+    # is refused here rather than failing in the query.
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Malformed cursor.')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Cursor does not match the requested ordering.')
+
+    decoded = []
+    for field, value in zip(fields, values):
+        name = field.lstrip('-')
+        try:
+            if name in datetime_fields:
+                value = parse_datetime(value) if isinstance(value, str) else None
+            elif name in integer_fields:
+                value = int(value) if not isinstance(value, bool) and abs(int(value)) < 2 ** 63 else None
+            elif not isinstance(value, str):
+                value = None
+        except (TypeError, ValueError, OverflowError):
+            value = None
+        if value is None:
+            raise InvalidCursor('Cursor does not match the requested ordering.')
+        decoded.append(value)
+    return decoded
+
+
+def keyset_filter(fields, values):
+    # Rows strictly after `values` in the given ordering, e.g. for ('-created_at', '-id'):
+    # created_at < v0 OR (created_at = v0 AND id < v1)
+    condition = Q()
+    for i, field in enumerate(fields):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(fields[:i], values[:i]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def keyset_queryset(queryset, fields, cursor=None, limit=20, datetime_fields=()):
+    # The rows of one page (plus one extra, to detect a next page) of `queryset` ordered by
+    # `fields`, the last of which must be unique (e.g. id). Seeks straight to the cursor
+    # position, so every page costs the same however deep it is.
+    queryset = queryset.order_by(*fields)
+    if cursor:
+        queryset = queryset.filter(keyset_filter(fields, decode_cursor(cursor, fields, datetime_fields)))
+    return queryset[:limit + 1]
+
+
+def finish_page(rows, fields, limit):
+    # Returns (rows, next_cursor); next_cursor is None on the last page
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[field.lstrip('-')] for field in fields])
+    return rows, next_cursor
+
+
+def keyset_page(queryset, fields, cursor=None, limit=20, datetime_fields=()):
+    rows = list(keyset_queryset(queryset, fields, cursor, limit, datetime_fields))
+    return finish_page(rows, fields, limit)
+
+
+async def akeyset_page(queryset, fields, cursor=None, limit=20, datetime_fields=()):
+    rows = [row async for row in keyset_queryset(queryset, fields, cursor, limit, datetime_fields)]
+    return finish_page(rows, fields, limit)
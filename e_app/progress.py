@@ -0,0 +1,416 @@
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, Max, OuterRef, Subquery, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import aggregates, archive
+from .models import Chapter, EnrollmentProgress, Progress, ProgressArchive
+
+# Views read and write chapter completion through progress_store(), so the storage
+# format can change without touching them. settings.PROGRESS_BACKEND selects it:
+#   'rows'   - one Progress row per (user, chapter), created at enrollment (default)
+#   'bitmap' - one EnrollmentProgress row per enrollment holding a completion bitset
+# Both stores also have async read methods (aget, acompleted_chapter_ids) for the async views,
+# and reader_annotations()/annotated_state() to read progress in the same query as the chapter.
+# The rows store also reads the packed progress of enrollments archived by e_app.archive.
+
+ChapterState = namedtuple('ChapterState', ['completed', 'completed_at'])
+
+NOT_STARTED = ChapterState(False, None)
+
+PROGRESS_BATCH_SIZE = 1000
+
+
+# --- Chapter slots ---------------------------------------------------------------
+
+def next_slot(course_id):
+    current = Chapter.objects.filter(course_id=course_id).aggregate(Max('slot'))['slot__max']
+    return 0 if current is None else current + 1
+
+
+def ensure_slots(course_id):
+    # Chapters written with bulk_create skip the pre_save signal and have no slot yet
+    missing = list(Chapter.objects.filter(course_id=course_id, slot__isnull=True).order_by('order', 'id'))
+    if missing:
+        start = next_slot(course_id)
+        for offset, chapter in enumerate(missing):
+            chapter.slot = start + offset
+        Chapter.objects.bulk_update(missing, ['slot'])
+    return missing
+
+
+def chapter_slot(chapter):
+    if chapter.slot is None:
+        ensure_slots(chapter.course_id)
+        chapter.slot = Chapter.objects.values_list('slot', flat=True).get(pk=chapter.pk)
+    return chapter.slot
+
+
+async def achapter_slot(chapter):
+    if chapter.slot is None:
+        return await sync_to_async(chapter_slot)(chapter)
+    return chapter.slot
+
+
+# --- Bitset helpers ----------------------------------------------------------------
+
+def bit_is_set(bits, index):
+    byte = index // 8
+    return byte < len(bits) and bool(bits[byte] & (1 << (index % 8)))
+
+
+def set_bit(bits, index, value):
+    bits = bytearray(bits)
+    byte = index // 8
+    if byte >= len(bits):
+        if not value:
+            return bytes(bits)
+        bits.extend(b'\0' * (byte + 1 - len(bits)))
+    if value:
+        bits[byte] |= 1 << (index % 8)
+    else:
+        bits[byte] &= ~(1 << (index % 8)) & 0xFF
+    return bytes(bits).rstrip(b'\0')
+
+
+def set_bits(bits):
+    # Indexes of all set bits
+    return [byte * 8 + bit for byte, value in enumerate(bits) if value for bit in range(8) if value & (1 << bit)]
+
+
+# --- Storage engines ---------------------------------------------------------------
+
+def upsert_completed(user_id, completions):
+    # Mark (chapter_id, completed_at) pairs completed for a user with one
+    # INSERT ... ON CONFLICT DO UPDATE per batch, keyed on the (user, chapter) unique index.
+    # The update only applies to rows that aren't completed yet, so the chapter IDs that come
+    # back are exactly the ones this call flipped to completed.
+    connection = connections[router.db_for_write(Progress)]
+    table = connection.ops.quote_name(Progress._meta.db_table)
+    flipped = set()
+    for start in range(0, len(completions), PROGRESS_BATCH_SIZE):
+        batch = completions[start:start + PROGRESS_BATCH_SIZE]
+        params = []
+        for chapter_id, completed_at in batch:
+            params += [user_id, chapter_id, True, connection.ops.adapt_datetimefield_value(completed_at)]
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_id, chapter_id, completed, completed_at) VALUES {values}
+                ON CONFLICT (user_id, chapter_id) DO UPDATE
+                    SET completed = excluded.completed, completed_at = excluded.completed_at
+                    WHERE {table}.completed = %s
+                RETURNING chapter_id
+                """,
+                params + [False],
+            )
+            flipped.update(chapter_id for chapter_id, in cursor.fetchall())
+    return flipped
+
+
+def resolve_change(stored, completed, when, uncompleted_at=None):
+    # Last-writer-wins for a synced change against the stored state of the chapter:
+    # 'applied', 'unchanged' (already in that state) or 'stale' (older than the stored
+    # state: its completion time, or uncompleted_at, when it was last un-completed).
+    if completed == stored.completed:
+        return 'unchanged'
+    changed_at = stored.completed_at if stored.completed else uncompleted_at
+    if changed_at and changed_at > when:
+        return 'stale'
+    return 'applied'
+
+
+class RowProgressStore:
+    def init_enrollments(self, enrollments, chapter_ids):
+        Progress.objects.bulk_create(
+            [
+                Progress(user_id=enrollment.user_id, chapter_id=chapter_id, completed=False)
+                for enrollment in enrollments
+                for chapter_id in chapter_ids
+            ],
+            batch_size=PROGRESS_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def _archived_state(self, times, chapter):
+        if times is None or chapter.pk not in times:
+            return NOT_STARTED
+        return ChapterState(True, times[chapter.pk])
+
+    def get(self, user, chapter):
+        progress = Progress.objects.filter(user=user, chapter=chapter).values('completed', 'completed_at').first()
+        if progress is None:
+            # No row: the enrollment may be archived
+            return self._archived_state(archive.archived_times(user, chapter.course_id), chapter)
+        return ChapterState(progress['completed'], progress['completed_at'] if progress['completed'] else None)
+
+    async def aget(self, user, chapter):
+        progress = await Progress.objects.filter(user=user, chapter=chapter).values('completed', 'completed_at').afirst()
+        if progress is None:
+            return self._archived_state(await archive.aarchived_times(user, chapter.course_id), chapter)
+        return ChapterState(progress['completed'], progress['completed_at'] if progress['completed'] else None)
+
+    def reader_annotations(self, user):
+        # Chapter queryset annotations holding the user's progress on each chapter
+        progress = Progress.objects.filter(user=user, chapter=OuterRef('pk'))
+        archived = ProgressArchive.objects.filter(enrollment__user=user, enrollment__course_id=OuterRef('course_id'))
+        return {
+            'progress_completed': Subquery(progress.values('completed')[:1]),
+            'progress_completed_at': Subquery(progress.values('completed_at')[:1]),
+            'progress_archive': Subquery(archived.values('completed_at')[:1]),
+        }
+
+    def annotated_state(self, chapter):
+        if chapter.progress_completed is None and chapter.progress_archive is not None:
+            return self._archived_state(archive.unpack(chapter.progress_archive), chapter)
+        if not chapter.progress_completed:
+            return NOT_STARTED
+        return ChapterState(True, chapter.progress_completed_at)
+
+    def set(self, user, chapter, completed, when=None):
+        now = timezone.now()
+        completed_at = (when or now) if completed else None
+        with transaction.atomic():
+            enrollment = aggregates.lock_enrollment(user, chapter.course_id)
+            # A single conflict-aware statement that only changes the row when the flag flips
+            if completed:
+                flipped = chapter.pk in upsert_completed(user.pk, [(chapter.pk, completed_at)])
+            else:
+                flipped = bool(
+                    Progress.objects.filter(user=user, chapter=chapter, completed=True)
+                    .update(completed=False, completed_at=None, uncompleted_at=when or now)
+                )
+            was_completed = completed != flipped
+            aggregates.record_write(self, enrollment, chapter, was_completed, completed, now)
+
+        if completed and not flipped:
+            # Already completed: the first completion time is kept
+            return self.get(user, chapter)
+        return ChapterState(completed, completed_at)
+
+    def apply_batch(self, user, course_id, changes):
+        # Apply {chapter: (completed, when)} for one course with last-writer-wins.
+        # Returns {chapter_id: status} with statuses from resolve_change().
+        now = timezone.now()
+        with transaction.atomic():
+            enrollment = aggregates.lock_enrollment(user, course_id)
+            stored, uncompleted_at = {}, {}
+            for row in Progress.objects.filter(user=user, chapter__in=list(changes)).values(
+                'chapter_id', 'completed', 'completed_at', 'uncompleted_at',
+            ):
+                stored[row['chapter_id']] = ChapterState(row['completed'], row['completed_at'])
+                uncompleted_at[row['chapter_id']] = row['uncompleted_at']
+            statuses, to_complete, to_clear = {}, [], []
+            for chapter, (completed, when) in changes.items():
+                status = resolve_change(
+                    stored.get(chapter.pk, NOT_STARTED), completed, when, uncompleted_at.get(chapter.pk),
+                )
+                statuses[chapter.pk] = status
+                if status == 'applied':
+                    (to_complete if completed else to_clear).append((chapter.pk, when))
+
+            completed_count = len(upsert_completed(user.pk, to_complete)) if to_complete else 0
+            cleared_count = 0
+            if to_clear:
+                cleared_count = Progress.objects.filter(
+                    user=user, chapter_id__in=[chapter_id for chapter_id, _ in to_clear], completed=True
+                ).update(
+                    completed=False, completed_at=None,
+                    uncompleted_at=Case(*[When(chapter_id=chapter_id, then=Value(when)) for chapter_id, when in to_clear]),
+                )
+            aggregates.record_batch(self, enrollment, completed_count, cleared_count, now)
+        return statuses
+
+    def completed_chapter_ids(self, user, course_id):
+        completed = set(
+            Progress.objects.filter(user=user, chapter__course_id=course_id, completed=True)
+            .values_list('chapter_id', flat=True)
+        )
+        # Nothing completed: the enrollment may be archived
+        return completed or set(archive.archived_times(user, course_id) or ())
+
+    async def acompleted_chapter_ids(self, user, course_id):
+        rows = Progress.objects.filter(user=user, chapter__course_id=course_id, completed=True)
+        completed = {chapter_id async for chapter_id in rows.values_list('chapter_id', flat=True)}
+        return completed or set(await archive.aarchived_times(user, course_id) or ())
+
+    def completion_by_user(self, course_id, user_ids):
+        # {user_id: set of completed chapter ids} for many users in two queries
+        return {user_id: set(times) for user_id, times in self.completion_times(course_id, user_ids).items()}
+
+    def completion_times(self, course_id, user_ids):
+        # {user_id: {chapter_id: completed_at}} for many users: one query for the rows, one for
+        # the archives
+        times = {}
+        rows = Progress.objects.filter(
+            user_id__in=user_ids, chapter__course_id=course_id, completed=True
+        ).values_list('user_id', 'chapter_id', 'completed_at')
+        for user_id, chapter_id, completed_at in rows:
+            times.setdefault(user_id, {})[chapter_id] = completed_at
+        archives = ProgressArchive.objects.filter(
+            enrollment__course_id=course_id, enrollment__user_id__in=user_ids
+        ).values_list('enrollment__user_id', 'completed_at')
+        for user_id, completed_at in archives:
+            times.setdefault(user_id, {}).update(archive.unpack(completed_at))
+        return times
+
+
+class BitmapProgressStore:
+    def init_enrollments(self, enrollments, chapter_ids):
+        EnrollmentProgress.objects.bulk_create(
+            [EnrollmentProgress(enrollment_id=enrollment.pk) for enrollment in enrollments],
+            batch_size=PROGRESS_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def _record(self, user, course_id):
+        return EnrollmentProgress.objects.filter(
+            enrollment__user=user, enrollment__course_id=course_id
+        ).only('bits', 'completed_at').first()
+
+    async def _arecord(self, user, course_id):
+        return await EnrollmentProgress.objects.filter(
+            enrollment__user=user, enrollment__course_id=course_id
+        ).only('bits', 'completed_at').afirst()
+
+    def get(self, user, chapter):
+        return self._state(self._record(user, chapter.course_id), chapter_slot(chapter))
+
+    async def aget(self, user, chapter):
+        return self._state(await self._arecord(user, chapter.course_id), await achapter_slot(chapter))
+
+    def _state(self, record, slot):
+        if record is None or not bit_is_set(bytes(record.bits), slot):
+            return NOT_STARTED
+        return ChapterState(True, parse_datetime(record.completed_at.get(str(slot), '')))
+
+    def reader_annotations(self, user):
+        record = EnrollmentProgress.objects.filter(enrollment__user=user, enrollment__course_id=OuterRef('course_id'))
+        return {
+            'progress_bits': Subquery(record.values('bits')[:1]),
+            'progress_completed_at': Subquery(record.values('completed_at')[:1]),
+        }
+
+    def annotated_state(self, chapter):
+        slot = chapter_slot(chapter)
+        if chapter.progress_bits is None or not bit_is_set(bytes(chapter.progress_bits), slot):
+            return NOT_STARTED
+        return ChapterState(True, parse_datetime((chapter.progress_completed_at or {}).get(str(slot), '')))
+
+    def set(self, user, chapter, completed, when=None):
+        now = timezone.now()
+        completed_at = (when or now) if completed else None
+        slot = chapter_slot(chapter)
+        with transaction.atomic():
+            # The locked enrollment row also serializes writes to its bitmap
+            enrollment = aggregates.lock_enrollment(user, chapter.course_id)
+            record, created = EnrollmentProgress.objects.get_or_create(enrollment_id=enrollment.id)
+            was_completed = bit_is_set(bytes(record.bits), slot)
+            record.bits = set_bit(bytes(record.bits), slot, completed)
+            if completed:
+                record.completed_at[str(slot)] = completed_at.isoformat()
+                record.uncompleted_at.pop(str(slot), None)
+            else:
+                record.completed_at.pop(str(slot), None)
+                record.uncompleted_at[str(slot)] = (when or now).isoformat()
+            record.save()
+            aggregates.record_write(self, enrollment, chapter, was_completed, completed, now)
+        return ChapterState(completed, completed_at)
+
+    def apply_batch(self, user, course_id, changes):
+        # Apply {chapter: (completed, when)} for one course with last-writer-wins:
+        # the whole batch is one read-modify-write of the enrollment's bitmap
+        now = timezone.now()
+        with transaction.atomic():
+            enrollment = aggregates.lock_enrollment(user, course_id)
+            record, created = EnrollmentProgress.objects.get_or_create(enrollment_id=enrollment.id)
+            bits = bytes(record.bits)
+            statuses, completed_count, cleared_count = {}, 0, 0
+            for chapter, (completed, when) in changes.items():
+                slot = str(chapter_slot(chapter))
+                stored = ChapterState(bit_is_set(bits, int(slot)), parse_datetime(record.completed_at.get(slot, '')))
+                status = resolve_change(stored, completed, when, parse_datetime(record.uncompleted_at.get(slot, '')))
+                statuses[chapter.pk] = status
+                if status != 'applied':
+                    continue
+                bits = set_bit(bits, int(slot), completed)
+                if completed:
+                    record.completed_at[slot] = when.isoformat()
+                    record.uncompleted_at.pop(slot, None)
+                    completed_count += 1
+                else:
+                    record.completed_at.pop(slot, None)
+                    record.uncompleted_at[slot] = when.isoformat()
+                    cleared_count += 1
+            if completed_count or cleared_count:
+                record.bits = bits
+                record.save()
+            aggregates.record_batch(self, enrollment, completed_count, cleared_count, now)
+        return statuses
+
+    def completed_chapter_ids(self, user, course_id):
+        record = self._record(user, course_id)
+        slots = set(set_bits(bytes(record.bits))) if record is not None else set()
+        if not slots:
+            return set()
+        return set(
+            Chapter.objects.filter(course_id=course_id, slot__in=slots).values_list('id', flat=True)
+        )
+
+    async def acompleted_chapter_ids(self, user, course_id):
+        record = await self._arecord(user, course_id)
+        slots = set(set_bits(bytes(record.bits))) if record is not None else set()
+        if not slots:
+            return set()
+        chapters = Chapter.objects.filter(course_id=course_id, slot__in=slots)
+        return {chapter_id async for chapter_id in chapters.values_list('id', flat=True)}
+
+    def completion_by_user(self, course_id, user_ids):
+        # {user_id: set of completed chapter ids}: one query for the bitmaps, one for the slot map
+        records = EnrollmentProgress.objects.filter(
+            enrollment__course_id=course_id, enrollment__user_id__in=user_ids
+        ).values_list('enrollment__user_id', 'bits')
+        chapter_by_slot = dict(Chapter.objects.filter(course_id=course_id).values_list('slot', 'id'))
+        return {
+            user_id: {chapter_by_slot[slot] for slot in set_bits(bytes(bits)) if slot in chapter_by_slot}
+            for user_id, bits in records
+        }
+
+    def completion_times(self, course_id, user_ids):
+        # {user_id: {chapter_id: completed_at}}: one query for the bitmaps, one for the slot map
+        records = EnrollmentProgress.objects.filter(
+            enrollment__course_id=course_id, enrollment__user_id__in=user_ids
+        ).values_list('enrollment__user_id', 'bits', 'completed_at')
+        chapter_by_slot = dict(Chapter.objects.filter(course_id=course_id).values_list('slot', 'id'))
+        return {
+            user_id: {
+                chapter_by_slot[slot]: parse_datetime(completed_at.get(str(slot), ''))
+                for slot in set_bits(bytes(bits)) if slot in chapter_by_slot
+            }
+            for user_id, bits, completed_at in records
+        }
+
+
+STORES = {
+    'rows': RowProgressStore(),
+    'bitmap': BitmapProgressStore(),
+}
+
+
+def progress_backend():
+    # The configured store itself, for jobs that must see only applied progress
+    return STORES[getattr(settings, 'PROGRESS_BACKEND', 'rows')]
+
+
+def progress_store():
+    # The store for request handling: fronted by the write-behind queue when PROGRESS_WRITE_BEHIND is on
+    store = progress_backend()
+    if getattr(settings, 'PROGRESS_WRITE_BEHIND', False):
+        from .write_behind import WriteBehindStore  # write_behind imports this module
+        return WriteBehindStore(store)
+    return store
@@ -0,0 +1,174 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import hashing
+from .enrollment import enroll_users
+from .models import Course
+
+# Bulk user provisioning from CSV or JSON Lines, for onboarding a whole institution at once.
+#
+# JSON Lines: one user per line, {"email": ..., "password": ..., "first_name": ..., "last_name": ...}
+# CSV: a header row with at least an email column; password, first_name and last_name are optional.
+#
+# Users are keyed by email (the username, as in signup_view). Emails already registered, or
+# repeated in the input, are skipped. Users without a password get an unusable one and sign
+# in after a password reset. Password hashing is deliberately slow, so it runs in a process
+# pool across all cores (see e_app.hashing for what the workers import); users are written
+# with one bulk insert per chunk, and each chunk can enroll its users (new and existing) in
+# the given courses.
+
+FORMATS = ('jsonl', 'csv')
+
+# Users checked, hashed and written per transaction
+PROVISION_CHUNK_SIZE = 1000
+
+# Fewer passwords than this are hashed in-process: starting the pool would cost more
+POOL_MIN_PASSWORDS = 32
+
+
+class ProvisioningError(ValueError):
+    pass
+
+
+def read_users(lines, fmt):
+    # Parse an iterable of text lines into user dicts, one user at a time
+    if fmt == 'jsonl':
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                user = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ProvisioningError(f'Line {number}: {e}')
+            yield _clean_user(user, f'Line {number}')
+        return
+
+    reader = csv.DictReader(lines)
+    if 'email' not in (reader.fieldnames or ()):
+        raise ProvisioningError('Missing CSV column: email')
+    for row in reader:
+        yield _clean_user(row, f'Row {reader.line_num}')
+
+
+def _clean_user(user, where):
+    if not isinstance(user, dict):
+        raise ProvisioningError(f'{where}: expected an object')
+    email = str(user.get('email') or '').strip()
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ProvisioningError(f'{where}: invalid email {email!r}')
+    # The email is the username, and validate_email allows longer ones than the column holds
+    max_length = User._meta.get_field('username').max_length
+    if len(email) > max_length:
+        raise ProvisioningError(f'{where}: email longer than {max_length} characters')
+    return {
+        'email': email,
+        'password': str(user['password']) if user.get('password') else None,
+        'first_name': str(user.get('first_name') or '')[:150],
+        'last_name': str(user.get('last_name') or '')[:150],
+    }
+
+
+def hash_passwords(passwords, pool=None, workers=1, slot=nullcontext):
+    # Hashes in the order given; None gets an unusable password. The hasher is resolved here
+    # from the settings and sent to the workers along with hashing.encode. Each password
+    # hashed in this process is hashed inside `with slot():`.
+    hashes = [make_password(None) if password is None else None for password in passwords]
+    todo = [index for index, password in enumerate(passwords) if password is not None]
+    if todo:
+        encode = partial(hashing.encode, get_hasher())
+        values = [passwords[index] for index in todo]
+        if pool is None or len(values) < POOL_MIN_PASSWORDS:
+            encoded = []
+            for value in values:
+                with slot():
+                    encoded.append(encode(value))
+        else:
+            # A few tasks per worker keeps them all busy without a round trip per password
+            encoded = pool.map(encode, values, chunksize=max(1, len(values) // (workers * 4)))
+        for index, value in zip(todo, encoded):
+            hashes[index] = value
+    return hashes
+
+
+def provision_users(users, course_ids=(), chunk_size=PROVISION_CHUNK_SIZE, workers=None, progress=None,
+                    slot=nullcontext):
+    # Create users chunk by chunk, one transaction per chunk, and enroll every user of the input
+    # in `course_ids`. workers is the hashing process count (default: all cores; 1 hashes in
+    # this process). slot is passed on to hash_passwords. progress(totals) is called after
+    # every chunk. Returns the totals.
+    courses = list(Course.objects.filter(id__in=course_ids))
+    missing = set(course_ids) - {course.id for course in courses}
+    if missing:
+        raise ProvisioningError(f'Unknown course ids: {", ".join(map(str, sorted(missing)))}')
+
+    workers = workers or os.cpu_count() or 1
+    totals = {'created': 0, 'already_registered': 0, 'duplicates': 0, 'enrolled': 0, 'hash_seconds': 0.0}
+    seen = set()
+    users = iter(users)
+    pool = None
+    try:
+        while True:
+            chunk = list(islice(users, chunk_size))
+            if not chunk:
+                return totals
+            # Started once the input turns out to be large enough to need it. Spawned rather than
+            # forked, so every platform runs the workers the same way and none inherits this
+            # process's database connections or threads.
+            if pool is None and workers > 1 and len(chunk) >= POOL_MIN_PASSWORDS:
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _provision_chunk(chunk, seen, courses, pool, workers, slot, totals)
+            if progress:
+                progress(totals)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _provision_chunk(chunk, seen, courses, pool, workers, slot, totals):
+    unique = []
+    for user in chunk:
+        if user['email'] in seen:
+            totals['duplicates'] += 1
+            continue
+        seen.add(user['email'])
+        unique.append(user)
+
+    # One set-based query for the whole chunk instead of an exists() per user
+    existing = dict(User.objects.filter(username__in=[user['email'] for user in unique]).values_list('username', 'id'))
+    new = [user for user in unique if user['email'] not in existing]
+
+    started = time.perf_counter()
+    hashes = hash_passwords([user['password'] for user in new], pool, workers, slot)
+    totals['hash_seconds'] = round(totals['hash_seconds'] + time.perf_counter() - started, 4)
+
+    try:
+        with transaction.atomic():
+            created = User.objects.bulk_create([
+                User(username=user['email'], email=user['email'], password=password,
+                     first_name=user['first_name'], last_name=user['last_name'])
+                for user, password in zip(new, hashes)
+            ])
+            user_ids = list(existing.values()) + [user.id for user in created]
+            for course in courses:
+                report = enroll_users(course, user_ids, chunk_size=max(1, len(user_ids)))
+                totals['enrolled'] += sum(entry['enrolled'] for entry in report)
+    except IntegrityError:
+        # Someone registered one of these emails since the check; the chunk was rolled back
+        raise ProvisioningError('An email in this chunk was registered concurrently; re-run to skip it')
+    totals['created'] += len(created)
+    totals['already_registered'] += len(existing)
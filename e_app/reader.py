@@ -0,0 +1,69 @@
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Chapter
+from .progress import progress_store
+
+# The chapter reader: a chapter, its previous and next chapters, the course title and the
+# user's progress, read in a single query. The neighbours and the progress are
+# correlated subqueries, each a lookup on the (course, order, id) chapter index or a unique
+# progress key, so the cost does not grow with the number of chapters in the course.
+
+STUB_FIELDS = ('id', 'title', 'order')
+
+
+def _neighbour(direction, field):
+    # One column of the previous or next chapter in (order, id) order
+    siblings = Chapter.objects.filter(course_id=OuterRef('course_id'))
+    if direction == 'previous':
+        siblings = siblings.filter(
+            Q(order__lt=OuterRef('order')) | Q(order=OuterRef('order'), id__lt=OuterRef('pk'))
+        ).order_by('-order', '-id')
+    else:
+        siblings = siblings.filter(
+            Q(order__gt=OuterRef('order')) | Q(order=OuterRef('order'), id__gt=OuterRef('pk'))
+        ).order_by('order', 'id')
+    return Subquery(siblings.values(field)[:1])
+
+
+def chapter_page(user, course_id, order, prefetch_next=False, with_progress=True):
+    # The annotated chapter at `order` in the course, or None; prefetch_next adds the next
+    # chapter's description. The caller checks the enrollment (see enrollment_cache).
+    annotations = {}
+    for direction in ('previous', 'next'):
+        for field in STUB_FIELDS:
+            annotations[f'{direction}_{field}'] = _neighbour(direction, field)
+    if prefetch_next:
+        annotations['next_description'] = _neighbour('next', 'description')
+    if with_progress:
+        annotations.update(progress_store().reader_annotations(user))
+    return (
+        Chapter.objects.filter(course_id=course_id, order=order)
+        .select_related('course').defer('course__description')
+        .annotate(**annotations).order_by('id').first()
+    )
+
+
+def _stub(chapter, direction):
+    if getattr(chapter, f'{direction}_id') is None:
+        return None
+    stub = {field: getattr(chapter, f'{direction}_{field}') for field in STUB_FIELDS}
+    if direction == 'next' and hasattr(chapter, 'next_description'):
+        stub['description'] = chapter.next_description
+    return stub
+
+
+def page_payload(chapter, progress):
+    return {
+        'chapter': {
+            'id': chapter.id,
+            'title': chapter.title,
+            'description': chapter.description,
+            'order': chapter.order,
+            'course_id': chapter.course_id,
+            'course_title': chapter.course.title,
+            'completed': progress.completed,
+            'completed_at': progress.completed_at,
+        },
+        'previous': _stub(chapter, 'previous'),
+        'next': _stub(chapter, 'next'),
+    }
@@ -0,0 +1,159 @@
+import re
+
+from django.db import connection, transaction
+
+from .models import Article, Chapter, Course, SearchDocument
+
+# Rows written per INSERT when rebuilding the index
+REBUILD_BATCH_SIZE = 1000
+
+MAX_RESULTS = 50
+
+
+# --- Building documents -------------------------------------------------------
+
+def course_document(course):
+    return SearchDocument(
+        kind='course', object_id=course.pk, course_id=course.pk, title=course.title,
+        body=' '.join(filter(None, [course.category, course.description])),
+    )
+
+
+def chapter_document(chapter):
+    return SearchDocument(
+        kind='chapter', object_id=chapter.pk, course_id=chapter.course_id, title=chapter.title,
+        body=chapter.description or '',
+    )
+
+
+def article_document(article):
+    return SearchDocument(
+        kind='article', object_id=article.pk, course_id=article.course_id, title=article.title,
+        body=article.content,
+    )
+
+
+DOCUMENT_BUILDERS = {
+    Course: course_document,
+    Chapter: chapter_document,
+    Article: article_document,
+}
+
+
+def _upsert(documents):
+    # One INSERT ... ON CONFLICT (kind, object_id) DO UPDATE per batch; the database
+    # keeps the full-text index in step (generated column / FTS triggers)
+    SearchDocument.objects.bulk_create(
+        documents,
+        batch_size=REBUILD_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['course', 'title', 'body'],
+    )
+
+
+def index_instance(instance):
+    _upsert([DOCUMENT_BUILDERS[type(instance)](instance)])
+
+
+def index_instances(instances):
+    # For bulk writes, which skip the post_save handler
+    _upsert([DOCUMENT_BUILDERS[type(instance)](instance) for instance in instances])
+
+
+def remove(kind, object_id):
+    # Document kinds match the model names: course, chapter, article
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE, stdout=None):
+    # Re-index everything in bulk, streaming each model with iterator() so memory stays bounded
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for model, build in DOCUMENT_BUILDERS.items():
+            batch, total = [], 0
+            for instance in model.objects.order_by('pk').iterator(chunk_size=batch_size):
+                batch.append(build(instance))
+                if len(batch) >= batch_size:
+                    SearchDocument.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            SearchDocument.objects.bulk_create(batch)
+            total += len(batch)
+            if stdout:
+                stdout.write(f'Indexed {total} {model._meta.verbose_name_plural}')
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("INSERT INTO e_app_searchdocument_fts(e_app_searchdocument_fts) VALUES ('rebuild')")
+
+
+# --- Querying -----------------------------------------------------------------
+
+POSTGRES_SEARCH_SQL = """
+    SELECT d.kind, d.object_id, d.course_id, d.title,
+           ts_headline('english', d.body, q, 'MaxFragments=1, MaxWords=20, MinWords=5') AS snippet,
+           ts_rank_cd(d.search_vector, q) AS rank
+    FROM e_app_searchdocument d, websearch_to_tsquery('english', %s) q
+    WHERE d.search_vector @@ q {kind_filter}
+    ORDER BY rank DESC, d.id
+    LIMIT %s
+"""
+
+# bm25() returns lower-is-better scores; titles weigh 10x the body
+SQLITE_SEARCH_SQL = """
+    SELECT d.kind, d.object_id, d.course_id, d.title,
+           snippet(e_app_searchdocument_fts, 1, '', '', '...', 20) AS snippet,
+           -bm25(e_app_searchdocument_fts, 10.0, 1.0) AS rank
+    FROM e_app_searchdocument_fts
+    JOIN e_app_searchdocument d ON d.id = e_app_searchdocument_fts.rowid
+    WHERE e_app_searchdocument_fts MATCH %s {kind_filter}
+    ORDER BY rank DESC, d.id
+    LIMIT %s
+"""
+
+
+def _fts5_query(query):
+    # Quote every term so user input can't use FTS5 syntax; terms are ANDed, the last one is a prefix
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search(query, kind=None, limit=20):
+    # Ranked matches as dicts: kind, object_id, course_id, title, snippet, rank
+    limit = max(1, min(limit, MAX_RESULTS))
+    kind_filter = 'AND d.kind = %s' if kind else ''
+
+    if connection.vendor == 'postgresql':
+        sql, term = POSTGRES_SEARCH_SQL, query
+    elif connection.vendor == 'sqlite':
+        sql, term = SQLITE_SEARCH_SQL, _fts5_query(query)
+        if term is None:
+            return []
+    else:
+        return _fallback_search(query, kind, limit)
+
+    params = [term] + ([kind] if kind else []) + [limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(kind_filter=kind_filter), params)
+        columns = [column[0] for column in cursor.description]
+        return [
+            dict(zip(columns, row), rank=round(float(row[-1]), 6))
+            for row in cursor.fetchall()
+        ]
+
+
+def _fallback_search(query, kind, limit):
+    # Unranked substring match for databases without a full-text engine
+    documents = SearchDocument.objects.filter(title__icontains=query) | SearchDocument.objects.filter(
+        body__icontains=query
+    )
+    if kind:
+        documents = documents.filter(kind=kind)
+    return [
+        dict(document, snippet=document['title'], rank=0.0)
+        for document in documents.order_by('id').values('kind', 'object_id', 'course_id', 'title')[:limit]
+    ]
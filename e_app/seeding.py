@@ -0,0 +1,147 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import aggregates, catalog_cache, search, snapshots
+from .enrollment import enroll_users
+from .models import Article, Chapter, Course, Enrollment, EnrollmentProgress, Progress
+from .progress import PROGRESS_BATCH_SIZE, BitmapProgressStore, progress_backend, set_bit
+
+# Synthetic data for benchmarks and local load testing. Everything is written with bulk
+# inserts, so model signals do not run: slots are assigned here, and the search index,
+# content snapshots, catalog cache and enrollment aggregates are rebuilt once at the end.
+
+CATEGORIES = ('Programming', 'Design', 'Business', 'Marketing', 'Data Science', 'Languages')
+WORDS = (
+    'introduction advanced practical modern complete guide fundamentals applied project based '
+    'python django design patterns data analysis testing performance databases caching security'
+).split()
+SEED_BATCH_SIZE = 1000
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(courses=10, chapters=10, articles=5, users=100, enrollments=3, completion=0.5,
+         random_seed=0, prefix='seed', password='password', article_words=200,
+         batch_size=SEED_BATCH_SIZE, stdout=None):
+    # Create the dataset and return how many of each object were written.
+    # Each user enrolls in `enrollments` random courses and completes the first
+    # `completion` share of their chapters (randomized per enrollment).
+    rng = random.Random(random_seed)
+    now = timezone.now()
+
+    def log(message):
+        if stdout:
+            stdout.write(message)
+
+    with transaction.atomic():
+        course_objs = Course.objects.bulk_create(
+            [
+                Course(title=f'{_sentence(rng, 3)} {n}', description=_sentence(rng, 30), category=rng.choice(CATEGORIES))
+                for n in range(courses)
+            ],
+            batch_size=batch_size,
+        )
+        log(f'Created {len(course_objs)} courses')
+
+        # Slots are normally assigned by a pre_save signal, which bulk_create skips
+        Chapter.objects.bulk_create(
+            [
+                Chapter(course=course, title=_sentence(rng, 4), description=_sentence(rng, 20), order=n + 1, slot=n)
+                for course in course_objs
+                for n in range(chapters)
+            ],
+            batch_size=batch_size,
+        )
+        log(f'Created {courses * chapters} chapters')
+
+        Article.objects.bulk_create(
+            [
+                Article(course=course, title=_sentence(rng, 5), content=_sentence(rng, article_words), order=n + 1)
+                for course in course_objs
+                for n in range(articles)
+            ],
+            batch_size=batch_size,
+        )
+        log(f'Created {courses * articles} articles')
+
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password_hash = make_password(password)
+        offset = User.objects.filter(username__startswith=f'{prefix}-').count()
+        user_objs = User.objects.bulk_create(
+            [
+                User(username=f'{prefix}-{n}@example.com', email=f'{prefix}-{n}@example.com', password=password_hash)
+                for n in range(offset, offset + users)
+            ],
+            batch_size=batch_size,
+        )
+        User.objects.get_or_create(
+            username=f'{prefix}-staff@example.com',
+            defaults={'email': f'{prefix}-staff@example.com', 'password': password_hash, 'is_staff': True},
+        )
+        log(f'Created {len(user_objs)} users')
+
+        cohorts = {course.pk: [] for course in course_objs}
+        for user in user_objs:
+            for course in rng.sample(course_objs, min(enrollments, len(course_objs))):
+                cohorts[course.pk].append(user.pk)
+        store = progress_backend()
+        total_enrollments = 0
+        for course in course_objs:
+            report = enroll_users(course, cohorts[course.pk], chunk_size=batch_size)
+            total_enrollments += sum(chunk['enrolled'] for chunk in report)
+            _complete(store, course, completion, rng, now, batch_size)
+            aggregates.recompute_course(store, course.pk, fix=True)
+        log(f'Created {total_enrollments} enrollments')
+
+        search.rebuild()
+        snapshots.refresh([course.pk for course in course_objs])
+
+    catalog_cache.invalidate_list()
+    return {
+        'courses': len(course_objs),
+        'chapters': courses * chapters,
+        'articles': courses * articles,
+        'users': len(user_objs),
+        'enrollments': total_enrollments,
+    }
+
+
+def _complete(store, course, completion, rng, now, batch_size):
+    # Mark the leading chapters of each enrollment complete, in bulk
+    chapters = list(Chapter.objects.filter(course=course).order_by('order').values_list('id', 'slot'))
+    enrollments = Enrollment.objects.filter(course=course).values_list('id', 'user_id')
+    done = {}
+    for enrollment_id, user_id in enrollments:
+        # Spread completion around the requested ratio
+        share = min(1.0, max(0.0, rng.gauss(completion, 0.2))) if 0 < completion < 1 else completion
+        done[(enrollment_id, user_id)] = chapters[:round(share * len(chapters))]
+
+    if isinstance(store, BitmapProgressStore):
+        records = []
+        for (enrollment_id, user_id), completed in done.items():
+            bits = b''
+            for chapter_id, slot in completed:
+                bits = set_bit(bits, slot, True)
+            records.append(EnrollmentProgress(
+                enrollment_id=enrollment_id, bits=bits,
+                completed_at={str(slot): now.isoformat() for chapter_id, slot in completed},
+            ))
+        EnrollmentProgress.objects.bulk_update(records, ['bits', 'completed_at'], batch_size=batch_size)
+    else:
+        Progress.objects.bulk_create(
+            [
+                Progress(user_id=user_id, chapter_id=chapter_id, completed=True, completed_at=now)
+                for (enrollment_id, user_id), completed in done.items()
+                for chapter_id, slot in completed
+            ],
+            batch_size=PROGRESS_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'chapter'],
+            update_fields=['completed', 'completed_at'],
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+# Expired session cleanup for the 'db' and 'cached_db' session modes (see SESSION_MODE in
+# settings). Django's clearsessions deletes every expired row in one statement, which on a
+# large django_session table is a long write that logins queue behind; this deletes them a
+# batch of primary keys at a time instead. The 'cache' mode needs no cleanup: entries expire
+# in the cache.
+
+SESSION_CLEANUP_BATCH_SIZE = 5000
+
+
+def uses_session_table():
+    return settings.SESSION_ENGINE in (
+        'django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db',
+    )
+
+
+def clear_expired(batch_size=SESSION_CLEANUP_BATCH_SIZE, pause=0.0, now=None, progress=None):
+    # Delete sessions that expired before `now`; returns how many were deleted.
+    # Sessions expiring while this runs are left for the next run.
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+        if progress:
+            progress(deleted)
+        if pause:
+            time.sleep(pause)
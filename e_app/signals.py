@@ -0,0 +1,159 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, auth_backends, catalog_cache, enrollment_cache, progress, search, snapshots
+from .models import Article, Chapter, Course, Enrollment
+
+
+# Cache, snapshot and search updates run once the writer's transaction commits: run inside
+# it, a concurrent reader could cache the old row again right after the invalidation and
+# keep it for the whole timeout. Values are read from the instance now, as a deleted
+# instance loses its pk before the callbacks run.
+
+# Course edits change the list and every snapshot of the course (they all embed the title)
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, raw=False, **kwargs):
+    course_id = instance.pk
+
+    def update():
+        catalog_cache.invalidate_course(course_id)
+        if not raw:
+            snapshots.refresh([course_id])
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    course_id = instance.pk
+
+    def update():
+        catalog_cache.invalidate_course(course_id)
+        catalog_cache.invalidate('chapters', course_id)
+    transaction.on_commit(update)
+
+
+# Chapters and articles can be moved to another course or reordered in the admin, so
+# remember where they were before the save and update both old and new course.
+@receiver(pre_save, sender=Chapter)
+@receiver(pre_save, sender=Article)
+def remember_previous_course(sender, instance, **kwargs):
+    instance._previous_course_id = instance._previous_order = None
+    if instance.pk is not None:
+        instance._previous_course_id, instance._previous_order = (
+            sender.objects.filter(pk=instance.pk).values_list('course_id', 'order').first() or (None, None)
+        )
+
+
+@receiver(pre_save, sender=Chapter)
+def assign_chapter_slot(sender, instance, **kwargs):
+    # New chapters, and chapters moved to another course, take the next free slot in their course
+    moved = getattr(instance, '_previous_course_id', None) not in (None, instance.course_id)
+    if instance.slot is None or moved:
+        instance.slot = progress.next_slot(instance.course_id)
+
+
+def _affected_course_ids(instance):
+    course_ids = {instance.course_id, getattr(instance, '_previous_course_id', None)}
+    course_ids.discard(None)
+    return course_ids
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def chapter_changed(sender, instance, **kwargs):
+    course_ids = _affected_course_ids(instance)
+
+    def update():
+        for course_id in course_ids:
+            catalog_cache.invalidate('chapters', course_id)
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def article_changed(sender, instance, **kwargs):
+    course_ids = _affected_course_ids(instance)
+
+    def update():
+        for course_id in course_ids:
+            catalog_cache.invalidate('articles', course_id)
+    transaction.on_commit(update)
+
+
+# Re-render the snapshots that embed the saved chapter or article. Deletes only drop them:
+# the course may be being deleted too, and a snapshot written now would outlive it.
+@receiver(post_save, sender=Chapter)
+@receiver(post_save, sender=Article)
+def render_snapshots(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    course_ids = _affected_course_ids(instance)
+    kinds = ('outline',) if sender is Chapter else ('articles',)
+    transaction.on_commit(lambda: snapshots.refresh(course_ids, kinds))
+
+
+@receiver(post_delete, sender=Chapter)
+@receiver(post_delete, sender=Article)
+def discard_snapshots(sender, instance, **kwargs):
+    course_ids = _affected_course_ids(instance)
+    kinds = ('outline',) if sender is Chapter else ('articles',)
+    transaction.on_commit(lambda: snapshots.discard(course_ids, kinds))
+
+
+# Keep the full-text search index current as content is edited
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Chapter)
+@receiver(post_save, sender=Article)
+def index_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: search.index_instance(instance))
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Chapter)
+@receiver(post_delete, sender=Article)
+def remove_from_search(sender, instance, **kwargs):
+    # After the commit too, so it still follows an index_for_search() queued earlier
+    kind, object_id = instance._meta.model_name, instance.pk
+    transaction.on_commit(lambda: search.remove(kind, object_id))
+
+
+# Keep the per-enrollment progress aggregates consistent with the course's chapters
+def _recompute_after_commit(course_ids):
+    def recompute():
+        for course_id in Course.objects.filter(pk__in=course_ids).values_list('pk', flat=True):
+            aggregates.recompute_course(progress.progress_backend(), course_id)
+    transaction.on_commit(recompute)
+
+
+@receiver(post_save, sender=Chapter)
+def chapter_saved_aggregates(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        aggregates.chapter_added(instance)
+    elif instance._previous_course_id is not None and (
+        instance._previous_course_id != instance.course_id or instance._previous_order != instance.order
+    ):
+        _recompute_after_commit(_affected_course_ids(instance))
+
+
+@receiver(post_delete, sender=Chapter)
+def chapter_deleted_aggregates(sender, instance, **kwargs):
+    _recompute_after_commit([instance.course_id])
+
+
+# Drop users cached by CachedModelBackend when they change (password, is_active, staff flags)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    auth_backends.forget_user(instance.pk)
+
+
+# Drop the user's cached set of enrolled courses when one of their enrollments changes
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    enrollment_cache.forget(instance.user_id)
@@ -0,0 +1,203 @@
+import gzip
+import hashlib
+import json
+import re
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from . import catalog_cache, db_routing
+from .models import Article, Chapter, ContentSnapshot, Course
+
+# Pre-rendered public course payloads. Each course has one ContentSnapshot per kind:
+#   course    the course_detail response
+#   outline   the course_outline response: the course and its ordered chapters
+#   articles  the course_articles response (without parameters)
+# A snapshot holds the JSON bytes, their gzip and deflate encodings and an ETag, rendered
+# when the course, a chapter or an article is saved (see signals.py), so serving one copies
+# stored bytes instead of building dicts and encoding them on every request. Snapshots never
+# contain per-user data: progress is served separately by course_progress.
+#
+# Snapshots are also cached in the catalog cache under their kind, so a warm request runs no
+# query at all. Deleting a chapter or article drops the snapshot instead of re-rendering it
+# (the course itself may be on its way out); missing snapshots are rendered on first read,
+# and bulk writes that skip the signals call refresh() themselves.
+
+KINDS = ('course', 'outline', 'articles')
+ARTICLE_FIELDS = ('id', 'title', 'content', 'order')
+CHAPTER_FIELDS = ('id', 'title', 'description', 'order')
+
+# Rendered once per save, so spend the CPU on the smallest body
+GZIP_LEVEL = 9
+DEFLATE_LEVEL = 9
+
+# Stored encodings by Content-Encoding; gzip wins when a client accepts both equally
+ENCODINGS = {'gzip': 'gzip_body', 'deflate': 'deflate_body'}
+
+# Courses rendered per batch by rebuild()
+SNAPSHOT_BATCH_SIZE = 200
+
+_quality = re.compile(r';\s*q=([0-9.]+)')
+
+
+def _payloads(course_ids, kinds):
+    # {(course_id, kind): payload} for the existing courses among course_ids, with one query
+    # per model whatever the number of courses
+    courses = Course.objects.filter(id__in=course_ids).values('id', 'title', 'description')
+    courses = {course['id']: course for course in courses}
+    chapters, articles = {}, {}
+    if 'outline' in kinds:
+        rows = Chapter.objects.filter(course_id__in=courses).order_by('order').values('course_id', *CHAPTER_FIELDS)
+        for row in rows:
+            chapters.setdefault(row.pop('course_id'), []).append(row)
+    if 'articles' in kinds:
+        rows = Article.objects.filter(course_id__in=courses).order_by('order', 'id').values('course_id', *ARTICLE_FIELDS)
+        for row in rows:
+            articles.setdefault(row.pop('course_id'), []).append(row)
+
+    payloads = {}
+    for course_id, course in courses.items():
+        if 'course' in kinds:
+            payloads[course_id, 'course'] = course
+        if 'outline' in kinds:
+            payloads[course_id, 'outline'] = dict(course, chapters=chapters.get(course_id, []))
+        if 'articles' in kinds:
+            payloads[course_id, 'articles'] = {
+                'course': {'id': course_id, 'title': course['title'], 'articles': articles.get(course_id, [])},
+            }
+    return payloads
+
+
+def encode(payload):
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return {
+        'body': body,
+        # mtime=0 keeps the encoding byte-for-byte reproducible
+        'gzip_body': gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+        # HTTP's "deflate" is the zlib format (RFC 9110), not a raw deflate stream
+        'deflate_body': zlib.compress(body, DEFLATE_LEVEL),
+        'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+    }
+
+
+def refresh(course_ids, kinds=KINDS):
+    # Render and store the snapshots of these courses; returns {(course_id, kind): snapshot}
+    now = timezone.now()
+    # Stored snapshots must not be rendered from a lagging replica
+    with db_routing.use_primary():
+        payloads = _payloads(course_ids, kinds)
+    snapshots = {key: encode(payload) for key, payload in payloads.items()}
+    ContentSnapshot.objects.bulk_create(
+        [
+            ContentSnapshot(course_id=course_id, kind=kind, rendered_at=now, **snapshot)
+            for (course_id, kind), snapshot in snapshots.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['course', 'kind'],
+        update_fields=['body', 'gzip_body', 'deflate_body', 'etag', 'rendered_at'],
+    )
+    for course_id in course_ids:
+        for kind in kinds:
+            catalog_cache.invalidate(kind, course_id)
+    return snapshots
+
+
+def discard(course_ids, kinds=KINDS):
+    ContentSnapshot.objects.filter(course_id__in=course_ids, kind__in=kinds).delete()
+    for course_id in course_ids:
+        for kind in kinds:
+            catalog_cache.invalidate(kind, course_id)
+
+
+def rebuild(batch_size=SNAPSHOT_BATCH_SIZE, stdout=None):
+    # Re-render every course, batch_size courses at a time
+    ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), batch_size):
+        refresh(ids[start:start + batch_size])
+        if stdout:
+            stdout.write(f'Rendered {min(start + batch_size, len(ids))} of {len(ids)} courses')
+    return len(ids)
+
+
+STORED_FIELDS = ('body', 'gzip_body', 'deflate_body', 'etag')
+
+
+def _stored(row):
+    # Postgres returns binary columns as memoryview; the cache and the response want bytes
+    return {field: row[field] if field == 'etag' else bytes(row[field]) for field in STORED_FIELDS}
+
+
+def load(kind, course_id):
+    row = ContentSnapshot.objects.filter(course_id=course_id, kind=kind).values(*STORED_FIELDS).first()
+    if row is not None:
+        return _stored(row)
+    snapshot = refresh([course_id], (kind,)).get((course_id, kind))
+    if snapshot is None:
+        raise Http404('No Course matches the given query.')
+    return snapshot
+
+
+async def aload(kind, course_id):
+    row = await ContentSnapshot.objects.filter(course_id=course_id, kind=kind).values(*STORED_FIELDS).afirst()
+    if row is not None:
+        return _stored(row)
+    snapshot = (await sync_to_async(refresh)([course_id], (kind,))).get((course_id, kind))
+    if snapshot is None:
+        raise Http404('No Course matches the given query.')
+    return snapshot
+
+
+def get(kind, course_id):
+    return catalog_cache.get_or_build(kind, course_id, lambda: load(kind, course_id))
+
+
+async def aget(kind, course_id):
+    return await catalog_cache.aget_or_build(kind, course_id, lambda: aload(kind, course_id))
+
+
+def payload(snapshot):
+    # The decoded payload, for views that add per-request data to it
+    return json.loads(snapshot['body'])
+
+
+def negotiate(accept_encoding):
+    # The stored encoding to send: the one the client accepts with the highest q-value, or
+    # None for the plain body when it accepts neither
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding = part.split(';', 1)[0].strip().lower()
+        match = _quality.search(part)
+        try:
+            qualities[coding] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            qualities[coding] = 0.0
+    best, best_quality = None, 0.0
+    for coding in ENCODINGS:
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def response(request, snapshot):
+    # Serve the stored bytes: 304 when the client has them, else the encoding negotiate()
+    # picks. The ETag is weak because every encoding shares it.
+    etag = f'W/{snapshot["etag"]}'
+    tags = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+    if '*' in tags or snapshot['etag'] in tags:
+        response = HttpResponseNotModified()
+    else:
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+        body = snapshot[ENCODINGS[encoding]] if encoding else snapshot['body']
+        response = HttpResponse(body, content_type='application/json')
+        response['Content-Length'] = str(len(body))
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,89 @@
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import enrollment_cache
+from .models import Chapter
+from .progress import progress_store
+
+# Batched progress sync for clients that queue completions while offline.
+# Each item is {"course_id", "chapter_id", "completed", "completed_at"}; chapter_id is the
+# chapter's ID (as in progress_view), completed_at is when the change happened on the client.
+
+MAX_SYNC_ITEMS = 500
+
+
+def _parse_item(item, now):
+    # (course_id, chapter_id, completed, when) or raise ValueError with a message for the client
+    if not isinstance(item, dict):
+        raise ValueError('Item must be an object.')
+    try:
+        course_id = int(item['course_id'])
+        chapter_id = int(item['chapter_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('course_id and chapter_id must be integers.')
+    completed = item.get('completed')
+    if not isinstance(completed, bool):
+        raise ValueError('completed must be true or false.')
+
+    when = now
+    if item.get('completed_at') is not None:
+        when = parse_datetime(str(item['completed_at']))
+        if when is None:
+            raise ValueError('completed_at must be an ISO 8601 datetime.')
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when, dt_timezone.utc)
+        # Don't let a fast client clock win every conflict
+        when = min(when, now)
+    return course_id, chapter_id, completed, when
+
+
+def sync_progress(user, items):
+    # Validate and apply a batch of progress changes for one user. Enrollments and chapters
+    # for the whole batch are checked with one query each; each course's changes are then
+    # written by the progress store in one transaction. Returns one result dict per item.
+    now = timezone.now()
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = _parse_item(item, now)
+        except ValueError as e:
+            results[index] = {'status': 'error', 'error': str(e)}
+
+    course_ids = {course_id for course_id, _, _, _ in parsed.values()}
+    enrolled = enrollment_cache.enrolled_among(user, course_ids)
+    chapters = Chapter.objects.in_bulk({chapter_id for _, chapter_id, _, _ in parsed.values()})
+
+    # Keep only the latest change per chapter; earlier ones in the batch are superseded
+    latest = {}
+    for index, (course_id, chapter_id, completed, when) in parsed.items():
+        chapter = chapters.get(chapter_id)
+        if course_id not in enrolled:
+            results[index] = {'status': 'error', 'error': 'You are not enrolled in this course.'}
+        elif chapter is None or chapter.course_id != course_id:
+            results[index] = {'status': 'error', 'error': 'Chapter not found.'}
+        else:
+            previous = latest.get(chapter_id)
+            if previous is None or when >= parsed[previous][3]:
+                if previous is not None:
+                    results[previous] = {'status': 'superseded'}
+                latest[chapter_id] = index
+            else:
+                results[index] = {'status': 'superseded'}
+
+    by_course = {}
+    for chapter_id, index in latest.items():
+        course_id, _, completed, when = parsed[index]
+        by_course.setdefault(course_id, {})[chapters[chapter_id]] = (completed, when)
+
+    store = progress_store()
+    for course_id, changes in by_course.items():
+        statuses = store.apply_batch(user, course_id, changes)
+        for chapter, (completed, when) in changes.items():
+            results[latest[chapter.pk]] = {'status': statuses[chapter.pk]}
+
+    for index, (course_id, chapter_id, completed, when) in parsed.items():
+        results[index].update(course_id=course_id, chapter_id=chapter_id)
+    return results
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .instrumentation import JsonResponse
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:  # redis is only installed where RedisCache is used
+    RedisError = OSError
+
+# Load shedding for the views that hash passwords (login_view, signup_view). Hashing is
+# deliberately slow, so a credential-stuffing burst would otherwise take every CPU away from
+# course reading. Two layers, switched off together with THROTTLE_ENABLED:
+#   - token buckets per scope and key (client IP, account) in the THROTTLE_CACHE_ALIAS cache,
+#     sized by THROTTLE_RATES; an empty bucket answers 429 with Retry-After. If the cache
+#     server can't be reached (CACHE_ERRORS), buckets are kept in this process instead until
+#     it is back; any other exception is a bug and propagates.
+#   - at most PASSWORD_HASH_CONCURRENCY hashes in flight per process (default: one per core);
+#     a request finding no free slot is refused at once with 503 and Retry-After instead of
+#     queueing behind the others.
+# Buckets are read and written without a lock, so concurrent requests can overdraw one by a
+# token or two; the hashing cap is exact.
+
+logger = logging.getLogger('e_app.throttling')
+
+# Seconds a client refused for lack of a hashing slot is asked to wait
+HASH_RETRY_AFTER = 1
+
+# What a cache backend raises when its server is down or unreachable: socket errors for
+# Memcached, RedisError (which does not subclass OSError) for Redis
+CACHE_ERRORS = (OSError, RedisError)
+
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+_hash_slots = None
+_hash_slots_lock = threading.Lock()
+
+
+class Throttled(Exception):
+    def __init__(self, status, retry_after, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def enabled():
+    return getattr(settings, 'THROTTLE_ENABLED', True)
+
+
+def client_ip(request):
+    # The peer address; behind a reverse proxy, have it set REMOTE_ADDR from the client's
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _key(scope, key):
+    # Keys may be emails: hash them rather than put them in cache keys
+    return f'throttle:{scope}:{hashlib.sha256(key.encode()).hexdigest()[:32]}'
+
+
+def _take(state, capacity, period, now):
+    # (new state, seconds to wait): refill the bucket for the time elapsed, then take a token
+    tokens, updated = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) * period / capacity
+
+
+def take(scope, key, now=None):
+    # Take a token from the bucket of (scope, key); returns 0, or the seconds until one is available
+    capacity, period = settings.THROTTLE_RATES[scope]
+    now = time.time() if now is None else now
+    cache_key = _key(scope, key)
+    try:
+        cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+        state, wait = _take(cache.get(cache_key), capacity, period, now)
+        cache.set(cache_key, state, timeout=math.ceil(period))
+        return wait
+    except CACHE_ERRORS:
+        logger.warning('Throttle cache unavailable; using in-process buckets', exc_info=True)
+    with _local_lock:
+        _local_buckets[cache_key], wait = _take(_local_buckets.get(cache_key), capacity, period, now)
+        if len(_local_buckets) > 100_000:
+            # Bound the fallback's memory: drop the least recently used half
+            for stale in sorted(_local_buckets, key=lambda k: _local_buckets[k][1])[:50_000]:
+                del _local_buckets[stale]
+    return wait
+
+
+def check(scope, key):
+    if not enabled():
+        return
+    wait = take(scope, key)
+    if wait:
+        raise Throttled(429, max(1, math.ceil(wait)), 'Too many attempts. Try again later.')
+
+
+def _slots():
+    global _hash_slots
+    size = getattr(settings, 'PASSWORD_HASH_CONCURRENCY', None) or os.cpu_count() or 1
+    with _hash_slots_lock:
+        if _hash_slots is None or _hash_slots[0] != size:
+            _hash_slots = (size, threading.BoundedSemaphore(size))
+        return _hash_slots[1]
+
+
+@contextmanager
+def hashing_slot():
+    # Hold one of the process's password hashing slots for the block, or raise Throttled(503)
+    if not enabled():
+        yield
+        return
+    slots = _slots()
+    if not slots.acquire(blocking=False):
+        raise Throttled(503, HASH_RETRY_AFTER, 'Server busy. Try again shortly.')
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def response(throttled):
+    response = JsonResponse({'error': str(throttled)}, status=throttled.status)
+    response['Retry-After'] = str(throttled.retry_after)
+    return response
@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_protect  # Use csrf_protect instead of csrf_exempt
-from django.utils import timezone
+import io
+from itertools import islice
 import json
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Course, Article, Progress, Chapter, Enrollment
+from .models import Course, Article, Chapter, Enrollment, SearchDocument
+from . import (
+    analytics, catalog_cache, enrollment_cache, instrumentation, provisioning, reader, search, snapshots, throttling,
+)
+from .instrumentation import JsonResponse
+from .content_io import detect_format
+from .enrollment import COHORT_CHUNK_SIZE, enroll_user, enroll_users
+from .pagination import InvalidCursor, keyset_page
+from .progress import progress_store
+from .snapshots import ARTICLE_FIELDS
+from .sync import MAX_SYNC_ITEMS, sync_progress
 from django.views.decorators.csrf import csrf_exempt
 from django.middleware.csrf import get_token
 
@@ -62,12 +75,16 @@ def signup_view(request):
             return JsonResponse({'error': 'All fields (email, password1, password2) are required'}, status=400)
         if password1 != password2:
             return JsonResponse({'error': 'Passwords do not match'}, status=400)
-        if User.objects.filter(username=email).exists():
-            return JsonResponse({'error': 'Email already registered!'}, status=400)
-
-        # Create user
-        user = User.objects.create_user(username=email, email=email, password=password1)
-        user.save()
+        try:
+            throttling.check('signup:ip', throttling.client_ip(request))
+            if User.objects.filter(username=email).exists():
+                return JsonResponse({'error': 'Email already registered!'}, status=400)
+
+            # Create user; hashing the password takes one of the process's hashing slots
+            with throttling.hashing_slot():
+                User.objects.create_user(username=email, email=email, password=password1)
+        except throttling.Throttled as e:
+            return throttling.response(e)
         return JsonResponse({'success': 'Account created successfully!'}, status=201)
 
     return JsonResponse({'error': 'Invalid request method'}, status=405)
@@ -80,17 +97,14 @@ def enroll_in_course(request, course_id):
         try:
             user = request.user  # Get the logged-in user
             course = get_object_or_404(Course, pk=course_id)  # Get course object
-            
-            # Check if the user is already enrolled
-            if Enrollment.objects.filter(user=user, course=course).exists():
+            if enrollment_cache.is_enrolled(user, course.id):
+                return JsonResponse({'error': 'You are already enrolled in this course.'}, status=400)
+
+            # Enroll the user and create progress entries for every chapter in one batched transaction.
+            # The insert skips existing enrollments itself, so there is no separate check to race with.
+            enrollment = enroll_user(user, course)
+            if enrollment is None:
                 return JsonResponse({'error': 'You are already enrolled in this course.'}, status=400)
-            
-            # Enroll the user in the course
-            enrollment = Enrollment.objects.create(user=user, course=course)
-            
-            # Create progress entries for each chapter in the course
-            for chapter in course.chapters.all():
-                Progress.objects.create(user=user, chapter=chapter, completed=False)
             
             return JsonResponse({
                 'success': f'You have successfully enrolled in "{course.title}".',
@@ -100,6 +114,92 @@ def enroll_in_course(request, course_id):
             return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=500)
     return JsonResponse({'error': 'Invalid request method.'}, status=405)
 
+
+# Cohort Enrollment View (staff only)
+@login_required
+@csrf_protect
+def enroll_cohort(request, course_id):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method.'}, status=405)
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required.'}, status=403)
+
+    course = get_object_or_404(Course, pk=course_id)
+    try:
+        data = json.loads(request.body)
+        user_ids = [int(user_id) for user_id in data.get('user_ids', [])]
+        chunk_size = int(data.get('chunk_size', COHORT_CHUNK_SIZE))
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        return JsonResponse({'error': 'Expected JSON body with a list of integer "user_ids".'}, status=400)
+
+    if not user_ids:
+        return JsonResponse({'error': '"user_ids" must not be empty.'}, status=400)
+    if chunk_size < 1:
+        return JsonResponse({'error': '"chunk_size" must be a positive integer.'}, status=400)
+
+    chunks = enroll_users(course, user_ids, chunk_size=chunk_size)
+    return JsonResponse({
+        'course_id': course.id,
+        'enrolled': sum(chunk['enrolled'] for chunk in chunks),
+        'already_enrolled': sum(chunk['already_enrolled'] for chunk in chunks),
+        'unknown_users': sum(chunk['unknown_users'] for chunk in chunks),
+        'seconds': round(sum(chunk['seconds'] for chunk in chunks), 4),
+        'chunks': chunks,
+    }, status=201)
+
+
+# User Provisioning View (staff only)
+# Bulk user creation (see e_app.provisioning). Send the users as a multipart "file" upload or
+# as the request body (Content-Type: text/csv, otherwise JSON Lines); ?format= overrides the
+# detected format and every ?course= (repeatable) enrolls all the users in that course.
+# Passwords are hashed in the request's own process, so a request takes at most
+# USER_PROVISIONING_MAX_USERS users; larger inputs go to `manage.py provision_users`, which
+# hashes them in a process pool.
+@login_required
+@csrf_protect
+def provision_users(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method.'}, status=405)
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required.'}, status=403)
+
+    try:
+        course_ids = [int(course_id) for course_id in request.GET.getlist('course')]
+    except ValueError:
+        return JsonResponse({'error': '"course" must be an integer course id.'}, status=400)
+    fmt = request.GET.get('format')
+    if fmt is not None and fmt not in provisioning.FORMATS:
+        return JsonResponse({'error': f'"format" must be one of {", ".join(provisioning.FORMATS)}.'}, status=400)
+
+    upload = request.FILES.get('file')
+    if upload is not None:
+        fmt = fmt or detect_format(upload.name)
+        source = upload.file
+    else:
+        fmt = fmt or ('csv' if request.content_type == 'text/csv' else 'jsonl')
+        source = io.BytesIO(request.body)
+    lines = io.TextIOWrapper(source, encoding='utf-8', newline='')
+
+    limit = getattr(settings, 'USER_PROVISIONING_MAX_USERS', 10)
+    try:
+        # Read (and validate) all of them first: one more than the limit is enough to refuse
+        users = list(islice(provisioning.read_users(lines, fmt), limit + 1))
+        if len(users) > limit:
+            return JsonResponse(
+                {'error': f'At most {limit} users per request; use `manage.py provision_users` for more.'}, status=413,
+            )
+        # Every password takes one of the process's hashing slots, as in login and signup. The
+        # users are written as one chunk, so a refusal comes before anything is written.
+        totals = provisioning.provision_users(
+            users, course_ids=course_ids, chunk_size=max(1, len(users)), workers=1, slot=throttling.hashing_slot,
+        )
+    except provisioning.ProvisioningError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except throttling.Throttled as e:
+        return throttling.response(e)
+    return JsonResponse(totals, status=201)
+
+
 @csrf_protect  # Ensure CSRF protection is applied to login
 def login_view(request):
     if request.method == 'POST':
@@ -110,8 +210,15 @@ def login_view(request):
             
             if not email or not password:
                 return JsonResponse({'error': 'Email and password are required'}, status=400)
-            
-            user = authenticate(request, username=email, password=password)
+
+            # Rate limited per client and per account before any password is hashed
+            try:
+                throttling.check('login:ip', throttling.client_ip(request))
+                throttling.check('login:account', str(email).lower())
+                with throttling.hashing_slot():
+                    user = authenticate(request, username=email, password=password)
+            except throttling.Throttled as e:
+                return throttling.response(e)
             if user:
                 login(request, user)  # Log the user in
                 return JsonResponse({'success': 'Logged in successfully!'}, status=200)
@@ -123,68 +230,261 @@ def login_view(request):
 
 
 # Course List View
+# Keyset-paginated: pass the returned next_cursor back as ?cursor= to get the next page.
+# Optional ?category= filter, ?ordering= (one of COURSE_ORDERINGS) and ?limit= (max MAX_COURSE_PAGE_SIZE).
+
+# Each ordering ends with id so the keyset is unique; all are backed by indexes on Course
+COURSE_ORDERINGS = {
+    '-created_at': ('-created_at', '-id'),
+    'created_at': ('created_at', 'id'),
+    'title': ('title', 'id'),
+    '-title': ('-title', '-id'),
+}
+DEFAULT_COURSE_PAGE_SIZE = 20
+MAX_COURSE_PAGE_SIZE = 100
+
 
 @csrf_exempt
 def course_list(request):
-    courses = Course.objects.values('id', 'title')
-    return JsonResponse({'courses': list(courses)}, safe=False)
+    try:
+        params = course_list_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    def build_page():
+        rows, next_cursor = keyset_page(*course_page_args(*params), datetime_fields=('created_at',))
+        return {'courses': rows, 'next_cursor': next_cursor}
+
+    try:
+        page = catalog_cache.get_or_build('list', params, build_page)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(page)
+
+
+def course_list_params(query):
+    # (ordering, category, limit, cursor) from the query string; ValueError if invalid
+    ordering = query.get('ordering', '-created_at')
+    if ordering not in COURSE_ORDERINGS:
+        raise ValueError(f'ordering must be one of: {", ".join(COURSE_ORDERINGS)}')
+    try:
+        limit = int(query.get('limit', DEFAULT_COURSE_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer.')
+    limit = max(1, min(limit, MAX_COURSE_PAGE_SIZE))
+    return ordering, query.get('category'), limit, query.get('cursor')
+
+
+def course_page_args(ordering, category, limit, cursor):
+    # Arguments for keyset_page()/akeyset_page() for one page of the catalog
+    courses = Course.objects.values('id', 'title', 'category', 'created_at')
+    if category:
+        courses = courses.filter(category=category)
+    return courses, COURSE_ORDERINGS[ordering], cursor, limit
 
 
 # Course Detail View
+# Served from the course's pre-rendered snapshot (see e_app.snapshots), gzipped when the
+# client accepts it and answered with 304 when its ETag matches.
+# Pass ?outline=true to also get the ordered chapters with the logged-in user's completion flags.
+# That response is built per request; clients that can should fetch the shared outline from
+# course_outline and the user's progress from course_progress instead.
 @csrf_exempt
 def course_detail(request, course_id):
-    # Get the course by ID or return a 404 if not found
-    course = get_object_or_404(Course, pk=course_id)
+    snapshot = snapshots.get('course', course_id)
+    if request.GET.get('outline', 'false') != 'true':
+        return snapshots.response(request, snapshot)
+
+    course_data = snapshots.payload(snapshot)
+    chapters = catalog_cache.get_or_build('chapters', course_id, lambda: build_chapter_outline(course_id))
+    # Merge in the user's progress, which is never cached
+    completed_ids = completed_chapter_ids(request.user, course_id)
+    course_data['chapters'] = [
+        dict(chapter, completed=chapter['id'] in completed_ids) for chapter in chapters
+    ]
+    return JsonResponse(course_data)
+
+
+def build_chapter_outline(course_id):
+    # All chapters of the course in one query
+    return list(
+        Chapter.objects.filter(course_id=course_id).order_by('order').values('id', 'title', 'description', 'order')
+    )
+
+
+def completed_chapter_ids(user, course_id):
+    # IDs of the chapters in this course the user has completed (empty for anonymous users)
+    if not user.is_authenticated:
+        return set()
+    return progress_store().completed_chapter_ids(user, course_id)
+
+
+# Course Outline View
+# The course and its ordered chapters, shared by every user: served from the snapshot bytes
+@csrf_exempt
+def course_outline(request, course_id):
+    return snapshots.response(request, snapshots.get('outline', course_id))
+
 
-    # Fetch chapters related to the course
-    chapters = Chapter.objects.filter(course=course).order_by('order')
-
-    # Prepare chapter data, including progress for the logged-in user
-    chapter_data = []
-    for chapter in chapters:
-        # Correctly filter progress by Chapter instance, not by course title
-        progress = Progress.objects.filter(user=request.user, chapter=chapter).first() if request.user.is_authenticated else None
-        chapter_data.append({
-            'id': chapter.id,
-            'title': chapter.title,
-            'description': chapter.description,
-            'order': chapter.order,
-            'completed': progress.completed if progress else False,
-        })
-
-    # Prepare course data to return as a JSON response
-    course_data = {
-        'id': course.id,
-        'title': course.title,
-        'description': course.description,
+# Course Progress View
+# The logged-in user's progress in a course, to combine with the shared outline
+@login_required
+def course_progress(request, course_id):
+    enrollment = Enrollment.objects.filter(user=request.user, course_id=course_id).first()
+    if not enrollment:
+        return JsonResponse({'error': 'You are not enrolled in this course.'}, status=403)
+    return JsonResponse({'progress': course_progress_payload(
+        enrollment, progress_store().completed_chapter_ids(request.user, course_id),
+    )})
+
+
+def course_progress_payload(enrollment, completed_ids):
+    return {
+        'course_id': enrollment.course_id,
+        'completed_chapter_ids': sorted(completed_ids),
+        'completed_chapters': enrollment.completed_chapters,
+        'total_chapters': enrollment.total_chapters,
+        'next_chapter_id': enrollment.next_chapter_id,
     }
 
-    return JsonResponse(course_data)
+
+# Course Articles View
+# Without parameters the course's articles snapshot is served as is. Optional parameters:
+#   ?fields=id,title,order   only select these columns (id is always included), e.g. to skip content
+#   ?page=2&limit=50         one page of articles
+#   ?stream=true             NDJSON: a course line, then one line per article, written as rows are read
+
+MAX_ARTICLE_PAGE_SIZE = 500
+ARTICLE_STREAM_CHUNK_SIZE = 200
+
+
+ARTICLE_PARAMS = ('fields', 'page', 'limit', 'stream')
+
 
 @csrf_exempt
 def course_articles(request, course_id):
-    # Get the course by ID or return a 404 if not found
-    course = get_object_or_404(Course, pk=course_id)
+    if not any(param in request.GET for param in ARTICLE_PARAMS):
+        return snapshots.response(request, snapshots.get('articles', course_id))
 
-    # Fetch the articles for the course, sorted by order
-    articles = Article.objects.filter(course=course).order_by('order')
+    try:
+        fields, page, limit = article_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    course = Course.objects.filter(pk=course_id).values('id', 'title').first()
+    if course is None:
+        raise Http404('No Course matches the given query.')
+    articles = article_queryset(course_id, fields, page, limit)
+
+    if request.GET.get('stream', 'false') == 'true':
+        return StreamingHttpResponse(
+            stream_ndjson(course, articles.iterator(chunk_size=ARTICLE_STREAM_CHUNK_SIZE)),
+            content_type='application/x-ndjson',
+        )
+
+    return JsonResponse({'course': dict(course, articles=list(articles)), 'page': page, 'limit': limit})
+
+
+def article_params(query):
+    # (fields, page, limit) from the query string; ValueError if invalid
+    fields = ARTICLE_FIELDS
+    if query.get('fields'):
+        requested = [field.strip() for field in query['fields'].split(',') if field.strip()]
+        unknown = set(requested) - set(ARTICLE_FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+        fields = tuple(field for field in ARTICLE_FIELDS if field == 'id' or field in requested)
 
-    # Prepare the article data to send as JSON response
-    article_data = []
+    try:
+        page = int(query.get('page', 1))
+        limit = int(query['limit']) if 'limit' in query else None
+    except ValueError:
+        raise ValueError('page and limit must be integers.')
+    if page < 1 or (limit is not None and not 1 <= limit <= MAX_ARTICLE_PAGE_SIZE):
+        raise ValueError(f'page must be >= 1 and limit between 1 and {MAX_ARTICLE_PAGE_SIZE}.')
+    if limit is None and page > 1:
+        raise ValueError('page requires limit.')
+    return fields, page, limit
+
+
+def article_queryset(course_id, fields, page, limit):
+    # Projection happens in SQL, so skipped columns (usually content) are never read
+    articles = Article.objects.filter(course_id=course_id).order_by('order', 'id').values(*fields)
+    if limit is not None:
+        articles = articles[(page - 1) * limit:page * limit]
+    return articles
+
+
+def stream_ndjson(course, articles):
+    # Yield one JSON document per line; only one chunk of rows is held in memory at a time
+    yield ndjson_line({'course': course})
     for article in articles:
-        article_data.append({
-            'id': article.id,
-            'title': article.title,
-            'content': article.content,
-            'order': article.order,
-        })
+        yield ndjson_line(article)
+
+
+def ndjson_line(document):
+    return json.dumps(document, cls=DjangoJSONEncoder) + '\n'
+
+
+# Search View
+# Ranked full-text search over course, chapter and article titles and text.
+# ?q= is required; ?kind= (course, chapter or article) and ?limit= are optional.
+@csrf_exempt
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Query parameter "q" is required.'}, status=400)
+    kind = request.GET.get('kind') or None
+    if kind and kind not in dict(SearchDocument.KIND_CHOICES):
+        return JsonResponse({'error': 'kind must be one of: course, chapter, article'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer.'}, status=400)
+
+    return JsonResponse({'query': query, 'results': search.search(query, kind=kind, limit=limit)})
+
 
-    # Return the article data as JSON
-    return JsonResponse({'course': {
-        'id': course.id,
-        'title': course.title,
-        'articles': article_data,
-    }})
+# Catalog Cache Stats View (staff only); the counts are those of the worker serving the request
+@login_required
+def catalog_cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required.'}, status=403)
+    return JsonResponse({'catalog_cache': catalog_cache.stats()})
+
+
+# Enrollment Cache Stats View (staff only); the counts are those of the worker serving the request
+@login_required
+def enrollment_cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required.'}, status=403)
+    return JsonResponse({'enrollment_cache': enrollment_cache.stats()})
+
+
+# Course Analytics View (staff only)
+# The precomputed completion funnel of a course (see e_app.analytics); a fixed number of
+# queries whatever the enrollment count. 404 until the analytics job has covered the course.
+@login_required
+def course_analytics(request, course_id):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required.'}, status=403)
+    data = analytics.funnel(course_id)
+    if data is None:
+        return JsonResponse({'error': 'No analytics for this course yet.'}, status=404)
+    return JsonResponse({'analytics': data})
+
+
+# Request Metrics View (staff only)
+# Rolling per-route latency histograms recorded by RequestMetricsMiddleware
+@login_required
+def request_metrics(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required.'}, status=403)
+    return JsonResponse({
+        'enabled': getattr(settings, 'REQUEST_METRICS_ENABLED', False),
+        'window_seconds': getattr(settings, 'REQUEST_METRICS_WINDOW', 300),
+        'routes': instrumentation.snapshot(),
+    })
 
 
 # Enroll in Course View
@@ -227,46 +527,37 @@ def course_articles(request, course_id):
 #         # Handle unexpected errors
 #         return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=500)
 
+# Chapter Reader View
+# chapter_id is the chapter's order within the course. Returns the chapter with the course
+# title and the user's progress, plus "previous" and "next" chapter stubs (id, title, order;
+# null at either end), all read in one query (see e_app.reader). Pass ?prefetch=next to also
+# get the next chapter's description for the following page turn. POST completed=true|false
+# records progress.
 @csrf_exempt
 @login_required
 def user_chapters(request, course_id, chapter_id):
-    print(f"Request Method: {request.method}")
-    print(f"Course ID: {course_id}, Chapter ID: {chapter_id}")
-
     user = request.user
-    print(user)
+    posting = request.method == "POST"
 
-    # Check if the user is enrolled in the course
-    if not Enrollment.objects.filter(user=user, course_id=course_id).exists():
-        
+    # Check if the user is enrolled in the course: a lookup in their cached course set
+    if not enrollment_cache.is_enrolled(user, course_id):
         return JsonResponse({'error': 'You are not enrolled in this course.'}, status=403)
 
-    # Retrieve the specific chapter
-    try:
-        chapter = get_object_or_404(Chapter, course_id=course_id, order=chapter_id)
-    except Chapter.DoesNotExist:
+    chapter = reader.chapter_page(
+        user, course_id, chapter_id,
+        prefetch_next=request.GET.get('prefetch') == 'next', with_progress=not posting,
+    )
+    if chapter is None:
         return JsonResponse({'error': 'Chapter not found.'}, status=404)
 
-    # Retrieve or create a progress record for this user and chapter
-    progress, created = Progress.objects.get_or_create(user=user, chapter=chapter)
-
-    if request.method == "POST":
+    # Read the user's progress on this chapter, or record it on POST
+    if posting:
         completed = request.POST.get("completed", "false") == "true"
-        progress.completed = completed
-        progress.completed_at = timezone.now() if completed else None
-        progress.save()
-
-    # Prepare chapter data with progress and course title
-    chapter_data = {
-        'id': chapter.id,
-        'title': chapter.title,
-        'description': chapter.description,
-        'course_title': chapter.course.title,
-        'completed': progress.completed if progress else False,
-        'completed_at': progress.completed_at if progress and progress.completed else None,
-    }
+        progress = progress_store().set(user, chapter, completed)
+    else:
+        progress = progress_store().annotated_state(chapter)
 
-    return JsonResponse({'chapter': chapter_data}, status=200)
+    return JsonResponse(reader.page_payload(chapter, progress), status=200)
 
 # @csrf_exempt
 # @login_required
@@ -323,20 +614,51 @@ def progress_view(request, course_id, chapter_id):
     if not enrollment:
         return JsonResponse({'error': 'You are not enrolled in this course.'}, status=403)
 
-    # Retrieve or create the user's progress on the chapter
-    progress = Progress.objects.filter(user=request.user, chapter=chapter).first()
+    # Retrieve the user's progress on the chapter
+    progress = progress_store().get(request.user, chapter)
+
+    return JsonResponse({'progress': progress_payload(enrollment, chapter, progress)}, status=200)
 
+
+def progress_payload(enrollment, chapter, progress):
     # Construct the response with enrollment ID and course category included
-    progress_data = {
+    course = chapter.course
+    return {
         'enrollment_id': enrollment.id,  # Add enrollment ID to the response
         'chapter_id': chapter.id,
         'chapter_title': chapter.title,
         'completed': progress.completed,
-        'completed_at': progress.completed_at if progress.completed else None,
+        'completed_at': progress.completed_at,
         'course_category': course.category,  # Use course.category directly if it's a string
+        # Denormalized on the enrollment, so no progress rows are counted here
+        'course_progress': {
+            'completed_chapters': enrollment.completed_chapters,
+            'total_chapters': enrollment.total_chapters,
+            'percent_complete': enrollment.percent_complete,
+            'next_chapter_id': enrollment.next_chapter_id,
+            'last_activity_at': enrollment.last_activity_at,
+        },
     }
 
-    return JsonResponse({'progress': progress_data}, status=200)
+# Progress Sync View
+# Replays a batch of queued progress changes: {"items": [{"course_id", "chapter_id",
+# "completed", "completed_at"}, ...]}. Conflicts are resolved last-writer-wins on completed_at,
+# and every item gets a result: applied, unchanged, stale, superseded or error.
+@csrf_exempt
+@login_required
+def progress_sync(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method.'}, status=405)
+    try:
+        items = json.loads(request.body).get('items')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON data provided.'}, status=400)
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': '"items" must be a non-empty list.'}, status=400)
+    if len(items) > MAX_SYNC_ITEMS:
+        return JsonResponse({'error': f'At most {MAX_SYNC_ITEMS} items per request.'}, status=400)
+
+    return JsonResponse({'results': sync_progress(request.user, items)}, status=200)
 
 def get_csrf_token(request):
     token = get_token(request)
@@ -0,0 +1,144 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Chapter, Enrollment, ProgressEvent
+from .progress import NOT_STARTED, ChapterState, progress_backend
+
+# Write-behind chapter completion (settings.PROGRESS_WRITE_BEHIND). During live classes many
+# students toggle completion at once, and every toggle written through the store locks the
+# enrollment row and rewrites progress. In write-behind mode a toggle is one INSERT into the
+# ProgressEvent queue and is acknowledged straight away; flush() (run by the
+# flush_progress_events command) later keeps the latest event per user and chapter and
+# applies them per enrollment with the store's apply_batch, deleting them in the same
+# transaction. Replaying a batch after a crash is harmless: applied changes come back 'unchanged'.
+#
+# Reads made for the user (get, the chapter reader, completed chapter ids) merge their
+# pending events, so users always see their own writes. The enrollment's counters and next
+# chapter, and everything computed from all users (aggregates, analytics), follow at the flush.
+
+# Events read, coalesced and applied per transaction by flush()
+FLUSH_BATCH_SIZE = 5000
+
+COUNTS = ('events', 'applied', 'unchanged', 'stale', 'dropped')
+
+
+def merge(stored, pending):
+    # The state a user sees: the stored state updated by their latest pending event, if any.
+    # Completing a completed chapter keeps its first completion time, as the store does.
+    if pending is None or pending['completed'] == stored.completed:
+        return stored
+    return ChapterState(True, pending['occurred_at']) if pending['completed'] else NOT_STARTED
+
+
+def _pending(user, **filters):
+    return ProgressEvent.objects.filter(user=user, **filters).order_by('-id').values('completed', 'occurred_at')
+
+
+class WriteBehindStore:
+    # Fronts a progress store: completion writes go to the queue, the user's reads merge it,
+    # and everything else is the wrapped store's
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def set(self, user, chapter, completed, when=None):
+        occurred_at = when or timezone.now()
+        ProgressEvent.objects.create(
+            user=user, course_id=chapter.course_id, chapter=chapter, completed=completed, occurred_at=occurred_at,
+        )
+        # Acknowledged without reading the stored state: a repeated completion reports this
+        # event's time until the flush keeps the first one
+        return ChapterState(completed, occurred_at if completed else None)
+
+    def get(self, user, chapter):
+        return merge(self.store.get(user, chapter), _pending(user, chapter=chapter).first())
+
+    async def aget(self, user, chapter):
+        return merge(await self.store.aget(user, chapter), await _pending(user, chapter=chapter).afirst())
+
+    def reader_annotations(self, user):
+        pending = _pending(user, chapter=OuterRef('pk'))
+        return {
+            **self.store.reader_annotations(user),
+            'pending_completed': Subquery(pending.values('completed')[:1]),
+            'pending_occurred_at': Subquery(pending.values('occurred_at')[:1]),
+        }
+
+    def annotated_state(self, chapter):
+        stored = self.store.annotated_state(chapter)
+        if chapter.pending_completed is None:
+            return stored
+        return merge(stored, {'completed': chapter.pending_completed, 'occurred_at': chapter.pending_occurred_at})
+
+    def _merge_ids(self, completed_ids, events):
+        latest = {}
+        for chapter_id, completed in events:
+            latest[chapter_id] = completed
+        for chapter_id, completed in latest.items():
+            (completed_ids.add if completed else completed_ids.discard)(chapter_id)
+        return completed_ids
+
+    def completed_chapter_ids(self, user, course_id):
+        events = ProgressEvent.objects.filter(user=user, course_id=course_id).order_by('id')
+        return self._merge_ids(
+            self.store.completed_chapter_ids(user, course_id), events.values_list('chapter_id', 'completed'),
+        )
+
+    async def acompleted_chapter_ids(self, user, course_id):
+        events = ProgressEvent.objects.filter(user=user, course_id=course_id).order_by('id')
+        events = [event async for event in events.values_list('chapter_id', 'completed')]
+        return self._merge_ids(await self.store.acompleted_chapter_ids(user, course_id), events)
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE, store=None):
+    # Apply the oldest batch_size queued events and delete them. Events are applied in queue
+    # order, so run a single flusher. Returns the counts of the batch.
+    store = store or progress_backend()
+    totals = dict.fromkeys(COUNTS, 0)
+    with transaction.atomic():
+        events = list(
+            ProgressEvent.objects.order_by('id')
+            .values_list('id', 'user_id', 'course_id', 'chapter_id', 'completed', 'occurred_at')[:batch_size]
+        )
+        if not events:
+            return totals
+        chapters = Chapter.objects.in_bulk({event[3] for event in events})
+
+        # The latest event per (user, chapter) wins; grouped per enrollment for apply_batch
+        latest = {}
+        for event_id, user_id, course_id, chapter_id, completed, occurred_at in events:
+            latest[user_id, chapter_id] = (course_id, completed, occurred_at)
+        by_enrollment = {}
+        for (user_id, chapter_id), (course_id, completed, occurred_at) in latest.items():
+            by_enrollment.setdefault((user_id, course_id), {})[chapters[chapter_id]] = (completed, occurred_at)
+
+        for (user_id, course_id), changes in by_enrollment.items():
+            try:
+                statuses = store.apply_batch(User(pk=user_id), course_id, changes)
+            except Enrollment.DoesNotExist:
+                # Unenrolled since: the progress has nowhere to go
+                totals['dropped'] += len(changes)
+                continue
+            for status in statuses.values():
+                totals[status] += 1
+
+        ProgressEvent.objects.filter(id__in=[event[0] for event in events]).delete()
+        totals['events'] = len(events)
+    return totals
+
+
+def flush_all(batch_size=FLUSH_BATCH_SIZE, store=None, progress=None):
+    # Flush until the queue is empty; returns the summed counts
+    totals = dict.fromkeys(COUNTS, 0)
+    while True:
+        batch = flush(batch_size, store)
+        if not batch['events']:
+            return totals
+        for key, value in batch.items():
+            totals[key] += value
+        if progress:
+            progress(totals)
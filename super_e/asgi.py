@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'super_e.settings')
+# Serve the native async read views (see asgi_urls.py)
+os.environ.setdefault('SUPER_E_URLCONF', 'super_e.asgi_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,25 @@
+from django.urls import URLPattern
+
+from e_app import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+# URLconf used under ASGI (see asgi.py): the same routes as urls.py, with the read-heavy
+# views swapped for their native async versions. Every other view runs as before, through
+# Django's sync-to-async adapter.
+ASYNC_VIEWS = {
+    'course_list': async_views.course_list,
+    'course_detail': async_views.course_detail,
+    'course_outline': async_views.course_outline,
+    'course_articles': async_views.course_articles,
+    'progress_view': async_views.progress_view,
+}
+
+
+def _swap(pattern):
+    if isinstance(pattern, URLPattern) and pattern.name in ASYNC_VIEWS:
+        return URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+    return pattern
+
+
+urlpatterns = [_swap(pattern) for pattern in sync_urlpatterns]
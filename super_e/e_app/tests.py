@@ -1,3 +1,1591 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import zlib
+from asyncio import iscoroutinefunction
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+
+from e_app import (
+    archive, catalog_cache, content_io, db_routing, enrollment_cache, instrumentation, provisioning, snapshots, throttling,
+    write_behind,
+)
+from e_app.admin import EstimatedCountPaginator
+from e_app.enrollment import enroll_users
+from e_app.models import (
+    Article, Chapter, ContentSnapshot, Course, CourseAnalytics, Enrollment, EnrollmentProgress, Progress, ProgressArchive,
+    ProgressEvent, SearchDocument,
+)
+from e_app.pagination import encode_cursor
+from e_app.progress import progress_backend, progress_store
+
+
+def make_course(chapters=0, **kwargs):
+    # Run the cache and snapshot updates queued for the commit a TestCase never reaches
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        course = Course.objects.create(title=kwargs.pop('title', 'Course'), description='Description', **kwargs)
+    Chapter.objects.bulk_create(
+        [Chapter(course=course, title=f'Chapter {i}', order=i) for i in range(1, chapters + 1)]
+    )
+    # bulk_create skips the signal that renders the outline snapshot
+    snapshots.refresh([course.id], ('outline',))
+    return course
+
+
+class CatalogTestCase(TestCase):
+    # The catalog cache and the cache hit counters outlive a test's transaction, so start
+    # every test with them empty
+    def setUp(self):
+        cache.clear()
+        catalog_cache.reset_stats()
+        enrollment_cache.reset_stats()
+
+
+class EnrollmentTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.client.force_login(self.user)
+
+    def test_enroll_creates_progress_rows_in_constant_queries(self):
+        small = make_course(chapters=5)
+        # Within one INSERT batch on SQLite, which caps a statement at 999 parameters
+        large = make_course(chapters=150)
+
+        with CaptureQueriesContext(connection) as small_ctx:
+            self.client.post(f'/courses/{small.id}/enroll/')
+        with self.assertNumQueries(len(small_ctx.captured_queries)):
+            response = self.client.post(f'/courses/{large.id}/enroll/')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Progress.objects.filter(user=self.user, chapter__course=large).count(), 150)
+
+    def test_enroll_twice_is_rejected(self):
+        course = make_course(chapters=2)
+        self.client.post(f'/courses/{course.id}/enroll/')
+        response = self.client.post(f'/courses/{course.id}/enroll/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Progress.objects.filter(user=self.user).count(), 2)
+
+    def test_enrollment_fields_get_their_model_defaults(self):
+        course = make_course(chapters=2)
+        self.client.post(f'/courses/{course.id}/enroll/')
+        enrollment = Enrollment.objects.get(user=self.user, course=course)
+        self.assertIsNotNone(enrollment.enrolled_at)
+        self.assertEqual((enrollment.total_chapters, enrollment.next_chapter), (2, course.chapters.get(order=1)))
+        # Every other field, including ones the insert doesn't name, gets the model's default
+        for field in Enrollment._meta.concrete_fields:
+            if field.has_default() and field.name != 'total_chapters':
+                self.assertEqual(getattr(enrollment, field.attname), field.get_default(), field.name)
+
+
+class CohortEnrollmentTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='staff@example.com', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+        self.course = make_course(chapters=3)
+        self.students = User.objects.bulk_create(
+            [User(username=f'student{i}@example.com') for i in range(7)]
+        )
+
+    def post(self, payload):
+        return self.client.post(
+            f'/courses/{self.course.id}/enroll/cohort/', json.dumps(payload), content_type='application/json'
+        )
+
+    def test_cohort_enrollment_is_chunked(self):
+        Enrollment.objects.create(user=self.students[0], course=self.course)
+        user_ids = [student.id for student in self.students] + [999999]
+
+        response = self.post({'user_ids': user_ids, 'chunk_size': 3})
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(len(body['chunks']), 3)
+        self.assertEqual(body['enrolled'], 6)
+        self.assertEqual(body['already_enrolled'], 1)
+        self.assertEqual(body['unknown_users'], 1)
+        self.assertTrue(all('seconds' in chunk for chunk in body['chunks']))
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 7)
+        self.assertEqual(Progress.objects.filter(chapter__course=self.course).count(), 18)
+
+    def test_cohort_enrollment_requires_staff(self):
+        self.client.force_login(self.students[1])
+        response = self.post({'user_ids': [self.students[1].id]})
+        self.assertEqual(response.status_code, 403)
+
+
+class CourseOutlineTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+
+    def outline_queries(self, course):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/courses/{course.id}/?outline=true')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_outline_query_count_is_flat(self):
+        small = make_course(chapters=10)
+        large = make_course(chapters=1000)
+        for course in (small, large):
+            Enrollment.objects.create(user=self.user, course=course)
+            Progress.objects.bulk_create(
+                [Progress(user=self.user, chapter=chapter, completed=chapter.order % 2 == 0)
+                 for chapter in course.chapters.all()]
+            )
+        self.client.force_login(self.user)
+
+        small_body, small_queries = self.outline_queries(small)
+        large_body, large_queries = self.outline_queries(large)
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(len(large_body['chapters']), 1000)
+        self.assertEqual([c['order'] for c in small_body['chapters']], list(range(1, 11)))
+        self.assertEqual([c['completed'] for c in small_body['chapters'][:2]], [False, True])
+
+    def test_outline_for_anonymous_user(self):
+        course = make_course(chapters=3)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/courses/{course.id}/?outline=true')
+        self.assertFalse(any(c['completed'] for c in response.json()['chapters']))
+
+    def test_plain_detail_skips_chapters(self):
+        course = make_course(chapters=3)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/courses/{course.id}/')
+        self.assertNotIn('chapters', response.json())
+
+
+class CatalogCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course(chapters=2, title='Python')
+        Article.objects.create(course=self.course, title='Intro', content='Hello', order=1)
+
+    def test_read_endpoints_are_served_from_cache(self):
+        for url in ('/courses/', f'/courses/{self.course.id}/?outline=true', f'/courses/{self.course.id}/articles/'):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.json(), second.json())
+
+        stats = catalog_cache.stats()
+        self.assertEqual(stats['course'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        self.assertEqual(stats['chapters']['hits'], 1)
+
+    def test_saves_invalidate_affected_payloads(self):
+        self.client.get(f'/courses/{self.course.id}/?outline=true')
+        self.client.get(f'/courses/{self.course.id}/articles/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Chapter.objects.create(course=self.course, title='Chapter 3', order=3)
+        outline = self.client.get(f'/courses/{self.course.id}/?outline=true').json()
+        self.assertEqual(len(outline['chapters']), 3)
+
+        article = Article.objects.get(course=self.course)
+        article.title = 'Introduction'
+        with self.captureOnCommitCallbacks(execute=True):
+            article.save()
+        articles = self.client.get(f'/courses/{self.course.id}/articles/').json()
+        self.assertEqual(articles['course']['articles'][0]['title'], 'Introduction')
+
+        self.course.title = 'Advanced Python'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+        self.assertEqual(self.client.get('/courses/').json()['courses'][0]['title'], 'Advanced Python')
+        self.assertEqual(self.client.get(f'/courses/{self.course.id}/').json()['title'], 'Advanced Python')
+
+    def test_moving_chapter_invalidates_both_courses(self):
+        other = make_course(chapters=0, title='Other')
+        self.client.get(f'/courses/{self.course.id}/?outline=true')
+        self.client.get(f'/courses/{other.id}/?outline=true')
+
+        chapter = self.course.chapters.first()
+        chapter.course = other
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.save()
+
+        self.assertEqual(len(self.client.get(f'/courses/{self.course.id}/?outline=true').json()['chapters']), 1)
+        self.assertEqual(len(self.client.get(f'/courses/{other.id}/?outline=true').json()['chapters']), 1)
+
+    def test_invalidation_waits_for_commit(self):
+        # A reader between the write and its commit must not cache the old payload for the whole timeout
+        self.client.get(f'/courses/{self.course.id}/?outline=true')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Chapter.objects.create(course=self.course, title='Chapter 3', order=3)
+            self.assertEqual(len(self.client.get(f'/courses/{self.course.id}/?outline=true').json()['chapters']), 2)
+        self.assertTrue(callbacks)
+        self.assertEqual(len(self.client.get(f'/courses/{self.course.id}/?outline=true').json()['chapters']), 3)
+
+    def test_progress_is_not_cached(self):
+        user = User.objects.create_user(username='student@example.com', password='secret')
+        self.client.force_login(user)
+        self.client.post(f'/courses/{self.course.id}/enroll/')
+        self.client.get(f'/courses/{self.course.id}/?outline=true')
+
+        Progress.objects.filter(user=user, chapter__order=1).update(completed=True)
+        outline = self.client.get(f'/courses/{self.course.id}/?outline=true').json()
+        self.assertEqual([c['completed'] for c in outline['chapters']], [True, False])
+
+    def test_stats_endpoint_requires_staff(self):
+        user = User.objects.create_user(username='student@example.com', password='secret')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/catalog/cache/stats/').status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertIn('catalog_cache', self.client.get('/catalog/cache/stats/').json())
+
+
+class CourseCatalogPaginationTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(25):
+            make_course(title=f'Course {i:02d}', category='python' if i % 2 else 'java')
+
+    def walk(self, query):
+        titles, cursor = [], None
+        while True:
+            url = f'/courses/?{query}' + (f'&cursor={cursor}' if cursor else '')
+            body = self.client.get(url).json()
+            titles += [course['title'] for course in body['courses']]
+            cursor = body['next_cursor']
+            if cursor is None:
+                return titles
+
+    def test_pages_cover_catalog_newest_first(self):
+        titles = self.walk('limit=7')
+        self.assertEqual(titles, [f'Course {i:02d}' for i in reversed(range(25))])
+
+    def test_filter_and_ordering(self):
+        titles = self.walk('limit=4&category=python&ordering=title')
+        self.assertEqual(titles, [f'Course {i:02d}' for i in range(1, 25, 2)])
+
+    def test_deep_page_costs_same_queries_as_first(self):
+        first = self.client.get('/courses/?limit=5').json()
+        cursor = first['next_cursor']
+        for _ in range(3):
+            cursor = self.client.get(f'/courses/?limit=5&cursor={cursor}').json()['next_cursor']
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get('/courses/?limit=5')
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(f'/courses/?limit=5&cursor={cursor}')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/courses/?cursor=nonsense').status_code, 400)
+        self.assertEqual(self.client.get('/courses/?ordering=price').status_code, 400)
+        self.assertEqual(self.client.get('/courses/?limit=ten').status_code, 400)
+
+    def test_cursor_values_of_the_wrong_type_are_rejected(self):
+        for values, ordering in (
+            (['2024-01-01T00:00:00', 'abc'], '-created_at'), (['2024-01-01T00:00:00', [1]], '-created_at'),
+            (['2024-13-45T00:00:00', 1], '-created_at'), ([{'a': 1}, 1], 'title'), (['Course', 10 ** 30], 'title'),
+        ):
+            response = self.client.get('/courses/', {'ordering': ordering, 'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+        response = self.client.get('/courses/', {'ordering': 'title', 'cursor': encode_cursor(['Course 20', '3'])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_course_invalidates_cached_pages(self):
+        self.client.get('/courses/?limit=3')
+        make_course(title='Brand new')
+        self.assertEqual(self.client.get('/courses/?limit=3').json()['courses'][0]['title'], 'Brand new')
+
+
+class SearchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.python = Course.objects.create(title='Python basics', description='Learn programming', category='code')
+            self.cooking = Course.objects.create(title='Cooking', description='Kitchen skills', category='food')
+            Chapter.objects.create(course=self.cooking, title='Knives', description='Python-free chapter', order=1)
+            Article.objects.create(course=self.python, title='Loops', content='Iterating with python generators', order=1)
+
+    def search(self, query):
+        response = self.client.get('/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_results_are_ranked_title_first(self):
+        results = self.search('python')
+        self.assertEqual([(r['kind'], r['title']) for r in results][0], ('course', 'Python basics'))
+        self.assertEqual({r['kind'] for r in results}, {'course', 'chapter', 'article'})
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.search('pastry'), [])
+        self.cooking.description = 'Pastry and bread'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cooking.save()
+        self.assertEqual([r['object_id'] for r in self.search('pastry')], [self.cooking.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.filter(course=self.python).delete()
+        self.assertNotIn('article', {r['kind'] for r in self.search('generators')})
+
+    def test_prefix_and_kind_filter(self):
+        response = self.client.get('/search/', {'q': 'gener', 'kind': 'article'})
+        self.assertEqual([r['title'] for r in response.json()['results']], ['Loops'])
+        self.assertEqual(self.client.get('/search/').status_code, 400)
+        self.assertEqual(self.client.get('/search/', {'q': 'x', 'kind': 'user'}).status_code, 400)
+
+    def test_rebuild_command(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.search('python'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('python')), 3)
+
+
+class CourseArticlesTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course(title='Long reads')
+        Article.objects.bulk_create(
+            [Article(course=self.course, title=f'Article {i}', content='x' * 1000, order=i) for i in range(1, 11)]
+        )
+        self.url = f'/courses/{self.course.id}/articles/'
+
+    def test_projection_skips_content_in_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'fields': 'title,order'})
+        first = response.json()['course']['articles'][0]
+        self.assertEqual(set(first), {'id', 'title', 'order'})
+        self.assertEqual(first['title'], 'Article 1')
+        self.assertNotIn('content', ctx.captured_queries[-1]['sql'])
+
+    def test_pagination(self):
+        body = self.client.get(self.url, {'fields': 'title', 'page': 2, 'limit': 4}).json()
+        self.assertEqual([a['title'] for a in body['course']['articles']], [f'Article {i}' for i in range(5, 9)])
+        self.assertEqual(self.client.get(self.url, {'page': 2}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'fields': 'secret'}).status_code, 400)
+
+    def test_stream_writes_one_line_per_article(self):
+        response = self.client.get(self.url, {'stream': 'true', 'fields': 'title'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[0], {'course': {'id': self.course.id, 'title': 'Long reads'}})
+        self.assertEqual(len(lines), 11)
+        self.assertNotIn('content', lines[1])
+
+    def test_missing_course(self):
+        self.assertEqual(self.client.get('/courses/999999/articles/', {'stream': 'true'}).status_code, 404)
+
+
+class ProgressBackendTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.client.force_login(self.user)
+        self.course = make_course(chapters=12)
+
+    def complete(self, order, completed='true'):
+        return self.client.post(f'/courses/{self.course.id}/chapters/{order}/', {'completed': completed})
+
+    def check_round_trip(self):
+        self.client.post(f'/courses/{self.course.id}/enroll/')
+        self.complete(1)
+        self.complete(10)
+        self.complete(3)
+        self.complete(3, 'false')
+
+        chapter = self.course.chapters.get(order=10)
+        progress = self.client.get(f'/courses/{self.course.id}/chapters/{chapter.id}/progress/').json()['progress']
+        self.assertTrue(progress['completed'])
+        self.assertIsNotNone(progress['completed_at'])
+
+        outline = self.client.get(f'/courses/{self.course.id}/?outline=true').json()
+        completed = [c['order'] for c in outline['chapters'] if c['completed']]
+        self.assertEqual(completed, [1, 10])
+
+    def test_rows_backend(self):
+        with self.settings(PROGRESS_BACKEND='rows'):
+            self.check_round_trip()
+        self.assertEqual(Progress.objects.filter(user=self.user).count(), 12)
+
+    def test_bitmap_backend(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            self.check_round_trip()
+        self.assertFalse(Progress.objects.filter(user=self.user).exists())
+        record = EnrollmentProgress.objects.get(enrollment__user=self.user)
+        self.assertEqual(len(record.completed_at), 2)
+
+    def test_reordering_keeps_bitmap_progress(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            self.client.post(f'/courses/{self.course.id}/enroll/')
+            self.complete(2)
+            chapter = self.course.chapters.get(order=2)
+            chapter.order = 99
+            chapter.save()
+            self.assertTrue(self.client.get(f'/courses/{self.course.id}/chapters/99/').json()['chapter']['completed'])
+
+    def test_backfill_command(self):
+        self.client.post(f'/courses/{self.course.id}/enroll/')
+        self.complete(4)
+        self.complete(12)
+
+        call_command('backfill_progress_bitmap', '--delete-rows', stdout=StringIO())
+
+        self.assertFalse(Progress.objects.exists())
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            outline = self.client.get(f'/courses/{self.course.id}/?outline=true').json()
+        self.assertEqual([c['order'] for c in outline['chapters'] if c['completed']], [4, 12])
+
+
+class ProgressAggregateTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.client.force_login(self.user)
+        self.course = make_course(chapters=4)
+        self.client.post(f'/courses/{self.course.id}/enroll/')
+        self.chapters = list(self.course.chapters.order_by('order'))
+
+    def enrollment(self):
+        return Enrollment.objects.get(user=self.user, course=self.course)
+
+    def complete(self, order, completed='true'):
+        self.client.post(f'/courses/{self.course.id}/chapters/{order}/', {'completed': completed})
+
+    def test_counters_follow_completion_flips(self):
+        enrollment = self.enrollment()
+        self.assertEqual((enrollment.completed_chapters, enrollment.total_chapters), (0, 4))
+        self.assertEqual(enrollment.next_chapter, self.chapters[0])
+
+        self.complete(1)
+        self.complete(1)  # Not a flip, so not counted twice
+        self.complete(2)
+        enrollment = self.enrollment()
+        self.assertEqual(enrollment.completed_chapters, 2)
+        self.assertEqual(enrollment.next_chapter, self.chapters[2])
+        self.assertIsNotNone(enrollment.last_activity_at)
+
+        self.complete(1, 'false')
+        enrollment = self.enrollment()
+        self.assertEqual(enrollment.completed_chapters, 1)
+        self.assertEqual(enrollment.next_chapter, self.chapters[0])
+
+        progress = self.client.get(f'/courses/{self.course.id}/chapters/{self.chapters[1].id}/progress/').json()
+        self.assertEqual(progress['progress']['course_progress']['percent_complete'], 25.0)
+
+    def test_bitmap_backend_keeps_counters(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            self.complete(1)
+            self.complete(3)
+        enrollment = self.enrollment()
+        self.assertEqual(enrollment.completed_chapters, 2)
+        self.assertEqual(enrollment.next_chapter, self.chapters[1])
+
+    def test_chapter_add_and_delete(self):
+        for order in (1, 2, 3, 4):
+            self.complete(order)
+        self.assertIsNone(self.enrollment().next_chapter)
+
+        new_chapter = Chapter.objects.create(course=self.course, title='Bonus', order=5)
+        enrollment = self.enrollment()
+        self.assertEqual((enrollment.completed_chapters, enrollment.total_chapters), (4, 5))
+        self.assertEqual(enrollment.next_chapter, new_chapter)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chapters[0].delete()
+        enrollment = self.enrollment()
+        self.assertEqual((enrollment.completed_chapters, enrollment.total_chapters), (3, 4))
+
+    def test_verify_command_reports_and_fixes_drift(self):
+        self.complete(1)
+        Enrollment.objects.filter(pk=self.enrollment().pk).update(completed_chapters=3, total_chapters=9)
+
+        out = StringIO()
+        call_command('verify_progress_aggregates', stdout=out)
+        self.assertIn('1 enrollments drifted', out.getvalue())
+        self.assertEqual(self.enrollment().completed_chapters, 3)
+
+        call_command('verify_progress_aggregates', '--fix', stdout=StringIO())
+        enrollment = self.enrollment()
+        self.assertEqual((enrollment.completed_chapters, enrollment.total_chapters), (1, 4))
+        self.assertEqual(enrollment.next_chapter, self.chapters[1])
+
+
+class UpsertWriteTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.client.force_login(self.user)
+        self.course = make_course(chapters=3)
+        self.client.post(f'/courses/{self.course.id}/enroll/')
+
+    def progress_writes(self, completed):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(f'/courses/{self.course.id}/chapters/1/', {'completed': completed})
+        # Writes only; keeping next_chapter current may also read progress
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if 'e_app_progress' in q['sql'] and q['sql'].lstrip().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+
+    def test_each_progress_write_is_one_statement(self):
+        self.assertEqual(len(self.progress_writes('true')), 1)
+        self.assertEqual(len(self.progress_writes('false')), 1)
+        self.assertEqual(Progress.objects.filter(user=self.user, chapter__order=1).count(), 1)
+
+    def test_completing_a_chapter_without_a_row_inserts_it(self):
+        Progress.objects.filter(user=self.user).delete()
+        self.assertEqual(len(self.progress_writes('true')), 1)
+        self.assertTrue(Progress.objects.get(user=self.user, chapter__order=1).completed)
+        self.assertEqual(Enrollment.objects.get(user=self.user).completed_chapters, 1)
+
+    def test_repeat_completion_keeps_first_timestamp(self):
+        self.progress_writes('true')
+        first = Progress.objects.get(user=self.user, chapter__order=1).completed_at
+        response = self.client.post(f'/courses/{self.course.id}/chapters/1/', {'completed': 'true'})
+        self.assertEqual(Progress.objects.get(user=self.user, chapter__order=1).completed_at, first)
+        self.assertEqual(Enrollment.objects.get(user=self.user).completed_chapters, 1)
+        self.assertTrue(response.json()['chapter']['completed'])
+
+
+class ConcurrentWriteTests(TransactionTestCase):
+    def setUp(self):
+        # SQLite serialises writers with a database lock: an in-memory database isn't shared
+        # between connections, and a file-backed one fails the parallel upserts with
+        # 'database is locked' unless every transaction is opened IMMEDIATE
+        if connection.vendor != 'postgresql':
+            self.skipTest('Parallel writers are only exercised against PostgreSQL')
+        cache.clear()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.course = make_course(chapters=3)
+
+    def post_in_parallel(self, url, data=None, count=8):
+        def post(_):
+            try:
+                client = Client()
+                client.force_login(self.user)
+                return client.post(url, data or {}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            return sorted(pool.map(post, range(count)))
+
+    def test_parallel_enrollments_create_one_enrollment(self):
+        statuses = self.post_in_parallel(f'/courses/{self.course.id}/enroll/')
+
+        self.assertEqual(statuses, [201] + [400] * 7)
+        self.assertEqual(Enrollment.objects.filter(user=self.user, course=self.course).count(), 1)
+        self.assertEqual(Progress.objects.filter(user=self.user).count(), 3)
+
+    def test_parallel_completions_create_one_progress_row(self):
+        Enrollment.objects.create(user=self.user, course=self.course, total_chapters=3)
+        statuses = self.post_in_parallel(f'/courses/{self.course.id}/chapters/2/', {'completed': 'true'})
+
+        self.assertEqual(set(statuses), {200})
+        self.assertEqual(Progress.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Enrollment.objects.get(user=self.user).completed_chapters, 1)
+
+
+class ProgressSyncTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.client.force_login(self.user)
+        self.course = make_course(chapters=5)
+        self.other_course = make_course(chapters=1)
+        self.client.post(f'/courses/{self.course.id}/enroll/')
+        self.chapters = list(self.course.chapters.order_by('order'))
+
+    def sync(self, items):
+        response = self.client.post('/progress/sync/', json.dumps({'items': items}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return [result['status'] for result in response.json()['results']]
+
+    def item(self, order, completed, at):
+        return {'course_id': self.course.id, 'chapter_id': self.chapters[order - 1].id,
+                'completed': completed, 'completed_at': f'2024-01-01T10:{at:02d}:00Z'}
+
+    def check_sync(self):
+        statuses = self.sync([
+            self.item(1, True, 1),
+            self.item(2, True, 2),
+            self.item(2, False, 5),  # Later change to the same chapter wins
+            self.item(3, True, 3),
+            {'course_id': self.other_course.id, 'chapter_id': self.other_course.chapters.get().id, 'completed': True},
+            {'course_id': self.course.id, 'chapter_id': 'x', 'completed': True},
+        ])
+        self.assertEqual(statuses, ['applied', 'superseded', 'unchanged', 'applied', 'error', 'error'])
+
+        outline = self.client.get(f'/courses/{self.course.id}/?outline=true').json()
+        self.assertEqual([c['order'] for c in outline['chapters'] if c['completed']], [1, 3])
+        enrollment = Enrollment.objects.get(user=self.user, course=self.course)
+        self.assertEqual(enrollment.completed_chapters, 2)
+        self.assertEqual(enrollment.next_chapter, self.chapters[1])
+
+        # An un-completion recorded before the stored completion loses
+        self.assertEqual(self.sync([self.item(3, False, 0), self.item(1, False, 30)]), ['stale', 'applied'])
+        self.assertEqual(Enrollment.objects.get(user=self.user, course=self.course).completed_chapters, 1)
+
+        # So does a completion queued offline before a newer un-completion, synced or made online
+        self.assertEqual(self.sync([self.item(1, True, 20)]), ['stale'])
+        self.assertEqual(self.sync([self.item(1, True, 40)]), ['applied'])
+        progress_store().set(self.user, self.chapters[3], True)
+        progress_store().set(self.user, self.chapters[3], False)
+        self.assertEqual(self.sync([self.item(4, True, 50)]), ['stale'])
+        self.assertEqual(progress_store().completed_chapter_ids(self.user, self.course.id), {self.chapters[0].id, self.chapters[2].id})
+
+    def test_sync_rows_backend(self):
+        self.check_sync()
+
+    def test_sync_bitmap_backend(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            self.check_sync()
+
+    def test_batch_is_validated_with_constant_queries(self):
+        items = [self.item(order, True, order) for order in range(1, 6)]
+        with CaptureQueriesContext(connection) as ctx:
+            self.sync(items[:2])
+        Progress.objects.update(completed=False, completed_at=None)
+        Enrollment.objects.update(completed_chapters=0)
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            self.sync(items)
+
+    def test_rejects_bad_payloads(self):
+        response = self.client.post('/progress/sync/', json.dumps({'items': []}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/progress/sync/', 'nope', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ROOT_URLCONF='super_e.asgi_urls')
+class AsyncViewTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.course = make_course(chapters=4, title='Async')
+        make_course(title='Other')
+        Article.objects.bulk_create([Article(course=self.course, title=f'Article {i}', order=i) for i in range(1, 4)])
+        snapshots.refresh([self.course.id], ('articles',))
+        self.client.force_login(self.user)
+        self.client.post(f'/courses/{self.course.id}/enroll/')
+        self.chapter = self.course.chapters.get(order=2)
+        self.client.post(f'/courses/{self.course.id}/chapters/{self.chapter.id}/', {'completed': 'true'})
+
+    def test_reads_are_routed_to_async_views(self):
+        self.assertTrue(iscoroutinefunction(resolve('/courses/').func))
+        self.assertTrue(iscoroutinefunction(resolve(f'/courses/{self.course.id}/articles/').func))
+        self.assertFalse(iscoroutinefunction(resolve(f'/courses/{self.course.id}/enroll/').func))
+
+    async def test_course_list_and_detail(self):
+        first = (await self.async_client.get('/courses/', {'limit': 1, 'ordering': 'title'})).json()
+        self.assertEqual([c['title'] for c in first['courses']], ['Async'])
+        second = (await self.async_client.get('/courses/', {'limit': 1, 'ordering': 'title', 'cursor': first['next_cursor']})).json()
+        self.assertEqual([c['title'] for c in second['courses']], ['Other'])
+        self.assertEqual((await self.async_client.get('/courses/', {'ordering': 'x'})).status_code, 400)
+        self.assertEqual((await self.async_client.get('/courses/999999/')).status_code, 404)
+
+        anonymous = (await self.async_client.get(f'/courses/{self.course.id}/', {'outline': 'true'})).json()
+        self.assertFalse(any(c['completed'] for c in anonymous['chapters']))
+        await self.async_client.aforce_login(self.user)
+        outline = (await self.async_client.get(f'/courses/{self.course.id}/', {'outline': 'true'})).json()
+        self.assertEqual([c['order'] for c in outline['chapters'] if c['completed']], [2])
+
+    async def test_progress_requires_login(self):
+        url = f'/courses/{self.course.id}/chapters/{self.chapter.id}/progress/'
+        self.assertEqual((await self.async_client.get(url)).status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        progress = (await self.async_client.get(url)).json()['progress']
+        self.assertTrue(progress['completed'])
+        self.assertEqual(progress['course_progress']['completed_chapters'], 1)
+
+    async def test_articles(self):
+        url = f'/courses/{self.course.id}/articles/'
+        cached = (await self.async_client.get(url)).json()['course']
+        self.assertEqual([a['title'] for a in cached['articles']], ['Article 1', 'Article 2', 'Article 3'])
+        page = (await self.async_client.get(url, {'fields': 'title', 'page': 2, 'limit': 2})).json()
+        self.assertEqual(page['course']['articles'], [{'id': cached['articles'][2]['id'], 'title': 'Article 3'}])
+
+        response = await self.async_client.get(url, {'stream': 'true', 'fields': 'title'})
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(body.splitlines()), 4)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_asgi', '/search/', '--requests', '4', '--concurrency', '2', stdout=out)
+        self.assertIn('wsgi: 4 requests', out.getvalue())
+        self.assertIn('asgi: 4 requests', out.getvalue())
+
+
+class SeedAndBenchmarkTests(CatalogTestCase):
+    def seed(self, **options):
+        args = [f'--{name}={value}' for name, value in options.items()]
+        call_command('seed_data', *args, stdout=StringIO())
+
+    def test_seed_data(self):
+        self.seed(courses=3, chapters=4, articles=2, users=5, enrollments=2, completion=1)
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(Chapter.objects.filter(slot__isnull=True).count(), 0)
+        self.assertEqual(Article.objects.count(), 6)
+        self.assertEqual(User.objects.filter(is_staff=True).count(), 1)
+        self.assertEqual(Enrollment.objects.count(), 10)
+        # Everything complete, and the aggregates agree with the progress rows
+        self.assertEqual(Progress.objects.filter(completed=True).count(), 40)
+        self.assertFalse(Enrollment.objects.exclude(completed_chapters=4).exists())
+        self.assertTrue(SearchDocument.objects.filter(kind='course').exists())
+
+    def test_seed_data_bitmap_backend(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            self.seed(courses=2, chapters=9, users=3, enrollments=1, completion=1)
+        self.assertFalse(Progress.objects.exists())
+        self.assertEqual(EnrollmentProgress.objects.get(enrollment__user__username='seed-0@example.com').bits, b'\xff\x01')
+        self.assertFalse(Enrollment.objects.exclude(completed_chapters=9).exists())
+
+    def test_benchmark_against_baseline(self):
+        self.seed(courses=2, chapters=3, articles=2, users=3, enrollments=2)
+        baseline = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'baseline.json'
+        out = StringIO()
+        call_command('bench_routes', '--requests=3', f'--baseline={baseline}', '--save-baseline', stdout=out)
+        routes = json.loads(baseline.read_text())['routes']
+        self.assertIn('progress_sync', routes)
+        self.assertFalse(any(route['errors'] for route in routes.values()))
+        self.assertNotIn('No benchmark scenario', out.getvalue())
+
+        # A baseline with fewer queries than the current code is a regression
+        routes['course_detail[outline]']['queries'] -= 1
+        baseline.write_text(json.dumps({'routes': routes}))
+        with self.assertRaisesMessage(CommandError, 'course_detail[outline]'):
+            call_command('bench_routes', '--requests=3', f'--baseline={baseline}', '--route=course_detail[outline]',
+                         '--latency-threshold=100', stdout=StringIO())
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_SLOW_MS=0)
+class RequestMetricsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        instrumentation.reset()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.staff = User.objects.create_user(username='staff@example.com', password='secret', is_staff=True)
+        self.course = make_course(chapters=3)
+
+    def timings(self, response):
+        return dict(
+            (entry.split(';')[0].strip(), entry) for entry in response['Server-Timing'].split(',')
+        )
+
+    def test_server_timing_counts_queries(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertLogs('e_app.requests', 'WARNING') as logs:
+                response = self.client.get(f'/courses/{self.course.id}/', {'outline': 'true'})
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'view', 'serialize', 'total'})
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timings['db'])
+
+        entry = logs.records[0].request_metrics
+        self.assertEqual((entry['route'], entry['status'], entry['queries']), ('course_detail', 200, len(ctx.captured_queries)))
+
+    def test_metrics_endpoint_is_staff_only(self):
+        with self.assertLogs('e_app.requests', 'WARNING'):
+            self.client.get('/courses/')
+            self.client.get('/courses/')
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get('/metrics/').status_code, 403)
+            self.client.force_login(self.staff)
+            routes = self.client.get('/metrics/').json()['routes']
+        self.assertEqual(routes['course_list']['count'], 2)
+        self.assertEqual(sum(routes['course_list']['buckets'].values()), 2)
+
+    @override_settings(ROOT_URLCONF='super_e.asgi_urls', REQUEST_METRICS_SLOW_MS=10000)
+    async def test_async_views_are_measured(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(f'/courses/{self.course.id}/', {'outline': 'true'})
+        self.assertNotIn('desc="0 queries"', self.timings(response)['db'])
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.assertFalse(self.client.get('/courses/').has_header('Server-Timing'))
+
+
+class AdminScalingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username='admin@example.com', password='secret')
+        self.client.force_login(self.admin)
+
+    def add_enrolled_users(self, course, count):
+        users = User.objects.bulk_create(
+            [User(username=f'{course.id}-{n}@example.com') for n in range(count)]
+        )
+        enroll_users(course, [user.id for user in users])
+
+    def test_changelists_and_forms_use_constant_queries(self):
+        small, large = make_course(chapters=2), make_course(chapters=8)
+        self.add_enrolled_users(small, 2)
+
+        urls = ['/admin/e_app/progress/', '/admin/e_app/enrollment/', '/admin/e_app/chapter/',
+                f'/admin/e_app/progress/{Progress.objects.first().id}/change/',
+                f'/admin/e_app/enrollment/{Enrollment.objects.first().id}/change/',
+                f'/admin/e_app/chapter/{Chapter.objects.first().id}/change/']
+        counts = {}
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 200)  # Warm per-process caches
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(url)
+            counts[url] = len(ctx.captured_queries)
+
+        self.add_enrolled_users(large, 10)
+        for url in urls:
+            with self.assertNumQueries(counts[url]):
+                self.client.get(url)
+
+    def test_counts_are_capped(self):
+        make_course(chapters=12)
+        with mock.patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 5):
+            response = self.client.get('/admin/e_app/chapter/')
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+
+class ContentImportExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.courses = [make_course(chapters=3, title=f'Course {n}', category='Data') for n in range(3)]
+        Article.objects.bulk_create(
+            [Article(course=course, title=f'Article {i}', content='Text, with "quotes"\nand lines', order=i)
+             for course in self.courses for i in range(1, 3)]
+        )
+        self.path = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def outline(self):
+        return [
+            (course.title, course.category,
+             list(course.chapters.order_by('order').values_list('title', 'order')),
+             list(Article.objects.filter(course=course).order_by('order').values_list('title', 'content')))
+            for course in Course.objects.order_by('title')
+        ]
+
+    def check_round_trip(self, fmt):
+        before = self.outline()
+        export = self.path / f'courses.{fmt}'
+        with self.assertNumQueries(4):  # One chunk of courses, chapters and articles, then the empty chunk
+            call_command('export_courses', '-o', str(export), stdout=StringIO(), stderr=StringIO())
+
+        Course.objects.all().delete()
+        out = StringIO()
+        call_command('import_courses', str(export), '--chunk-size=2', stdout=out)
+        self.assertIn('3 courses created', out.getvalue())
+        self.assertEqual(self.outline(), before)
+        self.assertEqual(Chapter.objects.filter(slot__isnull=True).count(), 0)
+        self.assertEqual(SearchDocument.objects.filter(kind='article').count(), 6)
+
+    def test_jsonl_round_trip(self):
+        self.check_round_trip('jsonl')
+
+    def test_csv_round_trip(self):
+        self.check_round_trip('csv')
+
+    def test_import_updates_existing_courses(self):
+        user = User.objects.create_user(username='student@example.com', password='secret')
+        course = self.courses[0]
+        enroll_users(course, [user.id])
+        self.assertEqual(self.client.get(f'/courses/{course.id}/').json()['title'], 'Course 0')
+
+        record = next(content_io.iter_courses(Course.objects.filter(pk=course.pk)))
+        record['title'] = 'Renamed'
+        record['chapters'].append({'title': 'Bonus', 'description': None, 'order': 4})
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = content_io.import_courses([content_io._clean_course(record, 'test')])
+
+        self.assertEqual((totals['courses_updated'], totals['chapters_created'], totals['chapters_updated']), (1, 1, 3))
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(self.client.get(f'/courses/{course.id}/').json()['title'], 'Renamed')
+        self.assertEqual(Enrollment.objects.get(user=user).total_chapters, 4)
+        self.assertEqual(sorted(course.chapters.values_list('slot', flat=True)), [0, 1, 2, 3])
+
+    def test_import_invalidates_the_cache_after_commit(self):
+        course = self.courses[0]
+        self.assertEqual(self.client.get(f'/courses/{course.id}/').json()['title'], 'Course 0')
+        record = next(content_io.iter_courses(Course.objects.filter(pk=course.pk)))
+        record['title'] = 'Renamed'
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            content_io.import_courses([content_io._clean_course(record, 'test')])
+            # A reader before the commit caches the old title again; it must not stick
+            self.assertEqual(self.client.get(f'/courses/{course.id}/').json()['title'], 'Course 0')
+        self.assertEqual(self.client.get(f'/courses/{course.id}/').json()['title'], 'Course 0')
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(f'/courses/{course.id}/').json()['title'], 'Renamed')
+
+    def test_bad_input_is_reported(self):
+        bad = self.path / 'bad.jsonl'
+        bad.write_text('{"title": "Fine"}\n{"title": "Broken", "chapters": [{"title": "x"}]}\n')
+        with self.assertRaisesMessage(CommandError, 'Line 2'):
+            call_command('import_courses', str(bad), '--chunk-size=1', stdout=StringIO())
+        self.assertTrue(Course.objects.filter(title='Fine').exists())
+
+    def test_admin_export_and_import(self):
+        self.client.force_login(User.objects.create_superuser(username='admin@example.com', password='secret'))
+        response = self.client.post('/admin/e_app/course/', {
+            'action': 'export_csv', '_selected_action': [self.courses[0].pk],
+        })
+        exported = b''.join(response.streaming_content)
+        self.assertEqual(exported.decode().count('\nchapter,'), 3)
+
+        Course.objects.all().delete()
+        upload = SimpleUploadedFile('courses.csv', exported, content_type='text/csv')
+        response = self.client.post('/admin/e_app/course/import/', {'file': upload})
+        self.assertRedirects(response, '/admin/e_app/course/')
+        self.assertEqual(Course.objects.get().chapters.count(), 3)
+
+
+class CourseAnalyticsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='staff@example.com', password='secret', is_staff=True)
+        self.course = make_course(chapters=4)
+        self.chapters = list(self.course.chapters.order_by('order'))
+        self.users = User.objects.bulk_create([User(username=f'user{n}@example.com') for n in range(5)])
+        enroll_users(self.course, [user.id for user in self.users])
+        # Users complete 0, 1, 2, 2 and 4 chapters
+        for user, done in zip(self.users, (0, 1, 2, 2, 4)):
+            for chapter in self.chapters[:done]:
+                progress_store().set(user, chapter, True)
+        self.url = f'/courses/{self.course.id}/analytics/'
+        self.client.force_login(self.staff)
+
+    def check_funnel(self):
+        call_command('rebuild_analytics', stdout=StringIO())
+        with self.assertNumQueries(4):  # Session, user, summary, chapter steps
+            data = self.client.get(self.url).json()['analytics']
+        self.assertEqual((data['enrollments'], data['not_started'], data['finished']), (5, 1, 1))
+        self.assertEqual([c['completions'] for c in data['chapters']], [4, 3, 1, 1])
+        self.assertEqual([c['lost_from_previous'] for c in data['chapters']], [1, 1, 2, 0])
+        self.assertEqual([c['stopped_here'] for c in data['chapters']], [1, 2, 0, 0])
+        self.assertEqual(data['chapters'][0]['median_seconds_to_complete'], 60)
+
+    def test_funnel_rows_backend(self):
+        self.check_funnel()
+
+    def test_funnel_bitmap_backend(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            EnrollmentProgress.objects.all().delete()
+            call_command('backfill_progress_bitmap', stdout=StringIO())
+            self.check_funnel()
+
+    def test_delta_job_only_refreshes_changed_courses(self):
+        other = make_course(chapters=1)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        call_command('refresh_analytics', stdout=StringIO())  # First run covers everything
+        self.assertEqual(CourseAnalytics.objects.count(), 2)
+
+        progress_store().set(self.users[0], self.chapters[0], True)
+        out = StringIO()
+        call_command('refresh_analytics', stdout=out)
+        self.assertIn('Refresh: 1 courses', out.getvalue())
+        self.assertEqual(self.client.get(self.url).json()['analytics']['not_started'], 0)
+        self.assertTrue(CourseAnalytics.objects.filter(course=other).exists())
+
+    def test_staff_only(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+CACHED_SESSIONS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cache',
+    'AUTH_USER_CACHE_TIMEOUT': 60,
+}
+
+
+class SessionModeTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['sessions'].clear()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.course = make_course(chapters=1)
+        enroll_users(self.course, [self.user.id])
+        self.url = f'/courses/{self.course.id}/chapters/{self.course.chapters.get().id}/progress/'
+
+    @override_settings(**CACHED_SESSIONS)
+    def test_cache_mode_skips_session_and_user_queries(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(4):  # Chapter, course, enrollment, progress; no session or user
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertFalse(Session.objects.exists())
+
+    @override_settings(**CACHED_SESSIONS)
+    def test_saving_a_user_drops_the_cached_copy(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.user.set_password('changed')
+        self.user.save()
+        # The session hash no longer matches the stored password, so the user is logged out
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_failed_login_hashes_the_password_once(self):
+        # A known user's password is checked; an unknown user's is hashed to take as long
+        with mock.patch('django.contrib.auth.base_user.check_password', side_effect=check_password) as check, \
+                mock.patch('django.contrib.auth.base_user.make_password', side_effect=make_password) as make:
+            for email in ('student@example.com', 'nobody@example.com'):
+                check.reset_mock()
+                make.reset_mock()
+                response = self.client.post(
+                    '/login/', json.dumps({'email': email, 'password': 'wrong'}), content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(check.call_count + make.call_count, 1, email)
+
+    def test_clear_expired_sessions(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{n}', session_data='', expire_date=now - timezone.timedelta(days=1)) for n in range(5)]
+            + [Session(session_key='live', session_data='', expire_date=now + timezone.timedelta(days=1))]
+        )
+        out = StringIO()
+        call_command('clear_expired_sessions', '--batch-size=2', stdout=out)
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.cache'):
+            call_command('clear_expired_sessions', stdout=out)
+        self.assertIn('nothing to clean up', out.getvalue())
+
+    def test_bench_sessions(self):
+        out = StringIO()
+        call_command('bench_sessions', '--requests=6', '--users=1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[2:]], ['db', 'cached_db', 'cache'])
+        # No errors, and the cache mode spends no queries on sessions or users after the first request
+        self.assertTrue(all(line.split()[-1] == '0' for line in lines[2:]))
+        self.assertLess(float(lines[4].split()[-2]), float(lines[2].split()[-2]))
+        self.assertFalse(Session.objects.exists())
+
+
+class ProvisioningTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='staff@example.com', password='secret', is_staff=True)
+        self.course = make_course(chapters=2)
+
+    def users(self, count, prefix='new'):
+        return [{'email': f'{prefix}{n}@example.com', 'password': f'pw{n}'} for n in range(count)]
+
+    def provision(self, users, **kwargs):
+        lines = [json.dumps(user) + '\n' for user in users]
+        return provisioning.provision_users(provisioning.read_users(lines, 'jsonl'), workers=1, **kwargs)
+
+    def test_duplicates_checked_with_one_query_per_chunk(self):
+        with CaptureQueriesContext(connection) as small:
+            self.provision(self.users(2, 'small'))
+        with self.assertNumQueries(len(small.captured_queries)):
+            totals = self.provision(self.users(50) + [{'email': 'staff@example.com'}, {'email': 'new1@example.com'}])
+        self.assertEqual((totals['created'], totals['already_registered'], totals['duplicates']), (50, 1, 1))
+
+    def test_command_hashes_in_a_process_pool_and_enrolls(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'users.csv'
+        rows = ['email,password,first_name'] + [f'{user["email"]},{user["password"]},Name' for user in self.users(40)]
+        path.write_text('\n'.join(rows + ['staff@example.com,,']) + '\n')
+        out = StringIO()
+        call_command('provision_users', str(path), f'--course={self.course.id}', '--workers=2', '--chunk-size=35', stdout=out)
+        self.assertIn('40 created, 1 already registered, 41 enrollments', out.getvalue())
+        user = User.objects.get(username='new7@example.com')
+        self.assertTrue(user.check_password('pw7'))
+        self.assertEqual(user.first_name, 'Name')
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 41)
+        self.assertEqual(Progress.objects.filter(chapter__course=self.course).count(), 82)
+
+    def test_emails_longer_than_a_username_are_rejected(self):
+        email = 'a' * 64 + '@' + 'b' * 60 + '.' + 'c' * 60 + '.com'  # Valid, and 190 characters
+        with self.assertRaisesMessage(provisioning.ProvisioningError, 'Line 1: email longer than 150 characters'):
+            self.provision([{'email': email}])
+        self.assertFalse(User.objects.filter(email=email).exists())
+
+    def test_users_without_password_cannot_log_in(self):
+        self.provision([{'email': 'nopass@example.com'}])
+        self.assertFalse(User.objects.get(username='nopass@example.com').has_usable_password())
+
+    def test_staff_endpoint(self):
+        body = ''.join(json.dumps(user) + '\n' for user in self.users(3))
+        url = f'/users/provision/?course={self.course.id}'
+        self.client.force_login(User.objects.create_user(username='student@example.com'))
+        self.assertEqual(self.client.post(url, body, content_type='application/x-ndjson').status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.post(url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['created'], response.json()['enrolled']), (3, 3))
+
+        # The whole input is validated before anything is written
+        upload = SimpleUploadedFile('users.csv', b'email\nfresh@example.com\nnot-an-email\n')
+        response = self.client.post('/users/provision/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Row 3: invalid email', response.json()['error'])
+        self.assertFalse(User.objects.filter(username='fresh@example.com').exists())
+
+        with self.settings(USER_PROVISIONING_MAX_USERS=2):
+            response = self.client.post(url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('manage.py provision_users', response.json()['error'])
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1)
+    def test_staff_endpoint_hashes_in_the_hashing_slots(self):
+        self.client.force_login(self.staff)
+        body = ''.join(json.dumps(user) + '\n' for user in self.users(3))
+        with throttling.hashing_slot():
+            response = self.client.post('/users/provision/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(User.objects.filter(username__startswith='new').exists())
+
+        slot = mock.MagicMock(wraps=throttling.hashing_slot)
+        with mock.patch('e_app.views.throttling.hashing_slot', slot):
+            response = self.client.post('/users/provision/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(slot.call_count, 3)
+
+
+class ContentSnapshotTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = make_course(chapters=3, title='Snapshots')
+        self.article = Article.objects.create(course=self.course, title='Intro', content='Hello ' * 200, order=1)
+        self.url = f'/courses/{self.course.id}/outline/'
+
+    def test_serves_stored_bytes_with_encoding_and_etag(self):
+        plain = self.client.get(self.url)
+        self.assertEqual([c['order'] for c in plain.json()['chapters']], [1, 2, 3])
+        self.assertNotIn('completed', plain.json()['chapters'][0])
+        self.assertEqual(plain['Content-Length'], str(len(plain.content)))
+
+        with self.assertNumQueries(0):
+            zipped = self.client.get(self.url, headers={'Accept-Encoding': 'br, gzip'})
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertEqual(zipped['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', zipped['Vary'])
+
+        articles = self.client.get(f'/courses/{self.course.id}/articles/', headers={'Accept-Encoding': 'gzip'})
+        self.assertLess(len(articles.content), len(self.article.content))
+        not_modified = self.client.get(self.url, headers={'If-None-Match': plain['ETag']})
+        self.assertEqual((not_modified.status_code, not_modified.content), (304, b''))
+
+    def test_encoding_follows_accept_encoding_quality(self):
+        plain = self.client.get(self.url).content
+        for accept, encoding in (
+            ('deflate', 'deflate'), ('gzip;q=0.5, deflate', 'deflate'), ('deflate, gzip', 'gzip'),
+            ('gzip;q=0, deflate;q=0', None), ('*', 'gzip'), ('br', None),
+        ):
+            response = self.client.get(self.url, headers={'Accept-Encoding': accept})
+            self.assertEqual(response.get('Content-Encoding'), encoding, accept)
+            self.assertEqual(response['Content-Length'], str(len(response.content)))
+            decode = {'gzip': gzip.decompress, 'deflate': zlib.decompress, None: bytes}[encoding]
+            self.assertEqual(decode(response.content), plain)
+
+    def test_saves_render_and_deletes_drop_snapshots(self):
+        etag = self.client.get(self.url)['ETag']
+        chapter = self.course.chapters.get(order=1)
+        chapter.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.save()
+        self.assertEqual(ContentSnapshot.objects.get(course=self.course, kind='outline').etag, self.client.get(self.url)['ETag'][2:])
+        self.assertNotEqual(self.client.get(self.url)['ETag'], etag)
+        self.assertEqual(self.client.get(self.url).json()['chapters'][0]['title'], 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.delete()
+        self.assertFalse(ContentSnapshot.objects.filter(course=self.course, kind='articles').exists())
+        # Rendered again on the next read
+        self.assertEqual(self.client.get(f'/courses/{self.course.id}/articles/').json()['course']['articles'], [])
+        self.assertTrue(ContentSnapshot.objects.filter(course=self.course, kind='articles').exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertFalse(ContentSnapshot.objects.exists())
+
+    def test_import_and_rebuild_render_snapshots(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            content_io.import_courses([{
+                'id': self.course.id, 'title': 'Imported', 'description': '', 'category': None,
+                'chapters': [{'title': 'New', 'description': None, 'order': 4}], 'articles': [],
+            }])
+        self.assertEqual(len(self.client.get(self.url).json()['chapters']), 4)
+        self.assertEqual(self.client.get(f'/courses/{self.course.id}/').json()['title'], 'Imported')
+
+        ContentSnapshot.objects.all().delete()
+        call_command('rebuild_snapshots', stdout=StringIO())
+        self.assertEqual(ContentSnapshot.objects.filter(course=self.course).count(), 3)
+
+    def test_progress_is_served_separately(self):
+        user = User.objects.create_user(username='student@example.com', password='secret')
+        url = f'/courses/{self.course.id}/progress/'
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        enroll_users(self.course, [user.id])
+        chapter = self.course.chapters.get(order=2)
+        progress_store().set(user, chapter, True)
+        progress = self.client.get(url).json()['progress']
+        self.assertEqual(progress['completed_chapter_ids'], [chapter.id])
+        self.assertEqual((progress['completed_chapters'], progress['total_chapters']), (1, 3))
+
+
+class ChapterReaderTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.course = make_course(chapters=5, title='Reader')
+        enroll_users(self.course, [self.user.id])
+        self.chapters = list(self.course.chapters.order_by('order'))
+        progress_store().set(self.user, self.chapters[2], True)
+        self.client.force_login(self.user)
+
+    def read(self, order, **params):
+        return self.client.get(f'/courses/{self.course.id}/chapters/{order}/', params)
+
+    def check_reader(self):
+        self.read(1)
+        with self.assertNumQueries(3):  # Session, user, chapter page
+            body = self.read(3).json()
+        self.assertEqual(body['chapter']['course_title'], 'Reader')
+        self.assertTrue(body['chapter']['completed'])
+        self.assertIsNotNone(body['chapter']['completed_at'])
+        self.assertEqual(body['previous'], {'id': self.chapters[1].id, 'title': 'Chapter 2', 'order': 2})
+        self.assertEqual(body['next'], {'id': self.chapters[3].id, 'title': 'Chapter 4', 'order': 4})
+        self.assertFalse(self.read(4).json()['chapter']['completed'])
+
+    def test_rows_backend(self):
+        self.check_reader()
+
+    def test_bitmap_backend(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            call_command('backfill_progress_bitmap', stdout=StringIO())
+            self.check_reader()
+
+    def test_ends_and_prefetch(self):
+        self.assertIsNone(self.read(1).json()['previous'])
+        self.assertIsNone(self.read(5).json()['next'])
+        Chapter.objects.filter(pk=self.chapters[1].pk).update(description='Read me next')
+        self.assertEqual(self.read(1, prefetch='next').json()['next']['description'], 'Read me next')
+        self.assertNotIn('description', self.read(1).json()['next'])
+
+    def test_errors(self):
+        self.assertEqual(self.read(99).status_code, 404)
+        self.client.force_login(User.objects.create_user(username='other@example.com'))
+        self.assertEqual(self.read(1).status_code, 403)
+        self.assertEqual(self.read(99).status_code, 403)
+
+
+@override_settings(PROGRESS_WRITE_BEHIND=True)
+class WriteBehindTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.course = make_course(chapters=3, title='Live')
+        enroll_users(self.course, [self.user.id])
+        self.enrollment = Enrollment.objects.get(user=self.user)
+        self.chapters = list(self.course.chapters.order_by('order'))
+        self.client.force_login(self.user)
+
+    def toggle(self, chapter, completed):
+        url = f'/courses/{self.course.id}/chapters/{chapter.order}/'
+        return self.client.post(url, {'completed': 'true' if completed else 'false'})
+
+    def state(self, chapter):
+        return self.client.get(f'/courses/{self.course.id}/chapters/{chapter.id}/progress/').json()['progress']
+
+    def check_write_behind(self):
+        response = self.toggle(self.chapters[0], True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['chapter']['completed'])
+        self.toggle(self.chapters[1], True)
+        self.toggle(self.chapters[1], False)
+        self.assertEqual(ProgressEvent.objects.count(), 3)
+
+        # Nothing is stored yet, but the user reads their own writes
+        self.assertEqual(progress_backend().completed_chapter_ids(self.user, self.course.id), set())
+        self.assertTrue(self.state(self.chapters[0])['completed'])
+        self.assertFalse(self.state(self.chapters[1])['completed'])
+        self.assertTrue(self.client.get(f'/courses/{self.course.id}/chapters/1/').json()['chapter']['completed'])
+        self.assertEqual(progress_store().completed_chapter_ids(self.user, self.course.id), {self.chapters[0].id})
+
+        # Maintenance jobs compare the aggregates with applied progress only
+        out = StringIO()
+        call_command('verify_progress_aggregates', '--fix', stdout=out)
+        self.assertIn('No drift found', out.getvalue())
+
+        totals = write_behind.flush_all()
+        self.assertEqual(totals['events'], 3)
+        self.assertEqual((totals['applied'], totals['unchanged']), (1, 1))
+        self.assertFalse(ProgressEvent.objects.exists())
+        self.assertEqual(progress_backend().completed_chapter_ids(self.user, self.course.id), {self.chapters[0].id})
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_chapters, 1)
+        self.assertEqual(self.enrollment.next_chapter_id, self.chapters[1].id)
+
+        # Flushed state and a newer pending event merge
+        self.toggle(self.chapters[0], False)
+        self.assertFalse(self.state(self.chapters[0])['completed'])
+        call_command('flush_progress_events', stdout=StringIO())
+        self.assertEqual(progress_backend().completed_chapter_ids(self.user, self.course.id), set())
+
+    def test_rows_backend(self):
+        self.check_write_behind()
+
+    def test_bitmap_backend(self):
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            call_command('backfill_progress_bitmap', stdout=StringIO())
+            self.check_write_behind()
+
+    def test_unenrolled_events_are_dropped(self):
+        self.toggle(self.chapters[0], True)
+        self.enrollment.delete()
+        totals = write_behind.flush()
+        self.assertEqual((totals['events'], totals['dropped']), (1, 1))
+        self.assertFalse(ProgressEvent.objects.exists())
+
+
+class ReplicaRoutingTests(CatalogTestCase):
+    # The end-to-end tests need a second database aliased 'replica' in DATABASES, e.g. another
+    # SQLite file; it is left empty, so anything read from it shows up as missing
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        super().setUp()
+        self.router = db_routing.ReplicaRouter()
+        self.routing = db_routing.RequestRouting()
+        self.token = db_routing._current.set(self.routing)
+        self.addCleanup(db_routing._current.reset, self.token)
+
+    def test_reads_follow_the_request_until_it_writes(self):
+        self.assertIsNone(self.router.db_for_read(Course))
+        self.routing.replica = 'replica'
+        self.assertEqual(self.router.db_for_read(Course), 'replica')
+        with db_routing.use_primary():
+            self.assertIsNone(self.router.db_for_read(Course))
+        self.assertEqual(self.router.db_for_write(Course), 'default')
+        self.assertIsNone(self.router.db_for_read(Course))
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_eligible_requests(self):
+        factory = RequestFactory()
+
+        def eligible(path, method='get', **cookies):
+            request = getattr(factory, method)(path)
+            request.COOKIES.update(cookies)
+            request.resolver_match = resolve(path)
+            return db_routing.replica_eligible(request)
+
+        self.assertTrue(eligible('/courses/'))
+        self.assertTrue(eligible('/courses/1/articles/'))
+        self.assertTrue(eligible('/admin/e_app/enrollment/'))
+        self.assertFalse(eligible('/admin/e_app/enrollment/1/change/'))
+        self.assertFalse(eligible('/courses/', method='post'))
+        self.assertFalse(eligible('/courses/1/chapters/1/progress/'))
+        self.assertFalse(eligible('/courses/', **{db_routing.PIN_COOKIE: '1'}))
+
+    @skipUnless('replica' in settings.DATABASES, "needs a 'replica' database")
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_catalog_reads_use_the_replica_and_writers_stick_to_the_primary(self):
+        make_course(title='Fresh')
+        User.objects.create_user(username='student@example.com', password='secret')
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.get('/courses/').json()['courses'], [])
+        self.assertTrue(replica.captured_queries)
+        self.assertNotIn(db_routing.PIN_COOKIE, self.client.cookies)
+
+        response = self.client.post(
+            '/login/', json.dumps({'email': 'student@example.com', 'password': 'secret'}), content_type='application/json',
+        )
+        self.assertEqual(response.cookies[db_routing.PIN_COOKIE]['max-age'], settings.READ_REPLICA_STICKY_SECONDS)
+        cache.clear()
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual([course['title'] for course in self.client.get('/courses/').json()['courses']], ['Fresh'])
+        self.assertFalse(replica.captured_queries)
+
+
+class ProgressArchiveTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.course = make_course(chapters=3, title='Old')
+        enroll_users(self.course, [self.user.id])
+        self.chapters = list(self.course.chapters.order_by('order'))
+        self.completed_at = progress_store().set(self.user, self.chapters[0], True).completed_at
+        Enrollment.objects.update(last_activity_at=timezone.now() - timezone.timedelta(days=400))
+        self.client.force_login(self.user)
+
+    def state(self, chapter):
+        return self.client.get(f'/courses/{self.course.id}/chapters/{chapter.id}/progress/').json()['progress']
+
+    def test_archive_packs_rows_and_reads_fall_back_to_it(self):
+        out = StringIO()
+        call_command('archive_progress', stdout=out)
+        self.assertIn('Archived 1 enrollments (3 progress rows)', out.getvalue())
+        self.assertFalse(Progress.objects.exists())
+        enrollment = Enrollment.objects.get()
+        self.assertTrue(enrollment.progress_archived)
+        self.assertEqual(enrollment.progress_archive.completed_at, {str(self.chapters[0].id): self.completed_at.isoformat()})
+
+        state = self.state(self.chapters[0])
+        self.assertTrue(state['completed'])
+        self.assertEqual(state['course_progress']['completed_chapters'], 1)
+        self.assertFalse(self.state(self.chapters[1])['completed'])
+        self.assertTrue(self.client.get(f'/courses/{self.course.id}/chapters/1/').json()['chapter']['completed'])
+        self.assertEqual(progress_store().completed_chapter_ids(self.user, self.course.id), {self.chapters[0].id})
+        out = StringIO()
+        call_command('verify_progress_aggregates', stdout=out)
+        self.assertIn('No drift found.', out.getvalue())
+
+        # Nothing left to archive; a second run is a no-op
+        self.assertEqual(archive.archive(), {'enrollments': 0, 'rows': 0})
+
+    def test_next_write_restores_the_rows(self):
+        archive.archive()
+        response = self.client.post(f'/courses/{self.course.id}/chapters/2/', {'completed': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Progress.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            set(Progress.objects.filter(completed=True).values_list('chapter_id', flat=True)),
+            {self.chapters[0].id, self.chapters[1].id},
+        )
+        self.assertEqual(Progress.objects.get(chapter=self.chapters[0]).completed_at, self.completed_at)
+        enrollment = Enrollment.objects.get()
+        self.assertFalse(enrollment.progress_archived)
+        self.assertFalse(ProgressArchive.objects.exists())
+        self.assertEqual(enrollment.completed_chapters, 2)
+
+    def test_active_and_unfinished_enrollments_stay(self):
+        Enrollment.objects.update(last_activity_at=timezone.now() - timezone.timedelta(days=100))
+        self.assertEqual(archive.archive()['enrollments'], 0)
+        Progress.objects.update(completed=True)
+        Enrollment.objects.update(completed_chapters=3)
+        self.assertEqual(archive.archive()['enrollments'], 1)
+
+    def test_bitmap_backfill_reads_archives(self):
+        archive.archive()
+        with self.settings(PROGRESS_BACKEND='bitmap'):
+            call_command('backfill_progress_bitmap', stdout=StringIO())
+            self.assertEqual(progress_store().completed_chapter_ids(self.user, self.course.id), {self.chapters[0].id})
+
+
+class EnrollmentCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student@example.com', password='secret')
+        self.course = make_course(chapters=2)
+        self.client.force_login(self.user)
+
+    def read(self):
+        return self.client.get(f'/courses/{self.course.id}/chapters/1/')
+
+    def test_enrollment_check_is_served_from_the_cache(self):
+        self.assertEqual(self.read().status_code, 403)
+        # The cached empty set is rechecked before enrolling, then dropped by the enrollment
+        self.assertEqual(self.client.post(f'/courses/{self.course.id}/enroll/').status_code, 201)
+        self.assertEqual(self.read().status_code, 200)
+        with self.assertNumQueries(3):  # Session, user, chapter page
+            self.assertEqual(self.read().status_code, 200)
+        self.assertEqual(self.client.post(f'/courses/{self.course.id}/enroll/').status_code, 400)
+        self.assertEqual(enrollment_cache.stats(), {'hits': 3, 'misses': 2, 'rechecks': 1, 'hit_rate': 0.6})
+
+        Enrollment.objects.get().delete()
+        self.assertEqual(self.read().status_code, 403)
+
+    def test_a_stale_entry_is_rechecked_before_refusing(self):
+        self.assertFalse(enrollment_cache.is_enrolled(self.user, self.course.id))
+        Enrollment.objects.bulk_create([Enrollment(user=self.user, course=self.course)])  # No signals
+        self.assertTrue(enrollment_cache.is_enrolled(self.user, self.course.id))
+        self.assertEqual(enrollment_cache.stats()['rechecks'], 1)
+        with self.assertNumQueries(1):  # The dropped entry is rebuilt once
+            self.assertTrue(enrollment_cache.is_enrolled(self.user, self.course.id))
+            self.assertTrue(enrollment_cache.is_enrolled(self.user, self.course.id))
+
+    def test_a_hit_costs_one_cache_read(self):
+        enroll_users(self.course, [self.user.id])
+        enrollment_cache.is_enrolled(self.user, self.course.id)
+        shared = caches['default']
+        with mock.patch.object(enrollment_cache, '_cache', return_value=mock.Mock(wraps=shared)) as wrapped:
+            self.assertTrue(enrollment_cache.is_enrolled(self.user, self.course.id))
+        self.assertEqual([name for name, _, _ in wrapped.return_value.method_calls], ['get'])
+
+    def test_stats_are_staff_only(self):
+        self.assertEqual(self.client.get('/enrollments/cache/stats/').status_code, 403)
+        self.client.force_login(User.objects.create_user(username='staff@example.com', is_staff=True))
+        self.assertIn('hit_rate', self.client.get('/enrollments/cache/stats/').json()['enrollment_cache'])
+
+
+@override_settings(THROTTLE_RATES={'login:ip': (2, 60), 'login:account': (3, 60), 'signup:ip': (1, 60)})
+class ThrottlingTests(CatalogTestCase):
+    def login(self, email='student@example.com', address='10.0.0.1'):
+        return self.client.post(
+            '/login/', json.dumps({'email': email, 'password': 'wrong'}), content_type='application/json',
+            REMOTE_ADDR=address,
+        )
+
+    def test_login_is_limited_per_address_and_per_account(self):
+        self.assertEqual(self.login().status_code, 400)
+        self.assertEqual(self.login().status_code, 400)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.login(email='other@example.com', address='10.0.0.2').status_code, 400)
+
+        # The account has one attempt left, whichever address it comes from
+        self.assertEqual(self.login(address='10.0.0.3').status_code, 400)
+        self.assertEqual(self.login(address='10.0.0.4').status_code, 429)
+
+    def test_signup_is_limited_per_address(self):
+        def signup(n):
+            return self.client.post(
+                '/signup/', {'email': f'new{n}@example.com', 'password1': 'x', 'password2': 'x'}, REMOTE_ADDR='10.0.0.1',
+            )
+        self.assertEqual(signup(1).status_code, 201)
+        self.assertEqual(signup(2).status_code, 429)
+        self.assertFalse(User.objects.filter(username='new2@example.com').exists())
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1)
+    def test_hashing_is_refused_when_every_slot_is_busy(self):
+        with throttling.hashing_slot():
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.login().status_code, 400)
+
+    def test_buckets_fall_back_to_the_process_when_the_cache_fails(self):
+        with mock.patch('e_app.throttling.caches') as failing, self.assertLogs('e_app.throttling', 'WARNING'):
+            failing.__getitem__.side_effect = ConnectionError
+            self.assertEqual([self.login(address='10.9.9.9').status_code for _ in range(3)], [400, 400, 429])
+
+    def test_other_cache_exceptions_are_not_swallowed(self):
+        with mock.patch('e_app.throttling.caches') as failing:
+            failing.__getitem__.side_effect = KeyError
+            with self.assertRaises(KeyError):
+                throttling.take('login:ip', '10.9.9.9')
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual({self.login().status_code for _ in range(4)}, {400})
+
+    def test_flood_benchmark(self):
+        make_course()
+        out = StringIO()
+        call_command('bench_login_flood', '--attackers=1', '--seconds=0.2', stdout=out)
+        for phase in ('idle', 'unprotected', 'protected'):
+            self.assertIn(phase, out.getvalue())
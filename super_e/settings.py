@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +55,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover the whole request; inactive unless REQUEST_METRICS_ENABLED
+    'e_app.instrumentation.RequestMetricsMiddleware',
+    # Before the session middleware, so the session written at login pins the client to the primary
+    'e_app.db_routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,7 +71,8 @@ MIDDLEWARE = [
 
 ]
 
-ROOT_URLCONF = 'super_e.urls'
+# asgi.py sets SUPER_E_URLCONF to super_e.asgi_urls, which routes reads to the async views
+ROOT_URLCONF = os.environ.get('SUPER_E_URLCONF', 'super_e.urls')
 
 TEMPLATES = [
     {
@@ -102,6 +108,115 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database (e_app.db_routing), one alias per host listed in
+# SUPER_E_DB_REPLICAS (comma separated). The catalog views in READ_REPLICA_VIEWS and admin
+# changelists read from them; writes and all other reads stay on the default database. After a
+# write the client reads from the default database for READ_REPLICA_STICKY_SECONDS, which must
+# exceed the replication lag.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(filter(None, os.environ.get('SUPER_E_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{_index}'] = {**DATABASES['default'], 'HOST': _host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{_index}')
+
+DATABASE_ROUTERS = ['e_app.db_routing.ReplicaRouter']
+READ_REPLICA_VIEWS = ('course_list', 'course_detail', 'course_outline', 'course_articles')
+READ_REPLICA_STICKY_SECONDS = int(os.environ.get('SUPER_E_READ_REPLICA_STICKY_SECONDS', 15))
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory is per process. When running several workers, point 'default' at a shared
+# backend so they see the same catalog cache, e.g.
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#   'LOCATION': 'redis://127.0.0.1:6379/1',
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'super_e',
+    },
+    # Sessions and cached users; must be shared by every worker (Redis or Memcached in
+    # production) once SESSION_MODE is 'cached_db' or 'cache'
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'super_e-sessions',
+    },
+}
+
+# Session storage, selected with SUPER_E_SESSION_MODE:
+#   'db'         one django_session row, written on login and read on every authenticated request
+#   'cached_db'  reads come from the 'sessions' cache, writes still go to the table (survives a cache flush)
+#   'cache'      no session table traffic at all; a cache flush or eviction logs users out
+# Expired rows of the database modes are deleted by `manage.py clear_expired_sessions`, and
+# `manage.py bench_sessions` compares the modes.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+SESSION_MODE = os.environ.get('SUPER_E_SESSION_MODE', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# CachedModelBackend serves the user row of authenticated requests from the cache. It is a
+# ModelBackend, and the only backend listed: Django tries every backend in turn, so a second
+# one would hash the password of each failed login twice. Sessions created by ModelBackend
+# before it was replaced are logged out once.
+AUTHENTICATION_BACKENDS = [
+    'e_app.auth_backends.CachedModelBackend',
+]
+# Cache alias and timeout (seconds) for users looked up by CachedModelBackend; 0 (the default)
+# disables the cache. Only turn it on with a shared cache: a per-process cache would keep
+# serving a user's old password hash and flags to other workers after a change.
+AUTH_USER_CACHE_ALIAS = 'sessions'
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('SUPER_E_AUTH_USER_CACHE_TIMEOUT', 0))
+
+# Cache alias and timeout (seconds) for course/chapter/article payloads
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Cache alias and timeout (seconds) for each user's set of enrolled course ids (e_app.enrollment_cache);
+# the alias must be shared by every worker for unenrollments to apply straight away
+ENROLLMENT_CACHE_ALIAS = 'default'
+ENROLLMENT_CACHE_TIMEOUT = 60 * 60
+
+# Chapter progress storage used by e_app.progress:
+# 'rows' (one Progress row per user and chapter) or 'bitmap' (one EnrollmentProgress per enrollment).
+# Run `manage.py backfill_progress_bitmap` before switching an existing database to 'bitmap'.
+PROGRESS_BACKEND = 'rows'
+
+# Queue chapter completion toggles and apply them in bulk with `manage.py flush_progress_events`
+# (e_app.write_behind) instead of writing each one through the store; users still read their own writes
+PROGRESS_WRITE_BEHIND = os.environ.get('SUPER_E_PROGRESS_WRITE_BEHIND') == '1'
+
+# Progress archival (`manage.py archive_progress`, 'rows' backend): enrollments finished this many
+# days ago, or inactive for PROGRESS_ARCHIVE_INACTIVE_DAYS, get their Progress rows packed into one row
+PROGRESS_ARCHIVE_FINISHED_DAYS = 90
+PROGRESS_ARCHIVE_INACTIVE_DAYS = 365
+
+# Per-request SQL and timing metrics (e_app.instrumentation): Server-Timing headers, a slow
+# request log on the 'e_app.requests' logger and per-route histograms at /metrics/.
+REQUEST_METRICS_ENABLED = False
+REQUEST_METRICS_SLOW_MS = 500
+REQUEST_METRICS_WINDOW = 5 * 60
+
+# Most users the staff provisioning endpoint takes per request; it hashes their passwords
+# one after another in the request (a few hundred ms each with PBKDF2), so this keeps it
+# well within proxy timeouts. Larger imports go through `manage.py provision_users`.
+USER_PROVISIONING_MAX_USERS = 10
+
+# Load shedding on login and signup (e_app.throttling). Token buckets per scope:
+# (burst, seconds to refill the whole burst), kept in THROTTLE_CACHE_ALIAS, which must be shared
+# by every worker; refusals are 429 with Retry-After. PASSWORD_HASH_CONCURRENCY caps the password
+# hashes in flight per process (None: one per core); requests over it get 503 with Retry-After.
+THROTTLE_ENABLED = True
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_RATES = {
+    'login:ip': (60, 60),
+    'login:account': (10, 5 * 60),
+    'signup:ip': (10, 60 * 60),
+}
+PASSWORD_HASH_CONCURRENCY = None
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
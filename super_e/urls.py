@@ -6,11 +6,21 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('signup/', views.signup_view, name='signup'),
     path('login/', views.login_view, name='login'),
-    path('courses/', views.course_list, name='course_detail'),
+    path('users/provision/', views.provision_users, name='provision_users'),
+    path('courses/', views.course_list, name='course_list'),
     path('courses/<int:course_id>/', views.course_detail, name='course_detail'),
+    path('courses/<int:course_id>/outline/', views.course_outline, name='course_outline'),
+    path('courses/<int:course_id>/progress/', views.course_progress, name='course_progress'),
     path('courses/<int:course_id>/articles/', views.course_articles, name='course_articles'),
     path('courses/<int:course_id>/enroll/',views.enroll_in_course, name='enroll_in_course'),
+    path('courses/<int:course_id>/enroll/cohort/', views.enroll_cohort, name='enroll_cohort'),
+    path('courses/<int:course_id>/analytics/', views.course_analytics, name='course_analytics'),
     path('courses/<int:course_id>/chapters/<int:chapter_id>/', views.user_chapters, name='user_chapter_detail'),
     path('courses/<int:course_id>/chapters/<int:chapter_id>/progress/', views.progress_view, name='progress_view'),
+    path('progress/sync/', views.progress_sync, name='progress_sync'),
+    path('search/', views.search_view, name='search'),
+    path('catalog/cache/stats/', views.catalog_cache_stats, name='catalog_cache_stats'),
+    path('enrollments/cache/stats/', views.enrollment_cache_stats, name='enrollment_cache_stats'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
 
 ]